@@ -0,0 +1,93 @@
+"""
+Measures the time and peak memory of each layout engine on generated networks.
+Every measurement runs in a fresh process so one engine's memory does not count against another.
+Run from the mysite directory with: python benchmarks/layout_benchmark.py [sizes...]
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+
+"""Node counts the engines are measured at"""
+SIZES = (1000, 10000, 100000)
+
+"""Kamada Kawai needs an n x n distance matrix, so it is skipped above this many nodes"""
+KAMADA_KAWAI_LIMIT = 2000
+
+
+def make_network(count, seed=0):
+    """
+    Generates a tiered network similar to the ones built in the GUI: a tree of switches with a
+    few extra links between them, and hosts attached to the switches
+    :param count: the number of nodes in the network
+    :param seed: the seed of the random generator
+    :return: a networkx Graph
+    """
+    import networkx as nx
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    switches = max(count // 20, 2)
+    graph = nx.Graph()
+    graph.add_nodes_from(('s' + str(i) for i in range(switches)), type='Switch')
+    for i in range(1, switches):
+        graph.add_edge('s' + str(i), 's' + str(rng.integers(0, i)))
+    for _ in range(switches // 10):
+        first, second = rng.integers(0, switches, 2)
+        if first != second:
+            graph.add_edge('s' + str(first), 's' + str(second))
+    for i in range(count - switches):
+        graph.add_node('h' + str(i), type='Host')
+        graph.add_edge('h' + str(i), 's' + str(rng.integers(0, switches)))
+    return graph
+
+
+def measure(engine, count):
+    """
+    Lays out one generated network with one engine
+    :param engine: the name of the layout engine
+    :param count: the number of nodes in the network
+    :return: a dict with the seconds taken and the peak traced memory in MB
+    """
+    import django
+    django.setup()
+    from gui import layout
+
+    graph = make_network(count)
+    tracemalloc.start()
+    start = time.perf_counter()
+    layout.ENGINES[engine](graph)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'seconds': seconds, 'peak_mb': peak / 1e6}
+
+
+def main(sizes):
+    """
+    Runs every engine at every size and prints a table of the results
+    :param sizes: the node counts to measure
+    :return: None
+    """
+    print("{:>15} {:>8} {:>10} {:>12}".format("engine", "nodes", "seconds", "peak MB"))
+    for count in sizes:
+        for engine in ('kamada_kawai', 'force_directed', 'multilevel'):
+            if engine == 'kamada_kawai' and count > KAMADA_KAWAI_LIMIT:
+                print("{:>15} {:>8} {:>10} {:>12}".format(engine, count, "skipped", "n x n"))
+                continue
+            output = subprocess.run([sys.executable, __file__, '--measure', engine, str(count)],
+                                    stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print("{:>15} {:>8} {:>10.2f} {:>12.1f}".format(engine, count, result['seconds'], result['peak_mb']))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--measure':
+        print(json.dumps(measure(sys.argv[2], int(sys.argv[3]))))
+    else:
+        main([int(size) for size in sys.argv[1:]] or SIZES)
@@ -0,0 +1,465 @@
+"""
+This file predicts the results of Ping, iPerf and Ping All from the link parameters instead of
+running Mininet, so what-if questions can be answered in well under a second without root.
+It is the 'analytic' emulation backend, answering in the same format as Mininet.
+
+Traffic is assumed to follow the path with the fewest hops, as a tree network forwards it. Along it:
+ - delays add up, and a round trip crosses every link twice (Mininet delays each direction)
+ - the chances of a packet getting through each link multiply
+ - the bandwidth is that of the slowest link, and TCP reaches it when the smallest queue on the path
+   holds the bandwidth-delay product, or about 75% of it with no queue at all
+ - TCP throughput over a lossy path is limited to MSS / RTT * sqrt(3/2) / sqrt(loss) (the Mathis formula)
+Hosts hanging off a single switch are never passed through, so paths are only searched between
+the switches (and other nodes with several links) and the hosts are added at both ends.
+"""
+import contextlib
+import threading
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import shortest_path
+
+from . import emulation
+from . import routing
+from . import timings
+
+"""The TCP segment size iPerf sends, in bytes"""
+MSS = 1460
+
+"""Ping All predicts this many pairs at a time, to bound the memory it uses"""
+BLOCK_PAIRS = 1 << 20
+
+
+class PathModel:
+    """
+    This class holds the path metrics between the nodes of one topology version. Paths are only
+    searched from the core nodes that are asked about, and the results are kept for later questions.
+    """
+
+    def __init__(self, graph):
+        """
+        Creates a new PathModel object, splitting the nodes into leaves and the core
+        :param graph: the topology store
+        """
+        table = graph.links
+        columns = table.columns()
+        count = len(table.names)
+        self.ids = table.ids
+        first = columns['first'].astype(np.int64)
+        second = columns['second'].astype(np.int64)
+        delay = columns['delay'].astype(np.float64)
+        survival = 1.0 - np.clip(columns['loss'].astype(np.float64), 0.0, 100.0) / 100.0
+        bandwidth = columns['bandwidth'].astype(np.float64)
+        queue = columns['max_queue_size'].astype(np.float64)
+
+        # A leaf is reached through the node it hangs off (its anchor)
+        self.anchor, access = routing.leaf_anchors(table)
+        has_access = access >= 0
+        self.access_delay = np.where(has_access, delay[access], 0.0)
+        self.access_survival = np.where(has_access, survival[access], 1.0)
+        self.access_bandwidth = np.where(has_access, bandwidth[access], np.inf)
+        self.access_queue = np.where(has_access, queue[access], np.inf)
+        self.access_hops = has_access.astype(np.int64)
+
+        # The core is every other node, numbered from 0 in core_index
+        core = np.flatnonzero(~has_access)
+        self.core_index = np.full(count, -1)
+        self.core_index[core] = np.arange(len(core))
+        links = np.flatnonzero(~has_access[first] & ~has_access[second])
+        ends = (self.core_index[first[links]], self.core_index[second[links]])
+        rows = np.concatenate(ends)
+        cols = np.concatenate(ends[::-1])
+        self.size = len(core)
+        self.matrix = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(self.size, self.size))
+        # Each directed core link as a sorted key, to look up its parameters from its ends
+        keys = rows * max(self.size, 1) + cols
+        order = np.argsort(keys)
+        self.link_keys = keys[order]
+        self.link_rows = np.concatenate((links, links))[order]
+        self.delay = delay
+        self.survival = survival
+        self.bandwidth = bandwidth
+        self.queue = queue
+
+        self.sources = {}
+        self.lock = threading.Lock()
+
+    def search(self, sources):
+        """
+        Finds the path metrics from core nodes to every core node, keeping them in self.sources.
+        The metrics of a node are those of its predecessor on the path plus the link between them,
+        worked out for every node at the same hop count at once.
+        :param sources: the core indexes to search from
+        """
+        sources = np.array([source for source in np.unique(sources) if source not in self.sources], dtype=np.int64)
+        if len(sources) == 0:
+            return
+        hops, predecessors = shortest_path(self.matrix, directed=False, unweighted=True,
+                                           indices=sources, return_predecessors=True)
+        hops = np.atleast_2d(hops)
+        predecessors = np.atleast_2d(predecessors)
+        shape = hops.shape
+        delay = np.where(np.isinf(hops), np.inf, 0.0)
+        survival = np.where(np.isinf(hops), 0.0, 1.0)
+        bandwidth = np.full(shape, np.inf)
+        queue = np.full(shape, np.inf)
+
+        finite = hops[np.isfinite(hops)]
+        for level in range(1, int(finite.max()) + 1 if len(finite) else 1):
+            rows, cols = np.nonzero(hops == level)
+            previous = predecessors[rows, cols]
+            links = self.link_rows[np.searchsorted(self.link_keys, previous * self.size + cols)]
+            delay[rows, cols] = delay[rows, previous] + self.delay[links]
+            survival[rows, cols] = survival[rows, previous] * self.survival[links]
+            bandwidth[rows, cols] = np.minimum(bandwidth[rows, previous], self.bandwidth[links])
+            queue[rows, cols] = np.minimum(queue[rows, previous], self.queue[links])
+
+        for row, source in enumerate(sources):
+            self.sources[int(source)] = (hops[row], delay[row], survival[row], bandwidth[row], queue[row])
+
+    def predict(self, firsts, seconds):
+        """
+        Predicts the path metrics between pairs of nodes
+        :param firsts: a NumPy array of the link table ids of the first node of each pair
+        :param seconds: a NumPy array of the link table ids of the second node of each pair
+        :return: a dict of NumPy arrays with, for each pair, whether it is 'reachable', its 'hops',
+                 one-way 'delay' and 'rtt' in ms, one-way 'loss' and round trip 'rtt_loss' fractions,
+                 bottleneck 'bandwidth' and expected TCP 'throughput' in Mbits/sec, and smallest 'queue' in packets
+        """
+        first_core = self.core_index[self.anchor[firsts]]
+        second_core = self.core_index[self.anchor[seconds]]
+        sources, inverse = np.unique(first_core, return_inverse=True)
+        with self.lock:
+            self.search(sources)
+            tables = [np.stack([self.sources[int(source)][index] for source in sources]) if len(sources) else
+                      np.empty((0, self.size)) for index in range(5)]
+        hops, delay, survival, bandwidth, queue = (table[inverse, second_core] for table in tables)
+
+        # The access links of leaf hosts at both ends
+        hops = hops + self.access_hops[firsts] + self.access_hops[seconds]
+        delay = delay + self.access_delay[firsts] + self.access_delay[seconds]
+        survival = survival * self.access_survival[firsts] * self.access_survival[seconds]
+        bandwidth = np.minimum(np.minimum(bandwidth, self.access_bandwidth[firsts]), self.access_bandwidth[seconds])
+        queue = np.minimum(np.minimum(queue, self.access_queue[firsts]), self.access_queue[seconds])
+        reachable = np.isfinite(hops) & (firsts != seconds)
+
+        return dict(reachable=reachable, hops=hops, delay=delay, rtt=2 * delay, loss=1 - survival,
+                    rtt_loss=1 - survival ** 2, bandwidth=bandwidth, queue=queue,
+                    throughput=tcp_throughput(bandwidth, 2 * delay, 1 - survival, queue))
+
+
+def tcp_throughput(bandwidth, rtt, loss, queue):
+    """
+    Predicts the throughput of a TCP flow like the one iPerf sends
+    :param bandwidth: the bottleneck bandwidth in Mbits/sec
+    :param rtt: the round trip time in ms
+    :param loss: the chance of a packet being lost on the way
+    :param queue: the smallest queue along the path in packets
+    :return: the throughput in Mbits/sec
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # The queue needed to keep the bottleneck busy is the bandwidth-delay product
+        window = bandwidth * 1e6 * rtt / 1e3 / (8 * MSS)
+        utilisation = np.where(window > 0, np.minimum(1.0, 0.75 + 0.25 * queue / window), 1.0)
+        mathis = np.where((loss > 0) & (rtt > 0), MSS * 8 / (rtt / 1e3) * np.sqrt(1.5) / np.sqrt(loss) / 1e6, np.inf)
+    return np.where(np.isfinite(bandwidth), np.minimum(bandwidth * utilisation, mathis), 0.0)
+
+
+def get_model(graph):
+    """
+    Returns the PathModel of the current topology version, rebuilt when a link parameter changes
+    :param graph: the topology store
+    :return: the PathModel
+    """
+    return graph.cached('analytic-model', PathModel, params=True)
+
+
+def predict_pairs(graph, pairs):
+    """
+    Predicts the path metrics between pairs of nodes, see PathModel.predict. Nodes without any link are unreachable.
+    :param graph: the topology store
+    :param pairs: a list of (node name, node name) pairs
+    :return: a dict of NumPy arrays with the metrics of each pair
+    """
+    model = get_model(graph)
+    known = np.array([first in model.ids and second in model.ids for first, second in pairs], dtype=bool)
+    if not known.any():
+        return unreachable(len(pairs))
+    firsts = np.array([model.ids.get(first, 0) for first, second in pairs], dtype=np.int64)
+    seconds = np.array([model.ids.get(second, 0) for first, second in pairs], dtype=np.int64)
+    metrics = model.predict(firsts, seconds)
+    metrics['reachable'] &= known
+    return metrics
+
+
+def unreachable(count):
+    """
+    Returns the metrics of pairs that can't reach each other
+    :param count: the number of pairs
+    :return: a dict of NumPy arrays like PathModel.predict
+    """
+    metrics = dict(hops=np.inf, delay=np.inf, rtt=np.inf, loss=1.0, rtt_loss=1.0, bandwidth=0.0, queue=0.0,
+                   throughput=0.0)
+    metrics = {key: np.full(count, value) for key, value in metrics.items()}
+    metrics['reachable'] = np.zeros(count, dtype=bool)
+    return metrics
+
+
+def predict_matrix(graph, names):
+    """
+    Predicts the path metrics between every pair of the given nodes
+    :param graph: the topology store
+    :param names: the node names, such as every host
+    :return: a dict of len(names) x len(names) NumPy arrays, see PathModel.predict
+    """
+    model = get_model(graph)
+    count = len(names)
+    ids = np.array([model.ids.get(name, -1) for name in names], dtype=np.int64)
+    firsts = np.repeat(ids, count)
+    seconds = np.tile(ids, count)
+    known = (firsts >= 0) & (seconds >= 0)
+    if not known.any():
+        metrics = unreachable(count * count)
+    else:
+        metrics = model.predict(np.maximum(firsts, 0), np.maximum(seconds, 0))
+        metrics['reachable'] &= known
+    return {key: value.reshape(count, count) for key, value in metrics.items()}
+
+
+def received(metrics):
+    """
+    Returns which pairs a single ping gets an answer for, those whose round trip gets through more often than not
+    :param metrics: the metrics of the pairs
+    :return: a NumPy array of booleans
+    """
+    return metrics['reachable'] & (metrics['rtt_loss'] < 0.5)
+
+
+def format_rtt(first, second, ok, rtt, rtt_loss):
+    """
+    Returns the line giving the round trip time of a pair, in the format of Mininet's pingFull
+    :param first: the name of the first host
+    :param second: the name of the second host
+    :param ok: whether the ping is answered, see received
+    :param rtt: the predicted round trip time in ms
+    :param rtt_loss: the predicted chance the round trip is lost
+    :return: the line
+    """
+    if not ok:
+        return " %s->%s: 1/0, rtt min/avg/max/mdev 0.000/0.000/0.000/0.000 ms, predicted loss %.2f%%\n" % (
+            first, second, 100 * rtt_loss)
+    return " %s->%s: 1/1, rtt min/avg/max/mdev %.3f/%.3f/%.3f/0.000 ms, predicted loss %.2f%%\n" % (
+        first, second, rtt, rtt, rtt, 100 * rtt_loss)
+
+
+class AnalyticSession:
+    """
+    This class answers tests the same way EmulationSession does, predicting them instead of running Mininet
+    """
+
+    def __init__(self):
+        """
+        Creates a new AnalyticSession object
+        """
+        self.backend = 'analytic'
+
+    @contextlib.contextmanager
+    def use(self):
+        """
+        Predictions don't share any state, so nothing is held
+        """
+        yield
+
+    def interrupt(self, thread):
+        """
+        Predictions finish quickly, so they are never interrupted
+        :param thread: the id of the thread
+        :return: False
+        """
+        return False
+
+    def check(self, graph, names):
+        """
+        Raises an EmulationError if a host doesn't exist, as Mininet would fail to find it
+        :param graph: the topology store
+        :param names: the host names
+        """
+        for name in names:
+            if graph.get_host(name) is None:
+                raise emulation.EmulationError("No host named " + str(name))
+
+    def ping(self, graph, names):
+        """
+        Predicts a ping between hosts
+        :param graph: the topology store
+        :param names: the names of the hosts
+        :return: the text Mininet logs for the test, with the predicted round trip times
+        """
+        self.check(graph, names)
+        pairs = [(first, second) for first in names for second in names if first != second]
+        metrics = predict_pairs(graph, pairs)
+        answered = received(metrics)
+        lines = ["*** Ping: testing ping reachability\n"]
+        for first in names:
+            lines.append(first + " -> " + " ".join(second if answered[index] else "X"
+                                                  for index, (name, second) in enumerate(pairs)
+                                                  if name == first) + " \n")
+        lines.append(results_line(len(pairs), int(answered.sum())))
+        lines.extend(format_rtt(first, second, answered[index], metrics['rtt'][index], metrics['rtt_loss'][index])
+                     for index, (first, second) in enumerate(pairs))
+        return "".join(lines)
+
+    def iperf(self, graph, names):
+        """
+        Predicts an iPerf test between two hosts
+        :param graph: the topology store
+        :param names: the names of the two hosts
+        :return: the text Mininet logs for the test
+        """
+        self.check(graph, names)
+        if len(names) != 2:
+            raise emulation.EmulationError("iPerf tests two hosts")
+        metrics = predict_pairs(graph, [tuple(names)])
+        lines = "*** Iperf: testing TCP bandwidth between " + names[0] + " and " + names[1] + " \n"
+        if not received(metrics)[0]:
+            return lines + "*** Error: Could not connect to iperf on port 5001\n"
+        rate = "{:.2f} Mbits/sec".format(metrics['throughput'][0])
+        return lines + "*** Results: " + str([rate, rate]) + "\n"
+
+    def pingall(self, graph, on_line=None):
+        """
+        Predicts a ping between every pair of hosts, a block of hosts at a time. Like Mininet's pingAllFull,
+        the round trip time of each pair is logged after the results.
+        :param graph: the topology store
+        :param on_line: a function called with each line of the output
+        :return: the text Mininet logs for the test
+        """
+        names = [host.name for host in graph.get('hosts')]
+        model = get_model(graph)
+        ids = np.array([model.ids.get(name, -1) for name in names], dtype=np.int64)
+        lines = ["*** Ping: testing ping reachability\n"]
+        rtt_lines = []
+        answers = 0
+        step = max(1, BLOCK_PAIRS // max(1, len(names)))
+        for start in range(0, len(names), step):
+            block = ids[start:start + step]
+            firsts = np.repeat(block, len(ids))
+            seconds = np.tile(ids, len(block))
+            known = (firsts >= 0) & (seconds >= 0)
+            metrics = model.predict(np.maximum(firsts, 0), np.maximum(seconds, 0)) if known.any() else \
+                unreachable(len(firsts))
+            answered = (received(metrics) & known).reshape(len(block), len(ids))
+            rtts = metrics['rtt'].reshape(len(block), len(ids))
+            rtt_losses = metrics['rtt_loss'].reshape(len(block), len(ids))
+            answers += int(answered.sum())
+            for row, first in enumerate(names[start:start + step]):
+                line = first + " -> " + " ".join(second if answered[row, column] else "X"
+                                                 for column, second in enumerate(names)
+                                                 if column != start + row) + " \n"
+                lines.append(line)
+                if on_line is not None:
+                    on_line(line.rstrip("\n"))
+                rtt_lines.extend(format_rtt(first, second, ok, rtt, rtt_loss) for column, (second, ok, rtt, rtt_loss)
+                                 in enumerate(zip(names, answered[row].tolist(), rtts[row].tolist(),
+                                                  rtt_losses[row].tolist()))
+                                 if column != start + row)
+        lines.append(results_line(len(names) * (len(names) - 1), answers))
+        return "".join(lines + rtt_lines)
+
+    def run(self, graph, command, hosts=(), on_line=None, timing=None, check=None):
+        """
+        Predicts a test, see EmulationSession.run
+        :param graph: the topology store
+        :param command: one of 'ping', 'iperf' or 'pingall'
+        :param hosts: the names of the hosts to test between
+        :param on_line: a function called with each line of the output
+        :param timing: the timings.RunTimings that has the time spent predicting added as the test phase
+        :param check: a function that raises if the caller was stopped, see EmulationSession.use
+        :return: the predicted text Mininet would log for the test
+        """
+        if check is not None:
+            check()
+        with timings.measure(timing, 'test'):
+            if command == 'pingall':
+                return self.pingall(graph, on_line)
+            if command == 'ping':
+                output = self.ping(graph, list(hosts))
+            elif command == 'iperf':
+                output = self.iperf(graph, list(hosts))
+            else:
+                raise emulation.EmulationError("Unknown command: " + str(command))
+            log(output, on_line)
+            return output
+
+    def run_batch(self, graph, tests, on_line=None, check=None):
+        """
+        Predicts many tests, see EmulationSession.run_batch
+        :param graph: the topology store
+        :param tests: a list of (test, host name, host name) tuples, where test is 'ping' or 'iperf'
+        :param on_line: a function called with each line of the output
+        :param check: a function that raises if the caller was stopped, see EmulationSession.use
+        :return: a list with a dict of 'ok' and 'output' or 'error' for each test
+        """
+        if check is not None:
+            check()
+        results = []
+        for test in tests:
+            try:
+                if test[0] not in ('ping', 'iperf'):
+                    raise emulation.EmulationError("Unknown test: " + str(test[0]))
+                results.append({'ok': True, 'output': self.run(graph, test[0], test[1:], on_line)})
+            except emulation.EmulationError as error:
+                results.append({'ok': False, 'error': str(error)})
+        return results
+
+    def run_iperf_groups(self, graph, groups, seconds, on_line=None, check=None):
+        """
+        Predicts iPerf tests in groups, see EmulationSession.run_iperf_groups. The pairs of a group share
+        no link, so they don't change each other's predictions.
+        :param graph: the topology store
+        :param groups: a list of groups, each a list of (host name, host name) pairs
+        :param seconds: how long each test would send traffic for, which doesn't change the prediction
+        :param on_line: a function called with each line of the output
+        :param check: a function that raises if the caller was stopped, see EmulationSession.use
+        :return: a list for each group with a dict of 'ok', 'output' or 'error' and 'seconds' for each pair
+        """
+        if check is not None:
+            check()
+        output = []
+        for group in groups:
+            results = []
+            for pair in group:
+                start = time.perf_counter()
+                result = self.run_batch(graph, [('iperf',) + tuple(pair)], on_line)[0]
+                result['seconds'] = time.perf_counter() - start
+                results.append(result)
+            output.append(results)
+        return output
+
+    def close(self):
+        """
+        There is no worker to stop
+        """
+
+
+def results_line(sent, answers):
+    """
+    Returns the last line Mininet logs for a ping
+    :param sent: the number of pings sent
+    :param answers: the number of pings answered
+    :return: the line
+    """
+    dropped = 100.0 * (sent - answers) / sent if sent else 0.0
+    return "*** Results: " + "{:.0f}".format(dropped) + "% dropped (" + str(answers) + "/" + str(sent) + " received)\n"
+
+
+def log(text, on_line):
+    """
+    Passes each line of text to on_line, as the emulation worker does while a command runs
+    :param text: the text
+    :param on_line: a function called with each line, or None
+    """
+    if on_line is not None:
+        for line in text.splitlines():
+            on_line(line)
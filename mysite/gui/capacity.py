@@ -0,0 +1,299 @@
+"""
+This file predicts the throughput to expect between hosts from the link bandwidths, before paying
+for an iPerf run. For every pair of hosts it finds the bandwidth of the widest path (the path whose
+slowest link is as fast as possible), and for a single pair the maximum flow over every path at once.
+
+The widest path between two nodes runs along the maximum spanning forest of the bandwidths, so the
+forest is built with Kruskal's algorithm: links are joined from the fastest down, and when a link joins
+two trees, it is the bottleneck of every pair with one node in each tree. Those pairs are filled in as
+one block of the matrix, so each pair is only written once.
+"""
+import threading
+
+import numpy as np
+from django.conf import settings
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import maximum_flow
+
+from . import routing
+
+"""Networks with more hosts than this don't show their widest path bandwidths in the hover text"""
+HOVER_MAX_HOSTS = 5000
+
+"""Bandwidths are rounded to this fraction of a Mbit/s for the maximum flow, which needs whole numbers"""
+FLOW_RESOLUTION = 1000
+
+
+class CapacityMatrix:
+    """
+    This class holds the widest path bandwidth between the hosts of one topology version.
+    Like routing.LatencyMatrix, it works on the nodes hosts hang off (their anchors), and each
+    host's own link is taken into account at both ends.
+    """
+
+    def __init__(self, graph):
+        """
+        Creates a new CapacityMatrix object, finding the widest paths between the anchors of every host
+        :param graph: the topology store
+        """
+        self.table = table = graph.links
+        self.names = [host.name for host in graph.get('hosts')]
+        self.lock = threading.Lock()
+        self.flows = None
+        self.ranges = None
+        self.hover = None
+        columns = table.columns()
+        count = len(table.names)
+        first = columns['first'].astype(np.int64)
+        second = columns['second'].astype(np.int64)
+        bandwidth = columns['bandwidth'].astype(np.float64)
+        self.anchor, access = routing.leaf_anchors(table)
+
+        self.ids = np.array([table.ids.get(name, -1) for name in self.names], dtype=np.int64)
+        known = self.ids >= 0
+        # The bandwidth of each host's own link, or inf for hosts that aren't leaves
+        self.access = np.full(len(self.names), np.inf)
+        host_access = access[self.ids[known]]
+        self.access[known] = np.where(host_access >= 0, bandwidth[host_access], np.inf)
+        self.sources = np.unique(self.anchor[self.ids[known]])
+        self.source_row = np.full(count, -1)
+        self.source_row[self.sources] = np.arange(len(self.sources))
+
+        # Kruskal's algorithm over the links between the nodes that aren't leaves, fastest first
+        self.widest = np.zeros((len(self.sources), len(self.sources)), dtype=np.float32)
+        np.fill_diagonal(self.widest, np.inf)
+        core = (access[first] < 0) & (access[second] < 0) & (first != second)
+        parent = list(range(count))
+        members = {int(source): [row] for row, source in enumerate(self.sources)}
+        for row in np.flatnonzero(core)[np.argsort(-bandwidth[core], kind='stable')]:
+            a = find(parent, int(first[row]))
+            b = find(parent, int(second[row]))
+            if a == b:
+                continue
+            a_members = members.pop(a, [])
+            b_members = members.pop(b, [])
+            if len(a_members) < len(b_members):
+                a, b = b, a
+                a_members, b_members = b_members, a_members
+            parent[b] = a
+            if a_members and b_members:
+                self.widest[np.ix_(a_members, b_members)] = bandwidth[row]
+                self.widest[np.ix_(b_members, a_members)] = bandwidth[row]
+            a_members.extend(b_members)
+            members[a] = a_members
+
+    def matrix(self):
+        """
+        Returns the widest path bandwidth between every pair of hosts
+        :return: a len(names) x len(names) NumPy array in Mbits/sec, 0 for hosts that can't reach each
+                 other and inf on the diagonal
+        """
+        rows = self.host_rows()
+        known = np.flatnonzero(rows >= 0)
+        access = self.access[known]
+        widest = np.zeros((len(self.names), len(self.names)))
+        widest[np.ix_(known, known)] = np.minimum(np.minimum(self.widest[np.ix_(rows[known], rows[known])],
+                                                             access[:, None]), access[None, :])
+        np.fill_diagonal(widest, np.inf)
+        return widest
+
+    def host_rows(self):
+        """
+        Returns the row of each host's anchor in the widest path bandwidths between the anchors
+        :return: a NumPy array with the row of each host, -1 for hosts without any link
+        """
+        known = self.ids >= 0
+        rows = np.full(len(self.names), -1, dtype=np.int64)
+        rows[known] = self.source_row[self.anchor[self.ids[known]]]
+        return rows
+
+    def bottleneck(self, first, second):
+        """
+        Returns the widest path bandwidth between two hosts
+        :param first: the name of the first host
+        :param second: the name of the second host
+        :return: the bandwidth in Mbits/sec, 0 if the hosts can't reach each other
+        """
+        index = {name: position for position, name in enumerate(self.names)}
+        a = index[first]
+        b = index[second]
+        if a == b:
+            return np.inf
+        if self.ids[a] < 0 or self.ids[b] < 0:
+            return 0.0
+        widest = self.widest[self.source_row[self.anchor[self.ids[a]]], self.source_row[self.anchor[self.ids[b]]]]
+        return float(min(widest, self.access[a], self.access[b]))
+
+    def max_flow(self, first, second):
+        """
+        Returns the maximum flow between two nodes, the throughput they could reach by spreading
+        traffic over every path between them. Links carry their bandwidth in each direction.
+        :param first: the name of the first node
+        :param second: the name of the second node
+        :return: the flow in Mbits/sec, 0 if the nodes can't reach each other
+        """
+        ids = self.table.ids
+        if first not in ids or second not in ids:
+            return 0.0
+        if first == second:
+            return np.inf
+        with self.lock:
+            if self.flows is None:
+                columns = self.table.columns()
+                ends = (columns['first'].astype(np.int64), columns['second'].astype(np.int64))
+                capacities = np.round(columns['bandwidth'].astype(np.float64) * FLOW_RESOLUTION).astype(np.int32)
+                count = len(self.table.names)
+                # Parallel links add their capacities
+                self.flows = csr_matrix((np.concatenate((capacities, capacities)),
+                                         (np.concatenate(ends), np.concatenate(ends[::-1]))),
+                                        shape=(count, count), dtype=np.int32)
+                self.flows.setdiag(0)
+                self.flows.eliminate_zeros()
+            flows = self.flows
+        return maximum_flow(flows, ids[first], ids[second]).flow_value / FLOW_RESOLUTION
+
+    def host_ranges(self):
+        """
+        Returns the lowest and highest widest path bandwidth from each host to the other hosts,
+        worked out from the anchors so the full host matrix is never built
+        :return: a tuple of two NumPy arrays in Mbits/sec, nan for hosts with no other host
+        """
+        with self.lock:
+            if self.ranges is not None:
+                return self.ranges
+            count = len(self.names)
+            anchors = len(self.sources)
+            # Right after hosts are added none of them may have a link yet
+            if anchors == 0:
+                self.ranges = np.full(count, np.nan), np.full(count, np.nan)
+                return self.ranges
+            rows = self.host_rows()
+            known = rows >= 0
+
+            # The hosts at each anchor: their slowest own link, and their two fastest
+            hosts = np.bincount(rows[known], minlength=anchors)
+            slowest = np.full(anchors, np.inf)
+            np.minimum.at(slowest, rows[known], self.access[known])
+            order = np.lexsort((-self.access, rows))
+            order = order[rows[order] >= 0]
+            starts = np.searchsorted(rows[order], np.arange(anchors))
+            fastest = np.where(hosts > 0, self.access[order[np.minimum(starts, len(order) - 1)]], -np.inf) \
+                if len(order) else np.full(anchors, -np.inf)
+            fastest_host = order[np.minimum(starts, len(order) - 1)] if len(order) else np.zeros(anchors, dtype=int)
+            second_fastest = np.where(hosts > 1, self.access[order[np.minimum(starts + 1, len(order) - 1)]], -np.inf) \
+                if len(order) else np.full(anchors, -np.inf)
+
+            # The other anchors, through the widest path between the anchors and the hosts' own links
+            widest = self.widest.astype(np.float64)
+            others = ~np.eye(anchors, dtype=bool)
+            low_other = np.where(others, np.minimum(widest, slowest[None, :]), np.inf).min(axis=1, initial=np.inf)
+            high_other = np.where(others, np.minimum(widest, fastest[None, :]), -np.inf).max(axis=1, initial=-np.inf)
+
+            low = np.full(count, np.nan)
+            high = np.full(count, np.nan)
+            hosts_at = hosts[rows[known]]
+            low_same = np.where(hosts_at > 1, slowest[rows[known]], np.inf)
+            high_same = np.where(hosts_at > 1, np.where(fastest_host[rows[known]] == np.flatnonzero(known),
+                                                         second_fastest[rows[known]], fastest[rows[known]]), -np.inf)
+            access = self.access[known]
+            low[known] = np.minimum(access, np.minimum(low_other[rows[known]], low_same))
+            high[known] = np.minimum(access, np.maximum(high_other[rows[known]], high_same))
+            # Hosts without any link can't reach anything, and nothing can reach them
+            if (~known).any():
+                low[known] = 0.0
+                high[known] = np.maximum(high[known], 0.0)
+                low[~known] = 0.0
+                high[~known] = 0.0
+            if count < 2:
+                low[:] = np.nan
+                high[:] = np.nan
+            low[np.isinf(low)] = np.nan
+            high[np.isinf(high)] = np.nan
+            self.ranges = low, high
+            return self.ranges
+
+    def hover_text(self):
+        """
+        Returns the line describing each host's widest path bandwidths, for the hover text of the graph
+        :return: a dict of host name to the line
+        """
+        if self.hover is not None:
+            return self.hover
+        low, high = self.host_ranges()
+        text = {}
+        for name, lowest, highest in zip(self.names, low, high):
+            if np.isnan(lowest):
+                continue
+            if lowest == highest:
+                text[name] = "Widest path to other hosts: " + format_rate(lowest)
+            else:
+                text[name] = "Widest path to other hosts: " + format_rate(lowest) + " - " + format_rate(highest)
+        self.hover = text
+        return text
+
+
+def find(parent, node):
+    """
+    Finds the root of the tree a node belongs to, shortening the way there for the next lookups
+    :param parent: the list of each node's parent, roots are their own parent
+    :param node: the node id
+    :return: the id of the root
+    """
+    root = node
+    while parent[root] != root:
+        root = parent[root]
+    while parent[node] != root:
+        parent[node], node = root, parent[node]
+    return root
+
+
+def format_rate(rate):
+    """
+    Formats a bandwidth
+    :param rate: the bandwidth in Mbits/sec
+    :return: the text, such as 9.5 Mbits/sec
+    """
+    return "{:g} Mbits/sec".format(float(rate))
+
+
+def get_capacity(graph):
+    """
+    Returns the CapacityMatrix of the current topology version, rebuilt when a link parameter changes
+    :param graph: the topology store
+    :return: the CapacityMatrix
+    """
+    return graph.cached('capacity', CapacityMatrix, params=True)
+
+
+def get_hover_text(graph):
+    """
+    Returns the line describing each host's widest path bandwidths, see CapacityMatrix.hover_text.
+    Networks with more than MINIGNC_CAPACITY_HOVER_MAX_HOSTS hosts have none, and their matrix is
+    only built when capacity.json asks for it, not for every figure.
+    :param graph: the topology store
+    :return: a dict of host name to the line
+    """
+    if len(graph.get('hosts')) > getattr(settings, 'MINIGNC_CAPACITY_HOVER_MAX_HOSTS', HOVER_MAX_HOSTS):
+        return {}
+    return get_capacity(graph).hover_text()
+
+
+def lossy_links(graph, first, second):
+    """
+    Returns the links with a defined loss along the path traffic takes between two nodes, see routing.hop_paths
+    :param graph: the topology store
+    :param first: the name of the first node
+    :param second: the name of the second node
+    :return: a list of the lossy links as (name, name) pairs, empty if there is no path
+    """
+    path = routing.hop_paths(graph, [(first, second)])[0]
+    if path is None:
+        return []
+    table = graph.links
+    loss = table.columns()['loss']
+    lossy = []
+    for a, b in zip(path, path[1:]):
+        row = table.find(table.names[a], table.names[b])
+        if loss[row] > 0:
+            lossy.append((table.names[a], table.names[b]))
+    return lossy
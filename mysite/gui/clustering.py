@@ -0,0 +1,175 @@
+"""
+This file groups the nodes of large networks into clusters so they can be graphed at a
+lower level of detail. Each cluster is an edge switch together with the hosts that are only
+linked to it, and is drawn as a single node until the user expands it.
+"""
+import numpy as np
+from django.conf import settings
+
+"""Networks with more nodes than this are graphed as clusters when the detail level is 'auto'"""
+CLUSTER_MIN_NODES = 20000
+
+"""The detail levels a graph can be requested at"""
+DETAIL_LEVELS = ('auto', 'clusters', 'full')
+
+"""How cluster nodes are drawn, so they stand out from hosts (red), switches (green) and controllers (blue)"""
+CLUSTER_COLOR = 'orange'
+CLUSTER_SIZE = 16
+NODE_SIZE = 10
+
+HOST = 1
+SWITCH = 2
+
+
+class ClusterHierarchy:
+    """
+    This class stores the clusters of a topology. Nodes are referred to by their id within the
+    topology's LinkTable, so a whole graph can be collapsed with array operations.
+    A hierarchy is built once per topology version, see get_hierarchy.
+    """
+
+    def __init__(self, graph):
+        """
+        Finds every host whose only link goes to a switch and groups it with that switch
+        :param graph: the topology store to find the clusters of
+        """
+        table = graph.links
+        columns = table.columns()
+        first = columns['first']
+        second = columns['second']
+        self.ids = dict(table.ids)
+
+        kinds = np.zeros(len(table.names), dtype=np.int8)
+        for node_id, name in enumerate(table.names):
+            if name in graph.hosts:
+                kinds[node_id] = HOST
+            elif name in graph.switches:
+                kinds[node_id] = SWITCH
+        degrees = table.degrees[:len(table.names)]
+
+        # A leaf link joins a host with no other links to a switch
+        first_leaf = (kinds[first] == HOST) & (degrees[first] == 1) & (kinds[second] == SWITCH)
+        second_leaf = (kinds[second] == HOST) & (degrees[second] == 1) & (kinds[first] == SWITCH)
+        leaf = first_leaf | second_leaf
+        hosts = np.where(first_leaf, first, second)[leaf]
+        switches = np.where(first_leaf, second, first)[leaf]
+
+        self.switch_ids, host_cluster = np.unique(switches, return_inverse=True)
+        self.names = [table.names[node_id] for node_id in self.switch_ids]
+        self.index = {name: cluster for cluster, name in enumerate(self.names)}
+        self.host_counts = np.bincount(host_cluster, minlength=len(self.names))
+        self.bandwidth = np.bincount(host_cluster, weights=columns['bandwidth'][leaf], minlength=len(self.names))
+
+        # The cluster of every node id, or -1 for nodes that are not part of a cluster.
+        # The extra slot at the end is looked up for names that have no id.
+        self.cluster_of = np.full(len(table.names) + 1, -1, dtype=np.intp)
+        self.cluster_of[hosts] = host_cluster
+        self.cluster_of[self.switch_ids] = np.arange(len(self.names))
+
+    def __len__(self):
+        """
+        Returns the number of clusters
+        """
+        return len(self.names)
+
+    def collapse(self, names, edges, expanded=()):
+        """
+        Collapses every cluster that isn't expanded into the node of its switch.
+        :param names: the node names, in the order of the rows of the position matrix
+        :param edges: an m x 2 array of the rows of the endpoints of every edge
+        :param expanded: the names of the clusters to keep expanded
+        :return: a tuple of (the rows of names still shown, an array of the edges between shown nodes
+                 as rows of the shown nodes, a dict of shown row to cluster for the collapsed clusters,
+                 a dict of shown row to cluster for the switches of expanded clusters)
+        """
+        count = len(names)
+        node_ids = np.fromiter((self.ids.get(name, -1) for name in names), dtype=np.intp, count=count)
+        cluster = self.cluster_of[node_ids]
+        is_expanded = np.zeros(len(self.names) + 1, dtype=bool)
+        for name in expanded:
+            if name in self.index:
+                is_expanded[self.index[name]] = True
+        is_expanded[-1] = True
+
+        # The row of the switch of every cluster, used as the row the cluster is drawn at
+        switch_row = np.full(len(self.names), -1, dtype=np.intp)
+        is_switch = (cluster >= 0) & (node_ids == np.append(self.switch_ids, -2)[cluster])
+        switch_row[cluster[is_switch]] = np.flatnonzero(is_switch)
+
+        collapsed = (cluster >= 0) & ~is_expanded[cluster] & ~is_switch
+        target = np.arange(count)
+        target[collapsed] = switch_row[cluster[collapsed]]
+        rows = np.flatnonzero(target == np.arange(count))
+        shown = np.full(count, -1, dtype=np.intp)
+        shown[rows] = np.arange(len(rows))
+
+        # Edges inside a collapsed cluster disappear and the rest are drawn once between the shown nodes
+        shown_edges = shown[target[edges]].reshape(-1, 2)
+        shown_edges = shown_edges[shown_edges[:, 0] != shown_edges[:, 1]]
+        shown_edges = np.unique(np.sort(shown_edges, axis=1), axis=0).reshape(-1, 2)
+
+        clusters = np.unique(cluster[collapsed])
+        collapsed_rows = dict(zip(shown[switch_row[clusters]].tolist(), clusters.tolist()))
+        expanded_clusters = np.flatnonzero(is_expanded[:-1] & (switch_row >= 0))
+        expanded_rows = dict(zip(shown[switch_row[expanded_clusters]].tolist(), expanded_clusters.tolist()))
+        return rows, shown_edges, collapsed_rows, expanded_rows
+
+    def get_hover_text(self, cluster):
+        """
+        Builds the text displayed when hovering over a collapsed cluster
+        :param cluster: the index of the cluster
+        :return: the hover text, using <br> for new lines
+        """
+        hosts = int(self.host_counts[cluster])
+        return "".join((self.names[cluster], " cluster | 1 switch, ", str(hosts), " host" if hosts == 1 else " hosts",
+                        "<br>Total link bandwidth: ", "{:g}".format(self.bandwidth[cluster]), " Mbps"))
+
+
+def get_hierarchy(graph):
+    """
+    Returns the clusters of a topology, building them only when the topology or a link parameter changed
+    since the last call, since each cluster's total link bandwidth is part of its hover text
+    :param graph: the topology store
+    :return: the ClusterHierarchy of the topology
+    """
+    return graph.cached('clusters', ClusterHierarchy, params=True)
+
+
+def use_clusters(detail, node_count):
+    """
+    Decides whether a graph should be drawn as clusters
+    :param detail: one of DETAIL_LEVELS, or None to use 'auto'
+    :param node_count: the number of nodes in the graph
+    :return: True if the graph should be drawn as clusters
+    """
+    detail = detail or 'auto'
+    if detail not in DETAIL_LEVELS:
+        raise ValueError("Unknown detail level: " + str(detail))
+    if detail == 'auto':
+        return node_count > getattr(settings, 'MINIGNC_CLUSTER_MIN_NODES', CLUSTER_MIN_NODES)
+    return detail == 'clusters'
+
+
+def set_cluster_text(hierarchy, node_trace, collapsed_rows, expanded_rows):
+    """
+    Marks the clusters within the node trace. Collapsed clusters get their own color, size and hover
+    text, and both collapsed clusters and the switches of expanded clusters carry the cluster name
+    in customdata so clicking them in the browser can expand or collapse them.
+    :param hierarchy: the ClusterHierarchy of the graph
+    :param node_trace: the trace dict that allows Plotly to graph the nodes of the network
+    :param collapsed_rows: a dict of node row to cluster for the collapsed clusters
+    :param expanded_rows: a dict of node row to cluster for the switches of expanded clusters
+    """
+    count = len(node_trace['text'])
+    sizes = [NODE_SIZE] * count
+    customdata = [""] * count
+    for row, cluster in collapsed_rows.items():
+        node_trace['marker']['color'][row] = CLUSTER_COLOR
+        node_trace['text'][row] = hierarchy.get_hover_text(cluster) + "<br>Click to expand"
+        sizes[row] = CLUSTER_SIZE
+        customdata[row] = hierarchy.names[cluster]
+    for row, cluster in expanded_rows.items():
+        node_trace['text'][row] += "<br>Click to collapse"
+        customdata[row] = hierarchy.names[cluster]
+    node_trace['marker']['size'] = sizes
+    node_trace['customdata'] = customdata
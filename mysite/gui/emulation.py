@@ -0,0 +1,252 @@
+"""
+This file keeps a long-lived emulation worker (mininet_worker.py) running, so the network is
+built once per topology version instead of being started and stopped for every test.
+Commands are sent to the worker as JSON lines over its stdin and stdout.
+"""
+import atexit
+import contextlib
+import json
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from . import scripts
+from . import timings
+
+"""The worker script, run as its own process"""
+WORKER_PATH = str(Path(__file__).resolve().parent / "mininet_worker.py")
+
+"""The emulation backends: Mininet under sudo and python2, the fake network for tests,
+or predictions from the link parameters (see analytic.py)"""
+BACKENDS = ('mininet', 'fake', 'analytic')
+
+"""The sudo password of the Mininet VM"""
+SUDO_PASSWORD = "Mininet"
+
+
+class EmulationError(Exception):
+    """
+    Raised when the worker can't run a command or stops responding
+    """
+
+
+class EmulationSession:
+    """
+    This class starts the worker and sends it commands. The network is rebuilt only when
+    the topology has changed since it was last built, which is tracked with the topology version.
+    Commands are sent one at a time, since the worker runs one network.
+    """
+
+    def __init__(self, backend='mininet'):
+        """
+        Creates a new EmulationSession object, the worker is started on the first command
+        :param backend: 'mininet' or 'fake', the analytic backend has its own session class
+        """
+        if backend not in BACKENDS[:2]:
+            raise ValueError("Unknown emulation backend: " + str(backend))
+        self.backend = backend
+        self.process = None
+        self.built = None
+        self.next_id = 0
+        self.lock = threading.Lock()
+        self.thread = None
+        self.launched = None
+
+    def command(self):
+        """
+        Returns the command line that starts the worker
+        :return: a list of the program and its arguments
+        """
+        if self.backend == 'fake':
+            return [sys.executable, WORKER_PATH, '--fake']
+        # -k makes sudo always read the password, so it never ends up in front of the worker
+        return ['sudo', '-S', '-k', 'python2', WORKER_PATH]
+
+    def start(self):
+        """
+        Starts the worker if it isn't running
+        :return: None
+        """
+        if self.process is not None and self.process.poll() is None:
+            return
+        self.built = None
+        self.launched = time.time()
+        self.process = subprocess.Popen(self.command(), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, universal_newlines=True, bufsize=1)
+        if self.backend == 'mininet':
+            password = getattr(settings, 'MINIGNC_SUDO_PASSWORD', SUDO_PASSWORD)
+            self.process.stdin.write(password + "\n")
+
+    @contextlib.contextmanager
+    def use(self, check=None):
+        """
+        Holds the session while a thread runs its commands, so they aren't mixed with another thread's
+        :param check: a function that raises if the caller was stopped, such as jobs.Job.check. It is called
+                      once the session is held, so a job cancelled while it waited for the session doesn't run.
+        """
+        with self.lock:
+            self.thread = threading.get_ident()
+            try:
+                # Called after the thread is recorded, so a job cancelled from now on is interrupted instead
+                if check is not None:
+                    check()
+                yield
+            finally:
+                self.thread = None
+
+    def interrupt(self, thread):
+        """
+        Kills the worker if the given thread is running a command on it, so a cancelled job stops
+        waiting. The command then fails with an EmulationError and the worker restarts on the next one.
+        :param thread: the id of the thread, from threading.get_ident
+        :return: True if the worker was killed
+        """
+        process = self.process
+        if self.thread != thread or process is None or process.poll() is not None:
+            return False
+        process.kill()
+        return True
+
+    def send(self, command, on_line=None, timing=None, **arguments):
+        """
+        Sends a command to the worker and waits for its response
+        :param command: the name of the command
+        :param on_line: a function called with each line the command logs, as soon as the worker sends it
+        :param timing: the timings.RunTimings that has the time the worker spent in each phase added
+        :param arguments: the arguments of the command
+        :return: the output of the command
+        """
+        self.start()
+        self.next_id += 1
+        request = dict(arguments, id=self.next_id, cmd=command)
+        try:
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            pass
+        while True:
+            try:
+                line = self.process.stdout.readline()
+            except (BrokenPipeError, OSError):
+                line = ""
+            if not line:
+                self.close()
+                raise EmulationError("The emulation worker stopped while running " + command)
+            response = json.loads(line)
+            if 'log' not in response:
+                break
+            if on_line is not None:
+                on_line(response['log'])
+        if timing is not None:
+            # The first response of a worker has the time it was ready to answer, the rest only the phases it ran
+            if 'ready' in response:
+                timing.add('startup', response['ready'] - self.launched)
+            for phase, seconds in response.get('timings', {}).items():
+                timing.add(phase, seconds)
+        if not response['ok']:
+            raise EmulationError(response['error'])
+        return response['output']
+
+    def sync(self, graph, on_line=None, timing=None):
+        """
+        Builds the network in the worker if the topology changed since it was last built
+        :param graph: the topology store
+        :param on_line: a function called with each line logged while building the network
+        :param timing: the timings.RunTimings that has the time spent generating the script and building the network added
+        :return: None
+        """
+        # Link parameters are part of the script, so changing one rebuilds the network too
+        version = (id(graph), graph.version, graph.links.param_version)
+        if self.built == version and self.process is not None and self.process.poll() is None:
+            return
+        with timings.measure(timing, 'generate'):
+            script = scripts.network_script(graph)
+        self.send('build', on_line, timing, script=script, hosts=[host.name for host in graph.get('hosts')])
+        self.built = version
+
+    def run(self, graph, command, hosts=(), on_line=None, timing=None, check=None):
+        """
+        Runs a test on the network, building it first if needed
+        :param graph: the topology store
+        :param command: one of 'ping', 'iperf' or 'pingall'
+        :param hosts: the names of the hosts to test between
+        :param on_line: a function called with each line Mininet logs while the test runs
+        :param timing: the timings.RunTimings that has the time spent in each phase of the run added
+        :param check: a function that raises if the caller was stopped while it waited for the session, see use
+        :return: the text Mininet logged for the test
+        """
+        with self.use(check):
+            self.sync(graph, on_line, timing)
+            if command == 'pingall':
+                return self.send(command, on_line, timing)
+            return self.send(command, on_line, timing, hosts=list(hosts))
+
+    def run_batch(self, graph, tests, on_line=None, check=None):
+        """
+        Runs many tests on the network in a single command, building it first if needed
+        :param graph: the topology store
+        :param tests: a list of (test, host name, host name) tuples, where test is 'ping' or 'iperf'
+        :param on_line: a function called with each line Mininet logs while the tests run
+        :param check: a function that raises if the caller was stopped while it waited for the session, see use
+        :return: a list with a dict of 'ok' and 'output' or 'error' for each test
+        """
+        with self.use(check):
+            self.sync(graph, on_line)
+            return self.send('batch', on_line, tests=[list(test) for test in tests])
+
+    def run_iperf_groups(self, graph, groups, seconds, on_line=None, check=None):
+        """
+        Runs iperf tests in groups, testing the pairs of each group at the same time
+        :param graph: the topology store
+        :param groups: a list of groups, each a list of (host name, host name) pairs that share no host
+        :param seconds: how long each test sends traffic for
+        :param on_line: a function called with each line logged as the tests finish
+        :param check: a function that raises if the caller was stopped while it waited for the session, see use
+        :return: a list for each group with a dict of 'ok', 'output' or 'error' and 'seconds' for each pair
+        """
+        with self.use(check):
+            self.sync(graph, on_line)
+            return self.send('iperf_groups', on_line, groups=[[list(pair) for pair in group] for group in groups],
+                             seconds=seconds)
+
+    def close(self):
+        """
+        Stops the network and the worker
+        :return: None
+        """
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.write(json.dumps({'id': 0, 'cmd': 'stop'}) + "\n")
+                self.process.stdin.close()
+                self.process.wait(timeout=30)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+        self.process = None
+        self.built = None
+
+
+"""The session shared by the GUI, created on first use"""
+session = None
+
+
+def get_session():
+    """
+    Returns the session shared by the GUI, using the backend set by MINIGNC_EMULATION_BACKEND
+    :return: the EmulationSession, or an analytic.AnalyticSession for the analytic backend
+    """
+    global session
+    if session is None:
+        backend = getattr(settings, 'MINIGNC_EMULATION_BACKEND', 'mininet')
+        if backend == 'analytic':
+            from . import analytic
+            session = analytic.AnalyticSession()
+        else:
+            session = EmulationSession(backend)
+        atexit.register(session.close)
+    return session
@@ -0,0 +1,295 @@
+"""
+This file runs emulation work (tests and test plans) in the background, so a
+request only has to queue a job and return its id instead of waiting for Mininet.
+Jobs run on a bounded pool of threads, and their results are kept in a bounded store where the GUI
+polls for them. Jobs don't write any files: tests run on the network kept by the emulation worker,
+and as it holds a single network, its session runs one job's commands at a time (see
+emulation.EmulationSession.use). Only jobs on the analytic backend run at the same time.
+"""
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import streaming
+
+"""How many jobs run at the same time at most. Jobs on the emulation backend still wait for each other's session."""
+WORKERS = 2
+
+"""How many seconds a job may run before it is cancelled, None for no limit"""
+TIMEOUT = 600
+
+"""How many finished jobs are kept in the results store"""
+HISTORY = 100
+
+"""The states of a job, the last four are final"""
+STATUSES = ('queued', 'running', 'done', 'failed', 'cancelled', 'timeout')
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job when it was cancelled or timed out
+    """
+
+
+class Job:
+    """
+    This class holds the state of one job: its status, result and output,
+    along with what to do to stop it while it runs.
+    """
+
+    def __init__(self, kind, description=""):
+        """
+        Creates a new queued Job object
+        :param kind: what the job does, such as 'ping' or 'testplan'
+        :param description: a line describing the job in the output panel
+        """
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.description = description
+        self.status = 'queued'
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.timeout = None
+        self.timer = None
+        self.future = None
+        self.stoppers = []
+        self.lock = threading.Lock()
+        self.output = streaming.OutputBuffer(getattr(settings, 'MINIGNC_STREAM_BUFFER_LINES',
+                                                     streaming.BUFFER_LINES))
+
+    def is_finished(self):
+        """
+        Returns whether the job has reached a final state
+        :return: True if the job is done, failed, cancelled or timed out
+        """
+        return self.status in STATUSES[2:]
+
+    def check(self):
+        """
+        Raises JobCancelled if the job was cancelled or timed out, jobs call it between steps
+        """
+        if self.status in ('cancelled', 'timeout'):
+            raise JobCancelled("The job was " + ("cancelled" if self.status == 'cancelled' else "timed out"))
+
+    def on_stop(self, stopper):
+        """
+        Registers a function called when the job is cancelled while it runs, such as one
+        that kills the process the job is waiting for. It is called right away if the job
+        was already cancelled.
+        :param stopper: a function taking no arguments
+        """
+        with self.lock:
+            self.stoppers.append(stopper)
+            stopped = self.status in ('cancelled', 'timeout')
+        if stopped:
+            stopper()
+
+    def stop(self, status):
+        """
+        Marks the job as cancelled or timed out and calls its stoppers
+        :param status: 'cancelled' or 'timeout'
+        :return: True if the job was stopped, False if it had already finished
+        """
+        with self.lock:
+            if self.is_finished():
+                return False
+            self.status = status
+            self.finished = time.time()
+            stoppers = list(self.stoppers)
+        for stopper in stoppers:
+            try:
+                stopper()
+            except Exception:
+                traceback.print_exc()
+        return True
+
+    def stop_session(self, session):
+        """
+        Interrupts an emulation session if the job is stopped while this thread runs a command on it
+        :param session: the EmulationSession the job uses
+        """
+        thread = threading.get_ident()
+        self.on_stop(lambda: session.interrupt(thread))
+
+    def to_dict(self):
+        """
+        Returns the state of the job for the status endpoint
+        :return: a dict that can be sent as JSON
+        """
+        now = self.finished or time.time()
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'description': self.description,
+            'status': self.status,
+            'finished': self.is_finished(),
+            'created': self.created,
+            'seconds': now - self.started if self.started else 0.0,
+            'timeout': self.timeout,
+            'result': self.result,
+            'error': self.error,
+        }
+
+
+class JobQueue:
+    """
+    This class runs jobs on a bounded pool of threads and keeps their results. A job that runs
+    for longer than its timeout is stopped as if it was cancelled. Only the most recent finished
+    jobs are kept, so the store can't grow without bound.
+    """
+
+    def __init__(self, workers=WORKERS, history=HISTORY):
+        """
+        Creates a new JobQueue object
+        :param workers: how many jobs run at the same time at most
+        :param history: how many finished jobs are kept
+        """
+        if workers < 1:
+            raise ValueError("A job queue needs at least 1 worker")
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='minignc-job')
+        self.history = history
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, kind, function, *args, description="", timeout=None):
+        """
+        Queues a job. The function is called on a worker thread with the Job as its first argument,
+        and what it returns becomes the result of the job, so it should be something that can be sent as JSON.
+        :param kind: what the job does, such as 'ping' or 'testplan'
+        :param function: the function that does the work
+        :param args: the rest of the arguments of the function
+        :param description: a line describing the job in the output panel
+        :param timeout: how many seconds the job may run, defaults to MINIGNC_JOB_TIMEOUT
+        :return: the Job
+        """
+        job = Job(kind, description)
+        job.timeout = getattr(settings, 'MINIGNC_JOB_TIMEOUT', TIMEOUT) if timeout is None else timeout
+        with self.lock:
+            self.jobs[job.id] = job
+            self.evict()
+        job.future = self.executor.submit(self.run, job, function, args)
+        return job
+
+    def run(self, job, function, args):
+        """
+        Runs a job on a worker thread
+        :param job: the Job
+        :param function: the function that does the work
+        :param args: the rest of the arguments of the function
+        """
+        with job.lock:
+            if job.is_finished():
+                job.output.close()
+                return
+            job.status = 'running'
+            job.started = time.time()
+        self.set_timeout(job.id, job.timeout)
+        try:
+            result = function(job, *args)
+            with job.lock:
+                if not job.is_finished():
+                    job.result = result
+                    job.status = 'done'
+        except JobCancelled:
+            pass
+        except Exception as error:
+            with job.lock:
+                if not job.is_finished():
+                    job.error = str(error) or type(error).__name__
+                    job.status = 'failed'
+        finally:
+            with job.lock:
+                if job.finished is None:
+                    job.finished = time.time()
+                if job.timer is not None:
+                    job.timer.cancel()
+            job.output.close()
+
+    def get(self, job_id):
+        """
+        Returns a job from the store
+        :param job_id: the id of the job
+        :return: the Job, or None if there is no job with this id
+        """
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        """
+        Returns the jobs in the store, oldest first
+        :return: a list of Jobs
+        """
+        with self.lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id, status='cancelled'):
+        """
+        Stops a job. A queued job never starts and a running one has its stoppers called.
+        :param job_id: the id of the job
+        :param status: 'cancelled', or 'timeout' when the job ran out of time
+        :return: True if the job was stopped, False if it had already finished or doesn't exist
+        """
+        job = self.get(job_id)
+        if job is None or not job.stop(status):
+            return False
+        if job.future is not None and job.future.cancel():
+            job.output.close()
+        return True
+
+    def set_timeout(self, job_id, seconds):
+        """
+        Sets how long a job may run, counted from when it started. A queued job starts counting once it runs.
+        :param job_id: the id of the job
+        :param seconds: the number of seconds, or None for no limit
+        :return: True if the timeout was set, False if the job had already finished or doesn't exist
+        """
+        job = self.get(job_id)
+        if job is None:
+            return False
+        with job.lock:
+            if job.is_finished():
+                return False
+            job.timeout = seconds
+            if job.timer is not None:
+                job.timer.cancel()
+                job.timer = None
+            if job.started is None or seconds is None:
+                return True
+            remaining = max(0.0, job.started + seconds - time.time())
+            job.timer = threading.Timer(remaining, self.cancel, (job.id, 'timeout'))
+            job.timer.daemon = True
+            job.timer.start()
+        return True
+
+    def evict(self):
+        """
+        Removes the oldest finished jobs while the store holds more than the history limit.
+        Jobs that haven't finished are never removed. The caller holds the lock.
+        """
+        excess = len(self.jobs) - self.history
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.is_finished()][:max(0, excess)]:
+            del self.jobs[job_id]
+
+
+"""The queue shared by the GUI, created on first use"""
+queue = None
+
+
+def get_queue():
+    """
+    Returns the queue shared by the GUI, with MINIGNC_JOB_WORKERS workers keeping MINIGNC_JOB_HISTORY finished jobs
+    :return: the JobQueue
+    """
+    global queue
+    if queue is None:
+        queue = JobQueue(getattr(settings, 'MINIGNC_JOB_WORKERS', WORKERS),
+                         getattr(settings, 'MINIGNC_JOB_HISTORY', HISTORY))
+    return queue
@@ -0,0 +1,819 @@
+"""
+This file computes the positions used to graph the network and caches them so an
+unchanged or previously seen network does not have to be laid out again
+"""
+import hashlib
+import os
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import networkx as nx
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+"""Graphs up to this many nodes are laid out with Kamada Kawai when the engine is picked automatically"""
+KAMADA_KAWAI_MAX_NODES = 500
+
+"""Graphs up to this many nodes are laid out with the sparse force-directed engine, larger ones with multilevel"""
+FORCE_DIRECTED_MAX_NODES = 5000
+
+"""Iterations run by the sparse force-directed engine"""
+FORCE_ITERATIONS = 100
+
+"""Iterations run on each level when the multilevel engine expands a coarsened graph"""
+LEVEL_ITERATIONS = 30
+
+"""The multilevel engine stops coarsening once a graph has this many nodes"""
+COARSEST_SIZE = 100
+
+"""Components with at least this many nodes are laid out on the process pool"""
+PARALLEL_MIN_NODES = 200
+
+"""Refinement iterations used when a layout is warm-started from the previous render"""
+REFINE_ITERATIONS = 50
+
+"""Largest share of the nodes that may be new or touch a changed link for a warm start to be used"""
+MAX_CHANGED_FRACTION = 0.3
+
+
+def topology_fingerprint(nx_graph):
+    """
+    Computes a canonical hash of the nodes and edges of a graph. The hash does not depend on
+    the order nodes and links were added in, or on which end of a link was given first.
+    :param nx_graph: The object used to represent the network
+    :return: a hex string identifying the structure of the graph
+    """
+    digest = hashlib.sha1()
+    for name, node_type in sorted((str(node), str(data.get('type', ''))) for node, data in nx_graph.nodes(data=True)):
+        digest.update(name.encode())
+        digest.update(b'\x1f')
+        digest.update(node_type.encode())
+        digest.update(b'\x1e')
+    digest.update(b'\x1d')
+    for first, second in sorted(tuple(sorted((str(u), str(v)))) for u, v in nx_graph.edges()):
+        digest.update(first.encode())
+        digest.update(b'\x1f')
+        digest.update(second.encode())
+        digest.update(b'\x1e')
+    return digest.hexdigest()
+
+
+class LayoutCache:
+    """
+    This class is an LRU cache of graph layouts keyed on a topology fingerprint. Entries that
+    fall out of memory can optionally be kept on disk as .npz files so a previously seen
+    network is still found after an eviction or a server restart.
+    """
+    def __init__(self, max_entries=32, directory=None):
+        """
+        Creates a new LayoutCache object
+        :param max_entries: the number of layouts kept in memory
+        :param directory: the directory used for the on-disk tier, or None to keep layouts in memory only
+        :return: None
+        """
+        self.max_entries = max_entries
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        """
+        Returns the number of layouts kept in memory
+        """
+        return len(self.entries)
+
+    def _path(self, key):
+        """
+        Returns the file an entry is stored in within the on-disk tier
+        :param key: the cache key
+        :return: the path of the .npz file
+        """
+        return os.path.join(self.directory, key + '.npz')
+
+    def get(self, key):
+        """
+        Returns the cached layout for a key, checking memory first and then the disk
+        :param key: the cache key
+        :return: a dict of node name to position or None if the layout isn't cached
+        """
+        positions = self.entries.get(key)
+        if positions is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return positions
+
+        if self.directory is not None and os.path.exists(self._path(key)):
+            with np.load(self._path(key), allow_pickle=False) as data:
+                positions = dict(zip(data['names'].tolist(), data['positions']))
+            self._remember(key, positions)
+            self.hits += 1
+            return positions
+
+        self.misses += 1
+        return None
+
+    def put(self, key, positions):
+        """
+        Stores a layout in memory and, if enabled, on disk
+        :param key: the cache key
+        :param positions: a dict of node name to position
+        :return: None
+        """
+        self._remember(key, positions)
+        if self.directory is not None:
+            names = np.array([str(name) for name in positions.keys()])
+            coordinates = np.array(list(positions.values()), dtype=np.float64).reshape(len(positions), 2)
+            # Written to a temporary file first so a reader never sees a partial file
+            temp_path = self._path(key) + '.tmp.npz'
+            np.savez(temp_path, names=names, positions=coordinates)
+            os.replace(temp_path, self._path(key))
+
+    def _remember(self, key, positions):
+        """
+        Stores a layout in memory, evicting the least recently used layouts if needed
+        :param key: the cache key
+        :param positions: a dict of node name to position
+        :return: None
+        """
+        self.entries[key] = positions
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes every layout kept in memory
+        :return: None
+        """
+        self.entries.clear()
+
+
+"""The layout cache shared by every render"""
+layout_cache = LayoutCache(getattr(settings, 'MINIGNC_LAYOUT_CACHE_SIZE', 32),
+                           getattr(settings, 'MINIGNC_LAYOUT_CACHE_DIR', None))
+
+
+def kamada_kawai(nx_graph):
+    """
+    Uses NetworkX's Kamada Kawai layout to generate positions for graph nodes.
+    For more information on how this works, look into Force directed graphs.
+    It needs a dense n x n distance matrix, so it is only used for small graphs.
+    :param nx_graph: The object used to represent the network
+    :return: a dict of node name to position
+    """
+    return nx.kamada_kawai_layout(nx_graph, weight=None)
+
+
+def adjacency_matrix(nx_graph, nodelist):
+    """
+    Builds the symmetric, unweighted sparse adjacency matrix of a graph without self loops
+    :param nx_graph: The object used to represent the network
+    :param nodelist: the order of the rows and columns
+    :return: a scipy CSR matrix
+    """
+    adjacency = nx.to_scipy_sparse_array(nx_graph, nodelist=nodelist, weight=None, format='csr')
+    adjacency = sparse.csr_matrix(adjacency, dtype=np.float64)
+    adjacency.setdiag(0)
+    adjacency.eliminate_zeros()
+    adjacency.data[:] = 1.0
+    return adjacency
+
+
+def force_refine(adjacency, positions, iterations=FORCE_ITERATIONS, temperature=None):
+    """
+    Runs Fruchterman-Reingold style iterations on whole arrays at once. Links pull their
+    endpoints together and nodes push each other apart, but only nodes closer than twice the
+    ideal link length repel, found with a KD-tree, so each iteration costs O(n log n)
+    time and O(n + links) memory instead of O(n^2).
+    :param adjacency: the sparse adjacency matrix of the graph
+    :param positions: an n x 2 array of starting positions, in the unit square
+    :param iterations: the number of iterations to run
+    :param temperature: the largest step of the first iteration, defaults to a tenth of the square
+    :return: the n x 2 array of refined positions
+    """
+    count = positions.shape[0]
+    if count < 2 or iterations <= 0:
+        return positions
+    length = 1.0 / np.sqrt(count)
+    if temperature is None:
+        temperature = 0.1
+    cooling = temperature / (iterations + 1)
+    upper = sparse.triu(adjacency, k=1).tocoo()
+    sources = upper.row
+    targets = upper.col
+
+    for iteration in range(iterations):
+        displacement = np.zeros_like(positions)
+
+        # Repulsion between nearby pairs of nodes
+        pairs = cKDTree(positions).query_pairs(2.0 * length, output_type='ndarray')
+        if len(pairs):
+            delta = positions[pairs[:, 0]] - positions[pairs[:, 1]]
+            distance_squared = np.maximum(np.einsum('ij,ij->i', delta, delta), 1e-12)
+            push = delta * (length * length / distance_squared)[:, None]
+            for axis in range(2):
+                displacement[:, axis] += np.bincount(pairs[:, 0], push[:, axis], count)
+                displacement[:, axis] -= np.bincount(pairs[:, 1], push[:, axis], count)
+
+        # Attraction along links
+        if len(sources):
+            delta = positions[sources] - positions[targets]
+            distance = np.sqrt(np.einsum('ij,ij->i', delta, delta))
+            pull = delta * (distance / length)[:, None]
+            for axis in range(2):
+                displacement[:, axis] -= np.bincount(sources, pull[:, axis], count)
+                displacement[:, axis] += np.bincount(targets, pull[:, axis], count)
+
+        size = np.maximum(np.sqrt(np.einsum('ij,ij->i', displacement, displacement)), 1e-12)
+        positions = positions + displacement * (np.minimum(size, temperature) / size)[:, None]
+        temperature -= cooling
+
+    return positions
+
+
+def normalize(positions):
+    """
+    Centers positions on the origin and scales them into [-1, 1], the range Kamada Kawai returns
+    :param positions: an n x 2 array of positions
+    :return: the n x 2 array of scaled positions
+    """
+    if len(positions) == 0:
+        return positions
+    positions = positions - positions.mean(axis=0)
+    extent = np.abs(positions).max()
+    if extent > 0:
+        positions = positions / extent
+    return positions
+
+
+def force_directed(nx_graph):
+    """
+    Lays out a graph with the sparse force-directed engine, starting from random positions
+    :param nx_graph: The object used to represent the network
+    :return: a dict of node name to position
+    """
+    nodelist = list(nx_graph.nodes())
+    rng = np.random.default_rng(0)
+    positions = force_refine(adjacency_matrix(nx_graph, nodelist), rng.random((len(nodelist), 2)))
+    return dict(zip(nodelist, normalize(positions)))
+
+
+def coarsen(adjacency, rng):
+    """
+    Merges a graph into a smaller one. Nodes are first paired with an unmatched neighbour,
+    then nodes that found no partner join the group of one of their neighbours, so hubs with
+    many leaves (like a switch with its hosts) shrink as well.
+    :param adjacency: the sparse adjacency matrix of the graph
+    :param rng: the random generator used to pick the visiting order
+    :return: an array giving the coarse node every node was merged into
+    """
+    count = adjacency.shape[0]
+    indptr = adjacency.indptr
+    indices = adjacency.indices
+    group = np.full(count, -1, dtype=np.int64)
+    groups = 0
+    for node in rng.permutation(count):
+        if group[node] != -1:
+            continue
+        for neighbor in indices[indptr[node]:indptr[node + 1]]:
+            if group[neighbor] == -1:
+                group[node] = group[neighbor] = groups
+                groups += 1
+                break
+
+    for node in np.flatnonzero(group == -1):
+        neighbors = indices[indptr[node]:indptr[node + 1]]
+        if len(neighbors):
+            group[node] = group[neighbors[0]]
+        else:
+            group[node] = groups
+            groups += 1
+    return group
+
+
+def multilevel(nx_graph):
+    """
+    Lays out a large graph by coarsening, laying out and refining. The graph is repeatedly
+    merged into smaller graphs until it has at most COARSEST_SIZE nodes, that graph is laid
+    out with Kamada Kawai, and each level is then expanded again with every node starting at
+    the position of the node it was merged into and a few force-directed iterations to refine it.
+    :param nx_graph: The object used to represent the network
+    :return: a dict of node name to position
+    """
+    nodelist = list(nx_graph.nodes())
+    if len(nodelist) <= COARSEST_SIZE:
+        return kamada_kawai(nx_graph)
+
+    rng = np.random.default_rng(0)
+    adjacency = adjacency_matrix(nx_graph, nodelist)
+    levels = []
+    while adjacency.shape[0] > COARSEST_SIZE:
+        group = coarsen(adjacency, rng)
+        groups = int(group.max()) + 1
+        if groups > 0.95 * adjacency.shape[0]:
+            # Mostly isolated nodes, merging any further would not shrink the graph
+            break
+        projection = sparse.csr_matrix((np.ones(len(group)), (np.arange(len(group)), group)),
+                                       shape=(len(group), groups))
+        levels.append((adjacency, group))
+        adjacency = (projection.T @ adjacency @ projection).tocsr()
+        adjacency.setdiag(0)
+        adjacency.eliminate_zeros()
+        adjacency.data[:] = 1.0
+
+    coarse = nx.from_scipy_sparse_array(adjacency)
+    if coarse.number_of_nodes() <= COARSEST_SIZE:
+        start = kamada_kawai(coarse)
+        positions = np.array([start[node] for node in range(coarse.number_of_nodes())])
+    else:
+        positions = force_refine(adjacency, rng.random((coarse.number_of_nodes(), 2)))
+    positions = (normalize(positions) + 1.0) / 2.0
+
+    for adjacency, group in reversed(levels):
+        length = 1.0 / np.sqrt(adjacency.shape[0])
+        positions = positions[group] + rng.normal(0.0, 0.1 * length, (len(group), 2))
+        positions = force_refine(adjacency, positions, LEVEL_ITERATIONS, temperature=length)
+
+    return dict(zip(nodelist, normalize(positions)))
+
+
+def assign_tiers(nx_graph):
+    """
+    Puts every node of a layered network into a tier using the node types stored by
+    Host, Switch and Controller: controllers go on top, then switches by their distance
+    from the core, then hosts at the bottom. Core switches are the ones linked to a controller,
+    or if there are none, the ones with no hosts attached. Nodes without a type are treated as switches.
+    This is a breadth first search, so it costs O(nodes + links).
+    :param nx_graph: The object used to represent the network
+    :return: a dict of node name to tier number, 0 being the top
+    """
+    types = {node: data.get('type', 'Switch') for node, data in nx_graph.nodes(data=True)}
+    tiers = {node: 0 for node, node_type in types.items() if node_type == 'Controller'}
+    switches = [node for node, node_type in types.items() if node_type not in ('Controller', 'Host')]
+    top = 1 if tiers else 0
+
+    roots = [node for node in switches if any(types[neighbor] == 'Controller' for neighbor in nx_graph.neighbors(node))]
+    if not roots:
+        roots = [node for node in switches if not any(types[neighbor] == 'Host' for neighbor in nx_graph.neighbors(node))]
+    remaining = set(switches)
+    queue = deque()
+    while remaining:
+        # Switch islands that none of the roots reach get their best connected switch as a root
+        if not roots:
+            roots = [max(remaining, key=nx_graph.degree)]
+        for root in roots:
+            if root in remaining:
+                tiers[root] = top
+                remaining.discard(root)
+                queue.append(root)
+        roots = []
+        while queue:
+            node = queue.popleft()
+            for neighbor in nx_graph.neighbors(node):
+                if neighbor in remaining:
+                    tiers[neighbor] = tiers[node] + 1
+                    remaining.discard(neighbor)
+                    queue.append(neighbor)
+
+    bottom = max(tiers.values(), default=-1) + 1
+    for node, node_type in types.items():
+        if node_type == 'Host':
+            tiers[node] = bottom
+    return tiers
+
+
+def order_tiers(nx_graph, tiers, sweeps=2):
+    """
+    Orders the nodes within each tier to reduce link crossings with the barycenter heuristic:
+    going down, each node is placed at the average position of its neighbours in the tiers
+    above it, then going up, at the average position of its neighbours in the tiers below it.
+    Each sweep touches every link once and sorts every tier.
+    :param nx_graph: The object used to represent the network
+    :param tiers: a dict of node name to tier number
+    :param sweeps: the number of down and up sweeps to run
+    :return: a list of tiers, each a list of node names in order
+    """
+    levels = [[] for _ in range(max(tiers.values(), default=-1) + 1)]
+    for node in nx_graph.nodes():
+        levels[tiers[node]].append(node)
+    levels = [level for level in levels if level]
+    rank = {}
+    for level in levels:
+        for position, node in enumerate(level):
+            rank[node] = position / max(len(level) - 1, 1)
+
+    def reorder(level, above):
+        keys = {}
+        for node in level:
+            placed = [rank[neighbor] for neighbor in nx_graph.neighbors(node)
+                      if (tiers[neighbor] < tiers[node]) == above and tiers[neighbor] != tiers[node]]
+            keys[node] = sum(placed) / len(placed) if placed else rank[node]
+        level.sort(key=keys.__getitem__)
+        for position, node in enumerate(level):
+            rank[node] = position / max(len(level) - 1, 1)
+
+    for _ in range(sweeps):
+        for level in levels[1:]:
+            reorder(level, True)
+        for level in reversed(levels[:-1]):
+            reorder(level, False)
+    return levels
+
+
+def layered(nx_graph):
+    """
+    Lays out a layered network (controllers, core switches, edge switches, hosts) in tiers,
+    with every tier spread evenly across the width of the graph in crossing-reduced order.
+    The whole layout costs O(nodes + links) plus sorting each tier.
+    :param nx_graph: The object used to represent the network
+    :return: a dict of node name to position
+    """
+    levels = order_tiers(nx_graph, assign_tiers(nx_graph))
+    positions = {}
+    depth = max(len(levels) - 1, 1)
+    for tier, level in enumerate(levels):
+        y = 1.0 - 2.0 * tier / depth
+        for position, node in enumerate(level):
+            x = 0.0 if len(level) == 1 else -1.0 + 2.0 * position / (len(level) - 1)
+            positions[node] = np.array([x, y])
+    return positions
+
+
+def is_layered(nx_graph):
+    """
+    Returns True if a graph looks like a layered tree network: it has hosts and switches or
+    controllers, and at most one link in twenty closes a cycle
+    :param nx_graph: The object used to represent the network
+    """
+    count = nx_graph.number_of_nodes()
+    if count < 3:
+        return False
+    types = {data.get('type') for node, data in nx_graph.nodes(data=True)}
+    if 'Host' not in types or not types & {'Switch', 'Controller'}:
+        return False
+    cycles = nx_graph.number_of_edges() - count + nx.number_connected_components(nx_graph)
+    return cycles <= count / 20
+
+
+"""The layout engines that can be selected, by name"""
+ENGINES = {
+    'kamada_kawai': kamada_kawai,
+    'force_directed': force_directed,
+    'multilevel': multilevel,
+    'layered': layered,
+}
+
+
+def select_engine(nx_graph, engine=None):
+    """
+    Picks the layout engine for a graph. An engine named by the caller or by the
+    MINIGNC_LAYOUT_ENGINE setting is used as is; otherwise ('auto') tree-like layered networks
+    use the layered engine, and other graphs use Kamada Kawai when small, the sparse
+    force-directed engine when medium and the multilevel engine when large.
+    :param nx_graph: The object used to represent the network
+    :param engine: the name of an engine, 'auto' or None to use the setting
+    :return: the name of the engine to use
+    """
+    engine = requested_engine(engine)
+    if engine != 'auto':
+        return engine
+
+    if is_layered(nx_graph):
+        return 'layered'
+    count = nx_graph.number_of_nodes()
+    if count <= KAMADA_KAWAI_MAX_NODES:
+        return 'kamada_kawai'
+    if count <= FORCE_DIRECTED_MAX_NODES:
+        return 'force_directed'
+    return 'multilevel'
+
+
+def layout_component(nodelist, typelist, edgelist, engine):
+    """
+    Lays out one connected component. This runs in the worker processes of the layout pool,
+    so it takes plain lists rather than a graph object.
+    :param nodelist: the names of the nodes of the component
+    :param typelist: the type of each node ('Host', 'Switch', 'Controller' or None)
+    :param edgelist: the (name, name) links of the component
+    :param engine: the name of an engine or 'auto'
+    :return: an n x 2 array of positions in the order of nodelist
+    """
+    if len(nodelist) == 1:
+        return np.zeros((1, 2))
+    component = nx.Graph()
+    for node, node_type in zip(nodelist, typelist):
+        if node_type is None:
+            component.add_node(node)
+        else:
+            component.add_node(node, type=node_type)
+    component.add_edges_from(edgelist)
+    positions = ENGINES[select_engine(component, engine)](component)
+    return np.array([positions[node] for node in nodelist], dtype=np.float64).reshape(len(nodelist), 2)
+
+
+def pack_components(boxes):
+    """
+    Packs laid out components next to each other in rows, tallest first, so the rows fill
+    a roughly square area. Each component is scaled so its width grows with the square root
+    of its node count, which keeps node spacing similar across components.
+    :param boxes: a list of n x 2 position arrays, one per component
+    :return: a list of the moved and scaled position arrays, in the same order
+    """
+    padding = 1.0
+    scaled = []
+    for positions in boxes:
+        positions = positions - positions.min(axis=0)
+        extent = positions.max(axis=0).max()
+        if extent > 0:
+            positions = positions * (np.sqrt(len(positions)) / extent)
+        scaled.append(positions)
+
+    sizes = [positions.max(axis=0) + padding for positions in scaled]
+    row_width = max(np.sqrt(sum(width * height for width, height in sizes)),
+                    max(width for width, height in sizes))
+    placed = [None] * len(scaled)
+    x = y = row_height = 0.0
+    for index in sorted(range(len(scaled)), key=lambda i: -sizes[i][1]):
+        width, height = sizes[index]
+        if x > 0 and x + width > row_width:
+            x = 0.0
+            y -= row_height
+            row_height = 0.0
+        placed[index] = scaled[index] + np.array([x, y - height])
+        x += width
+        row_height = max(row_height, height)
+    return placed
+
+
+"""The process pool used to lay out components in parallel, created on first use"""
+layout_pool = None
+
+
+def get_layout_pool():
+    """
+    Returns the process pool used to lay out components, creating it on first use with
+    MINIGNC_LAYOUT_WORKERS processes (one per core by default)
+    :return: a ProcessPoolExecutor
+    """
+    global layout_pool
+    if layout_pool is None:
+        layout_pool = ProcessPoolExecutor(getattr(settings, 'MINIGNC_LAYOUT_WORKERS', None) or os.cpu_count())
+    return layout_pool
+
+
+def layout_components(nx_graph, engine):
+    """
+    Lays out every connected component of a graph on its own and packs the results into a
+    grid. Components with at least PARALLEL_MIN_NODES nodes are laid out in parallel on the
+    layout process pool, smaller ones in this process since they are cheaper than the hand-off.
+    :param nx_graph: The object used to represent the network
+    :param engine: the name of an engine or 'auto' to pick one per component by its size
+    :return: a dict of node name to position
+    """
+    components = [list(component) for component in nx.connected_components(nx_graph)]
+    if len(components) <= 1:
+        if not components:
+            return {}
+        return ENGINES[select_engine(nx_graph, engine)](nx_graph)
+
+    components.sort(key=len, reverse=True)
+    jobs = [(nodes, [nx_graph.nodes[node].get('type') for node in nodes], list(nx_graph.subgraph(nodes).edges()), engine)
+            for nodes in components]
+    large = [i for i, job in enumerate(jobs) if len(job[0]) >= PARALLEL_MIN_NODES]
+    boxes = [None] * len(jobs)
+    if len(large) > 1:
+        pool = get_layout_pool()
+        futures = {i: pool.submit(layout_component, *jobs[i]) for i in large}
+    else:
+        futures = {}
+    for i, job in enumerate(jobs):
+        if i not in futures:
+            boxes[i] = layout_component(*job)
+    for i, future in futures.items():
+        boxes[i] = future.result()
+
+    placed = pack_components(boxes)
+    names = [node for nodes in components for node in nodes]
+    return dict(zip(names, normalize(np.concatenate(placed))))
+
+
+def edge_set(nx_graph):
+    """
+    Returns the edges of a graph with the endpoints of each edge in a canonical order
+    :param nx_graph: The object used to represent the network
+    :return: a set of (name, name) tuples
+    """
+    return {(u, v) if str(u) <= str(v) else (v, u) for u, v in nx_graph.edges()}
+
+
+def seed_positions(nx_graph, previous):
+    """
+    Creates starting positions for a warm-started layout. Nodes that were in the previous
+    render keep their position and new nodes are placed next to the average position of their
+    already placed neighbours, working outwards so chains of new nodes are placed too.
+    :param nx_graph: The object used to represent the network
+    :param previous: a dict of node name to position from the previous render
+    :return: a dict of node name to position for every node of the graph
+    """
+    rng = np.random.default_rng(0)
+    seed = {node: np.asarray(previous[node], dtype=np.float64) for node in nx_graph.nodes() if node in previous}
+    if seed:
+        coordinates = np.array(list(seed.values()))
+        center = coordinates.mean(axis=0)
+        spread = max(float(np.ptp(coordinates, axis=0).max()), 1e-3)
+    else:
+        center = np.zeros(2)
+        spread = 1.0
+    jitter = 0.05 * spread
+
+    unplaced = [node for node in nx_graph.nodes() if node not in seed]
+    while unplaced:
+        remaining = []
+        for node in unplaced:
+            placed = [seed[neighbor] for neighbor in nx_graph.neighbors(node) if neighbor in seed]
+            if placed:
+                seed[node] = np.mean(placed, axis=0) + rng.normal(0.0, jitter, 2)
+            else:
+                remaining.append(node)
+        if len(remaining) == len(unplaced):
+            # Nothing left touches a placed node, so start the rest near the center
+            for node in remaining:
+                seed[node] = center + rng.normal(0.0, spread / 2, 2)
+            break
+        unplaced = remaining
+    return seed
+
+
+def incremental_layout(nx_graph, seed, movable, iterations=REFINE_ITERATIONS):
+    """
+    Refines a seeded layout by moving only the given nodes. Movable nodes are pulled towards
+    their neighbours and pushed away from any node closer than the typical link length, with the
+    step size shrinking every iteration. Nodes that did not change stay where they were, so the
+    picture stays stable and the work depends on the size of the change, not the size of the graph.
+    :param nx_graph: The object used to represent the network
+    :param seed: a dict of node name to starting position for every node
+    :param movable: the names of the nodes that are allowed to move
+    :param iterations: the number of refinement iterations to run
+    :return: a dict of node name to position
+    """
+    names = list(nx_graph.nodes())
+    index = {name: i for i, name in enumerate(names)}
+    positions = np.array([seed[name] for name in names], dtype=np.float64).reshape(len(names), 2)
+    moving = np.array(sorted(index[name] for name in movable), dtype=np.intp)
+    if len(moving) == 0 or iterations <= 0:
+        return dict(zip(names, positions))
+
+    local = np.full(len(names), -1, dtype=np.intp)
+    local[moving] = np.arange(len(moving))
+    sources = []
+    targets = []
+    for name in movable:
+        for neighbor in nx_graph.neighbors(name):
+            if neighbor != name:
+                sources.append(local[index[name]])
+                targets.append(index[neighbor])
+    sources = np.array(sources, dtype=np.intp)
+    targets = np.array(targets, dtype=np.intp)
+
+    # The typical link length among the nodes that stay put sets the scale of the forces
+    fixed = np.ones(len(names), dtype=bool)
+    fixed[moving] = False
+    fixed_edges = list(islice(((index[u], index[v]) for u, v in nx_graph.edges()
+                               if fixed[index[u]] and fixed[index[v]] and u != v), 1000))
+    if fixed_edges:
+        fixed_edges = np.array(fixed_edges)
+        length = float(np.median(np.linalg.norm(positions[fixed_edges[:, 0]] - positions[fixed_edges[:, 1]], axis=1)))
+    else:
+        length = 0.0
+    if length <= 0.0:
+        length = 2.0 / max(np.sqrt(len(names)), 1.0)
+    fixed_index = np.flatnonzero(fixed)
+    fixed_tree = cKDTree(positions[fixed_index]) if len(fixed_index) else None
+
+    for iteration in range(iterations):
+        current = positions[moving]
+        displacement = np.zeros_like(current)
+
+        # Attraction along links, towards the typical link length
+        if len(sources):
+            delta = positions[targets] - current[sources]
+            distance = np.maximum(np.linalg.norm(delta, axis=1), 1e-9)
+            np.add.at(displacement, sources, delta * ((distance - length) / distance)[:, None])
+
+        # Repulsion from nearby nodes that stay put
+        if fixed_tree is not None:
+            for i, neighbors in enumerate(fixed_tree.query_ball_point(current, length)):
+                if neighbors:
+                    delta = current[i] - positions[fixed_index[neighbors]]
+                    distance = np.maximum(np.linalg.norm(delta, axis=1), 1e-9)
+                    displacement[i] += (delta * (length * length / (distance * distance))[:, None]).sum(axis=0)
+
+        # Repulsion between nearby movable nodes
+        moving_tree = cKDTree(current)
+        pairs = moving_tree.query_pairs(length, output_type='ndarray')
+        if len(pairs):
+            delta = current[pairs[:, 0]] - current[pairs[:, 1]]
+            distance = np.maximum(np.linalg.norm(delta, axis=1), 1e-9)
+            push = delta * (length * length / (distance * distance))[:, None]
+            np.add.at(displacement, pairs[:, 0], push)
+            np.add.at(displacement, pairs[:, 1], -push)
+
+        # Limit every step by a temperature that cools down linearly
+        temperature = length * (1.0 - iteration / iterations)
+        size = np.maximum(np.linalg.norm(displacement, axis=1), 1e-9)
+        positions[moving] = current + displacement * (np.minimum(size, temperature) / size)[:, None]
+
+    return dict(zip(names, positions))
+
+
+"""The positions and edges of the last render, used to warm-start the next layout"""
+last_render = {'positions': None, 'edges': None, 'engine': None, 'key': None}
+
+
+def warm_start(nx_graph, previous_positions, previous_edges):
+    """
+    Lays out a graph starting from the previous render if only a small part of it changed
+    :param nx_graph: The object used to represent the network
+    :param previous_positions: a dict of node name to position from the previous render
+    :param previous_edges: the edge_set of the previous render
+    :return: a dict of node name to position, or None if too much changed for a warm start
+    """
+    if not previous_positions or nx_graph.number_of_nodes() == 0:
+        return None
+    edges = edge_set(nx_graph)
+    movable = {node for node in nx_graph.nodes() if node not in previous_positions}
+    for u, v in edges.symmetric_difference(previous_edges):
+        movable.update(node for node in (u, v) if node in nx_graph)
+    if len(movable) > MAX_CHANGED_FRACTION * nx_graph.number_of_nodes():
+        return None
+    return incremental_layout(nx_graph, seed_positions(nx_graph, previous_positions), movable)
+
+
+def requested_engine(engine=None):
+    """
+    Resolves the engine asked for by the caller or by the MINIGNC_LAYOUT_ENGINE setting
+    :param engine: the name of an engine, 'auto' or None to use the setting
+    :return: the name of the engine or 'auto'
+    """
+    if engine is None or engine == '':
+        engine = getattr(settings, 'MINIGNC_LAYOUT_ENGINE', 'auto')
+    if engine != 'auto' and engine not in ENGINES:
+        raise ValueError("Unknown layout engine: " + str(engine))
+    return engine
+
+
+def get_layout(nx_graph, cache=layout_cache, incremental=None, engine=None, fingerprint=None):
+    """
+    Returns the positions of the nodes of a graph, reusing a cached layout when the same
+    nodes and edges have been laid out by the same engine before. Otherwise, if the graph only
+    changed a little since the last render, the previous positions are refined instead of starting over.
+    A fresh layout is computed one connected component at a time, see layout_components.
+    :param nx_graph: The object used to represent the network
+    :param cache: the LayoutCache to use, or None to always compute the layout
+    :param incremental: whether to warm-start from the last render, defaults to MINIGNC_INCREMENTAL_LAYOUT
+    :param engine: the name of the layout engine, 'auto' or None to use MINIGNC_LAYOUT_ENGINE
+    :param fingerprint: the topology_fingerprint of the graph if it is already known
+    :return: a tuple of (layout key, dict of node name to position). The key names the engine and the
+             topology fingerprint, and is None when no cache is used.
+    """
+    if incremental is None:
+        incremental = getattr(settings, 'MINIGNC_INCREMENTAL_LAYOUT', True)
+    engine = requested_engine(engine)
+
+    if cache is not None and fingerprint is None:
+        fingerprint = topology_fingerprint(nx_graph)
+    key = engine + '-' + fingerprint if cache is not None else None
+    positions = cache.get(key) if cache is not None else None
+    if positions is None:
+        if incremental and last_render['engine'] == engine:
+            positions = warm_start(nx_graph, last_render['positions'], last_render['edges'])
+        if positions is None:
+            positions = layout_components(nx_graph, engine)
+        if cache is not None:
+            cache.put(key, positions)
+
+    # Redrawing the same layout again leaves the last render as it is
+    if incremental and (key is None or key != last_render['key']):
+        last_render['positions'] = positions
+        last_render['edges'] = edge_set(nx_graph)
+        last_render['engine'] = engine
+        last_render['key'] = key
+    return key, positions
+
+
+def get_positions(nx_graph, cache=layout_cache, incremental=None, engine=None):
+    """
+    Returns the positions of the nodes of a graph, see get_layout
+    :param nx_graph: The object used to represent the network
+    :param cache: the LayoutCache to use, or None to always compute the layout
+    :param incremental: whether to warm-start from the last render, defaults to MINIGNC_INCREMENTAL_LAYOUT
+    :param engine: the name of the layout engine, 'auto' or None to use MINIGNC_LAYOUT_ENGINE
+    :return: a dict of node name to position
+    """
+    return get_layout(nx_graph, cache, incremental, engine)[1]
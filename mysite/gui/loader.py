@@ -0,0 +1,143 @@
+"""
+This file loads networks from the CSV files exported by Neo4J's APOC library
+(apoc.export.csv.all) into the topology store
+"""
+import csv
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from . import nodes
+
+"""The columns that hold optional link parameters and the Link attribute each one sets"""
+LINK_PARAM_COLUMNS = (
+    ('_bw', 'bandwidth'),
+    ('_delay', 'delay'),
+    ('_loss', 'loss'),
+    ('_queue', 'max_queue_size'),
+)
+
+"""How many nodes or links are buffered before they are inserted into the topology"""
+BATCH_SIZE = 10000
+
+
+def csv_path(file):
+    """
+    Returns the full path of a CSV file within the directory exported networks are read from.
+    The directory is set by MINIGNC_CSV_DIR in settings.py and defaults to the Desktop.
+    :param file: the name of the CSV file
+    :return: the path of the CSV file
+    """
+    directory = getattr(settings, 'MINIGNC_CSV_DIR', None) or str(Path.home()) + "/Desktop/"
+    return str(Path(directory) / file)
+
+
+def make_node(node_type, name, ip):
+    """
+    Creates a host, switch or controller object from the values of a CSV row
+    :param node_type: the type column of the row
+    :param name: the name column of the row
+    :param ip: the ip column of the row
+    :return: the node object, or None if the type is not a node type
+    """
+    if node_type == 'host':
+        return nodes.Host(name, ip)
+    elif node_type == 'switch':
+        return nodes.Switch(name)
+    elif node_type == 'controller':
+        return nodes.Controller(name)
+    return None
+
+
+def make_link(first, second, link_params):
+    """
+    Creates a link object and applies the link parameters read from a CSV row
+    :param first: the name of the first node
+    :param second: the name of the second node
+    :param link_params: a list of (Link attribute, value) pairs
+    :return: the link object
+    """
+    link = nodes.Link(first, second)
+    for attribute, value in link_params:
+        setattr(link, attribute, value)
+    return link
+
+
+def load_topology(path, graph):
+    """
+    Streams an APOC CSV export into the topology in a single pass. Node rows are recorded in an
+    _id -> name dict so link rows can resolve their _start/_end ids in O(1). Links that refer to
+    a node further down the file are held back and resolved once the pass is over. Nodes and
+    links are inserted into the topology in batches. Memory used on top of the topology itself
+    depends on the number of nodes, not on the size of the file.
+    :param path: the path of the CSV file
+    :param graph: the topology store to load the network into
+    :return: a dict with the rows read, nodes and links added, unresolved links and rows/sec
+    """
+    start = time.perf_counter()
+    names = {}
+    pending = []
+    batch = []
+    rows = 0
+    added = 0
+    unresolved = 0
+
+    with open(path, newline='') as csv_file:
+        csv_r = csv.reader(csv_file)
+        header = next(csv_r, None)
+        if header is None:
+            return {'rows': 0, 'added': 0, 'unresolved': 0, 'seconds': 0.0, 'rows_per_sec': 0.0}
+        column = {name: index for index, name in enumerate(header)}
+        id_col = column['_id']
+        labels_col = column['_labels']
+        name_col = column['name']
+        type_col = column['type']
+        ip_col = column['ip']
+        start_col = column['_start']
+        end_col = column['_end']
+        params = [(column[name], attribute) for name, attribute in LINK_PARAM_COLUMNS if name in column]
+
+        for row in csv_r:
+            rows += 1
+            if row[labels_col] != "":
+                name = row[name_col]
+                names[row[id_col]] = name
+                node = make_node(row[type_col], name, row[ip_col])
+                if node is not None:
+                    batch.append(node)
+
+            if row[start_col] != "":
+                link_params = [(attribute, row[index]) for index, attribute in params if row[index].isdigit()]
+                first = names.get(row[start_col])
+                second = names.get(row[end_col])
+                if first is None or second is None:
+                    # Forward reference, the node row has not been read yet
+                    pending.append((row[start_col], row[end_col], link_params))
+                else:
+                    batch.append(make_link(first, second, link_params))
+
+            if len(batch) >= BATCH_SIZE:
+                added += graph.add_many(batch)
+                batch = []
+
+    for first_id, second_id, link_params in pending:
+        first = names.get(first_id)
+        second = names.get(second_id)
+        if first is None or second is None:
+            unresolved += 1
+            continue
+        batch.append(make_link(first, second, link_params))
+    added += graph.add_many(batch)
+
+    seconds = time.perf_counter() - start
+    stats = {
+        'rows': rows,
+        'added': added,
+        'unresolved': unresolved,
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds if seconds > 0 else 0.0,
+    }
+    print("Loaded " + str(rows) + " rows from " + str(path) + " in " + "{:.3f}".format(seconds) +
+          "s (" + "{:.0f}".format(stats['rows_per_sec']) + " rows/sec)")
+    return stats
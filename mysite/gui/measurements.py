@@ -0,0 +1,249 @@
+"""
+This file turns the text Mininet logs for ping and iPerf tests into numbers and keeps the most recent
+measurements of every pair of hosts, so trends and percentiles can be read without running the tests again.
+Each pair has a ring buffer: a fixed size NumPy array that the newest measurement overwrites the
+oldest one in, so the memory used by a pair doesn't grow with the number of tests.
+"""
+import re
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from django.conf import settings
+
+from . import scheduling
+
+"""How many measurements of each test are kept for each pair of hosts"""
+HISTORY = 32
+
+"""How many Ping All runs are kept"""
+PINGALL_RUNS = 5
+
+"""The columns kept for each test. Round trip times are in ms, loss in percent and bandwidths in Mbits/sec."""
+FIELDS = {
+    'ping': ('time', 'rtt_min', 'rtt_avg', 'rtt_max', 'loss'),
+    'iperf': ('time', 'server', 'client'),
+}
+
+"""Matches a line of Mininet's pingFull, such as h1->h2: 1/1, rtt min/avg/max/mdev 0.050/0.050/0.050/0.000 ms"""
+PING_FULL = re.compile(r"(\S+)->(\S+): (\d+)/(\d+), rtt min/avg/max/mdev ([\d.]+)/([\d.]+)/([\d.]+)/([\d.]+) ms")
+
+"""Matches the results line of Mininet's ping, such as *** Results: 0% dropped (2/2 received)"""
+DROPPED = re.compile(r"\*\*\* Results: ([\d.]+)% dropped")
+
+
+def parse_ping(output):
+    """
+    Reads the round trip times and loss from the output of a ping test. Round trip times are only known
+    for output in the format of Mininet's pingFull, and the averages of every direction are combined.
+    :param output: the text Mininet logged for the test
+    :return: a dict of 'rtt_min', 'rtt_avg', 'rtt_max' in ms (nan when unknown) and 'loss' in percent,
+             or None if the output holds no ping results
+    """
+    lines = PING_FULL.findall(output)
+    if lines:
+        sent = np.array([float(line[2]) for line in lines])
+        answered = np.array([float(line[3]) for line in lines])
+        rtts = np.array([[float(value) for value in line[4:7]] for line in lines])[answered > 0]
+        loss = float(100.0 * (1.0 - answered.sum() / sent.sum())) if sent.sum() else 100.0
+        if len(rtts):
+            return {'rtt_min': float(rtts[:, 0].min()), 'rtt_avg': float(rtts[:, 1].mean()),
+                    'rtt_max': float(rtts[:, 2].max()), 'loss': loss}
+        return {'rtt_min': np.nan, 'rtt_avg': np.nan, 'rtt_max': np.nan, 'loss': loss}
+    dropped = DROPPED.search(output)
+    if dropped is None:
+        return None
+    return {'rtt_min': np.nan, 'rtt_avg': np.nan, 'rtt_max': np.nan, 'loss': float(dropped.group(1))}
+
+
+def parse_iperf(output):
+    """
+    Reads the bandwidths from the output of an iPerf test
+    :param output: the text Mininet logged for the test
+    :return: a dict of the 'server' and 'client' bandwidths in Mbits/sec, or None if the test failed
+    """
+    rates = scheduling.parse_throughput(output)
+    if len(rates) < 2:
+        return None
+    return {'server': rates[-2], 'client': rates[-1]}
+
+
+class RingBuffer:
+    """
+    This class keeps the last measurements of one test between one pair of hosts in a fixed size array
+    """
+
+    def __init__(self, fields, size=HISTORY):
+        """
+        Creates a new, empty RingBuffer object
+        :param fields: the names of the columns
+        :param size: how many measurements are kept
+        """
+        self.fields = fields
+        self.values = np.full((size, len(fields)), np.nan)
+        self.count = 0
+
+    def append(self, record):
+        """
+        Adds a measurement, overwriting the oldest one if the buffer is full
+        :param record: a dict with a value for every field
+        """
+        self.values[self.count % len(self.values)] = [record[field] for field in self.fields]
+        self.count += 1
+
+    def array(self):
+        """
+        Returns the measurements kept, oldest first
+        :return: a NumPy array with a row for each measurement and a column for each field
+        """
+        size = len(self.values)
+        if self.count <= size:
+            return self.values[:self.count].copy()
+        start = self.count % size
+        return np.concatenate((self.values[start:], self.values[:start]))
+
+    def records(self):
+        """
+        Returns the measurements kept, oldest first
+        :return: a list of dicts of field name to value
+        """
+        return [dict(zip(self.fields, row.tolist())) for row in self.array()]
+
+    def percentiles(self, field, percents=(50, 90, 99)):
+        """
+        Returns percentiles of one field over the measurements kept, ignoring unknown values
+        :param field: the name of the field
+        :param percents: the percentiles to compute, between 0 and 100
+        :return: a dict of percentile to value, nan if there is no known value
+        """
+        column = self.array()[:, self.fields.index(field)]
+        column = column[~np.isnan(column)]
+        if not len(column):
+            return {percent: np.nan for percent in percents}
+        return dict(zip(percents, np.percentile(column, percents).tolist()))
+
+
+class MeasurementHistory:
+    """
+    This class holds a RingBuffer for every test and pair of hosts that was measured.
+    A pair is the same whichever host was first. The matrices of the most recent Ping All runs
+    are kept as well, see pingall.PingAllRun.
+    """
+
+    def __init__(self, size=None, runs=None):
+        """
+        Creates a new, empty MeasurementHistory object
+        :param size: how many measurements of each test are kept for each pair, defaults to MINIGNC_MEASUREMENT_HISTORY
+        :param runs: how many Ping All runs are kept, defaults to MINIGNC_PINGALL_RUNS
+        """
+        self.size = getattr(settings, 'MINIGNC_MEASUREMENT_HISTORY', HISTORY) if size is None else size
+        self.runs = deque(maxlen=getattr(settings, 'MINIGNC_PINGALL_RUNS', PINGALL_RUNS) if runs is None else runs)
+        self.buffers = {}
+        self.host_keys = {}
+        self.lock = threading.Lock()
+
+    def record(self, test, first, second, output):
+        """
+        Parses the output of a test and adds it to the history of the pair
+        :param test: 'ping' or 'iperf'
+        :param first: the name of the first host
+        :param second: the name of the second host
+        :param output: the text Mininet logged for the test
+        :return: the record that was added, or None if the output holds no results
+        """
+        record = parse_ping(output) if test == 'ping' else parse_iperf(output)
+        if record is None:
+            return None
+        record['time'] = time.time()
+        with self.lock:
+            key = (test, min(first, second), max(first, second))
+            if key not in self.buffers:
+                self.buffers[key] = RingBuffer(FIELDS[test], self.size)
+                for name in key[1:]:
+                    self.host_keys.setdefault(name, set()).add(key)
+            self.buffers[key].append(record)
+        return record
+
+    def add_run(self, run):
+        """
+        Keeps the matrix of a Ping All run, forgetting the oldest run if MINIGNC_PINGALL_RUNS are kept
+        :param run: the pingall.PingAllRun
+        :return: the run before it, or None if it is the first
+        """
+        with self.lock:
+            previous = self.runs[-1] if self.runs else None
+            self.runs.append(run)
+        return previous
+
+    def get_run(self, index=-1):
+        """
+        Returns a kept Ping All run
+        :param index: the position of the run, negative positions count back from the latest
+        :return: a tuple of (the run, the run before it or None), or (None, None) if there is no such run
+        """
+        with self.lock:
+            runs = list(self.runs)
+        try:
+            position = range(len(runs))[index]
+        except IndexError:
+            return None, None
+        return runs[position], runs[position - 1] if position > 0 else None
+
+    def get(self, test, first, second):
+        """
+        Returns the history of a test between two hosts
+        :param test: 'ping' or 'iperf'
+        :param first: the name of the first host
+        :param second: the name of the second host
+        :return: the RingBuffer, or None if the pair was never measured
+        """
+        with self.lock:
+            return self.buffers.get((test, min(first, second), max(first, second)))
+
+    def remove_host(self, name):
+        """
+        Forgets every measurement of a host
+        :param name: the name of the host
+        """
+        with self.lock:
+            for key in self.host_keys.pop(name, ()):
+                del self.buffers[key]
+                for other in key[1:]:
+                    if other != name:
+                        self.host_keys[other].discard(key)
+                        if not self.host_keys[other]:
+                            del self.host_keys[other]
+
+    def clear(self):
+        """
+        Forgets every measurement
+        """
+        with self.lock:
+            self.buffers.clear()
+            self.host_keys.clear()
+            self.runs.clear()
+
+
+def summary(test, other, history):
+    """
+    Returns the line shown in a host's hover text for its latest test with another host
+    :param test: 'ping' or 'iperf'
+    :param other: the name of the other host
+    :param history: the RingBuffer of the pair
+    :return: the line
+    """
+    latest = history.records()[-1]
+    count = min(history.count, len(history.values))
+    if test == 'iperf':
+        median = history.percentiles('client', (50,))[50]
+        return ("Iperf with " + other + ": " + "{:.2f} / {:.2f} Mbits/sec".format(latest['server'], latest['client']) +
+                ", median {:.2f} Mbits/sec over {} tests".format(median, count))
+    text = "Ping with " + other + ": "
+    if not np.isnan(latest['rtt_avg']):
+        text += "rtt min/avg/max {:.3f}/{:.3f}/{:.3f} ms, ".format(latest['rtt_min'], latest['rtt_avg'], latest['rtt_max'])
+    text += "{:g}% loss".format(latest['loss'])
+    median = history.percentiles('rtt_avg', (50,))[50]
+    if not np.isnan(median):
+        text += ", median rtt {:.3f} ms over {} tests".format(median, count)
+    return text
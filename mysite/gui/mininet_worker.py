@@ -0,0 +1,506 @@
+"""
+This file is the long-lived emulation worker started by emulation.py. It keeps one network
+running and answers commands sent as JSON lines on stdin with JSON lines on stdout:
+
+    {"id": 1, "cmd": "build", "script": "...", "hosts": ["h1", "h2"]}
+    {"id": 2, "cmd": "ping", "hosts": ["h1", "h2"]}
+    {"id": 3, "cmd": "iperf", "hosts": ["h1", "h2"]}
+    {"id": 4, "cmd": "pingall"}
+    {"id": 5, "cmd": "batch", "tests": [["ping", "h1", "h2"], ["iperf", "h1", "h3"]]}
+    {"id": 6, "cmd": "iperf_groups", "groups": [[["h1", "h2"], ["h3", "h4"]], [["h1", "h3"]]], "seconds": 5}
+    {"id": 7, "cmd": "stop"}
+
+Every response is {"id": ..., "ok": true, "output": "..."} or {"id": ..., "ok": false, "error": "..."},
+with the seconds spent in each phase of the command as "timings", such as {"build": 0.5, "start": 2.1},
+and the first response also has the time.time() the worker was "ready" at, so its startup can be timed.
+The output is the text Mininet logs for the command, the same text the generated scripts print.
+While a command runs, each line Mininet logs is also sent as soon as it is written, as
+{"id": ..., "log": "..."}, so the output can be followed before the response arrives.
+The output of a batch is a list with an {"ok": ..., "output"/"error": ...} result for each test.
+The pairs of each iperf group are tested at the same time, one group after the other, and the
+output is a list for each group with an {"ok": ..., "output"/"error": ..., "seconds": ...} result for each pair.
+Lines that are not JSON, like the sudo password, are ignored.
+
+It is run with python2 under sudo for Mininet, or with --fake for a network that doesn't need
+Mininet or root, which answers in the same format. It must stay compatible with Python 2.
+"""
+from __future__ import print_function
+
+import contextlib
+import json
+import os
+import re
+import signal
+import sys
+import threading
+import time
+import traceback
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+"""Where responses and log lines are written, set by main"""
+channel = None
+
+"""Keeps the lines written by different threads from being mixed up"""
+channel_lock = threading.Lock()
+
+"""The id of the request being answered, sent along with its log lines"""
+request_id = None
+
+"""The port the iperf server of the first pair of a group listens on, the other pairs use the ports after it"""
+IPERF_PORT = 5001
+
+"""Matches a bandwidth reported by iperf, such as 9.56 Mbits/sec"""
+BANDWIDTH = re.compile(r"([\d.]+ \w+/sec)")
+
+"""The seconds spent in each phase of the request being answered, sent along with its response"""
+timings = {}
+
+
+@contextlib.contextmanager
+def phase(name):
+    """
+    Adds the time spent in the with block to a phase of the request being answered
+    :param name: the name of the phase, see timings.py
+    """
+    start = time.time()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.time() - start
+
+
+def send(message):
+    """
+    Writes a message to emulation.py as a JSON line
+    :param message: the dict to send
+    """
+    with channel_lock:
+        channel.write(json.dumps(message) + "\n")
+        channel.flush()
+
+
+def log(text):
+    """
+    Sends each line of text logged by a command before the command has finished
+    :param text: the text, which may hold many lines
+    :return: the text
+    """
+    if channel is not None:
+        for line in text.splitlines():
+            send({'id': request_id, 'log': line})
+    return text
+
+
+class LogBuffer:
+    """
+    This class collects what Mininet logs for a command, sending each line as soon as it is complete
+    """
+
+    def __init__(self):
+        """
+        Creates a new, empty LogBuffer object
+        """
+        self.buffer = StringIO()
+        self.partial = ""
+
+    def write(self, text):
+        """
+        Adds text to the buffer and sends the lines it completes
+        :param text: the text Mininet logged
+        """
+        self.buffer.write(text)
+        lines = (self.partial + text).split("\n")
+        self.partial = lines.pop()
+        for line in lines:
+            log(line)
+
+    def flush(self):
+        """
+        Sends nothing, lines are sent once they are complete
+        """
+
+    def getvalue(self):
+        """
+        Returns everything logged, sending the last line if it wasn't complete
+        :return: the text
+        """
+        if self.partial:
+            log(self.partial)
+            self.partial = ""
+        return self.buffer.getvalue()
+
+
+class MininetNetwork:
+    """
+    This class runs the network in Mininet, capturing what Mininet logs for each command
+    """
+
+    def __init__(self):
+        """
+        Cleans up anything left behind by a previous run, the same as running sudo mn -c
+        """
+        from mininet.clean import cleanup
+        from mininet.log import setLogLevel
+        setLogLevel('info')
+        cleanup()
+        self.net = None
+
+    def capture(self, function, *args):
+        """
+        Runs a function while Mininet's log is written to a buffer
+        :param function: the function to run
+        :param args: the arguments of the function
+        :return: the text logged while the function ran
+        """
+        from mininet.log import lg
+        buffer = LogBuffer()
+        streams = [(handler, handler.stream) for handler in lg.handlers if hasattr(handler, 'stream')]
+        for handler, stream in streams:
+            handler.stream = buffer
+        try:
+            function(*args)
+        finally:
+            for handler, stream in streams:
+                handler.stream = stream
+        return buffer.getvalue()
+
+    def build(self, script, hosts):
+        """
+        Stops the running network and starts the one built by a generated script
+        :param script: the Python code that builds the network into a Mininet object named net
+        :param hosts: the names of the hosts of the network
+        :return: the text logged while starting the network
+        """
+        with phase('stop'):
+            self.stop()
+        namespace = {}
+        with phase('build'):
+            # The script comes from JSON as a unicode string, and Python 2 refuses to run a unicode string
+            # with an encoding declaration, so it is run as the UTF-8 bytes its coding line names
+            exec(script.encode('utf-8'), namespace)
+        self.net = namespace['net']
+        with phase('start'):
+            return self.capture(self.net.start)
+
+    def hosts(self, names):
+        """
+        Returns the Mininet hosts with the given names
+        :param names: the host names
+        :return: a list of the Mininet host objects
+        """
+        return [self.net.get(name) for name in names]
+
+    def ping(self, names):
+        """
+        Tests the latency between hosts with pingFull, which logs the round trip time of each pair
+        :param names: the names of the hosts to ping between
+        :return: the text logged by the test
+        """
+        return self.capture(self.net.pingFull, self.hosts(names))
+
+    def iperf(self, names):
+        """
+        Tests the throughput between two hosts
+        :param names: the names of the two hosts
+        :return: the text logged by the test
+        """
+        return self.capture(self.net.iperf, self.hosts(names))
+
+    def iperf_result(self, names, seconds, port):
+        """
+        Tests the throughput between two hosts with an iperf server and client of their own, so tests can
+        run in parallel. Mininet's iperf can't be used for that, since it kills every iperf before it starts.
+        :param names: the names of the two hosts, the client first as for Mininet's iperf
+        :param seconds: how long to send traffic for
+        :param port: the port the server listens on, different for each pair run at the same time
+        :return: the [server, client] bandwidths, as Mininet's iperf reports them
+        """
+        from mininet.util import waitListening
+        client, server = self.hosts(names)
+        server_process = server.popen(['iperf', '-s', '-p', str(port)])
+        try:
+            waitListening(client, server.IP(), port)
+            client_output = client.popen(['iperf', '-c', server.IP(), '-p', str(port),
+                                          '-t', str(seconds)]).communicate()[0]
+        finally:
+            # iperf prints the report of the connection it served when it is interrupted
+            server_process.send_signal(signal.SIGINT)
+        server_output = server_process.communicate()[0]
+        return [parse_bandwidth(server_output), parse_bandwidth(client_output)]
+
+    def pingall(self):
+        """
+        Tests the latency between every pair of hosts with pingAllFull, which logs the round trip time of each pair
+        :return: the text logged by the test
+        """
+        return self.capture(self.net.pingAllFull)
+
+    def stop(self):
+        """
+        Stops the running network, if there is one
+        :return: the text logged while stopping the network
+        """
+        if self.net is None:
+            return ""
+        output = self.capture(self.net.stop)
+        self.net = None
+        return output
+
+
+class FakeNetwork:
+    """
+    This class pretends to run a network, answering every test as if each pair of hosts can
+    reach each other. It is used for tests and for machines without Mininet.
+    """
+
+    def __init__(self):
+        """
+        Creates a new FakeNetwork object with no network running
+        """
+        self.names = None
+
+    def build(self, script, hosts):
+        """
+        Remembers the hosts of the network
+        :param script: the Python code that builds the network, which is not run
+        :param hosts: the names of the hosts of the network
+        :return: the text Mininet logs while starting a network
+        """
+        with phase('stop'):
+            self.stop()
+        with phase('build'):
+            self.names = list(hosts)
+        return log("*** Starting network\n")
+
+    def check(self, names):
+        """
+        Raises a KeyError if a network isn't running or a host isn't part of it
+        :param names: the host names to check
+        """
+        if self.names is None:
+            raise KeyError("no network is running")
+        for name in names:
+            if name not in self.names:
+                raise KeyError(name)
+
+    def ping(self, names):
+        """
+        Pretends to test the latency between hosts, logging what Mininet's pingFull does
+        :param names: the names of the hosts to ping between
+        :return: the text Mininet logs for the test
+        """
+        self.check(names)
+        return log(self.ping_output(names))
+
+    def ping_output(self, names, header=""):
+        """
+        Builds the text Mininet's pingFull logs when every host reaches every other host
+        :param names: the names of the hosts to ping between
+        :param header: the line logged before the test, pingAllFull logs one
+        :return: the text Mininet logs for the test
+        """
+        lines = [header]
+        for name in names:
+            others = [other for other in names if other != name]
+            lines.append(name + " -> " + " ".join(others) + " \n")
+        lines.append("*** Results: \n")
+        for name in names:
+            for other in names:
+                if other != name:
+                    lines.append(" " + name + "->" + other + ": 1/1, rtt min/avg/max/mdev 0.100/0.100/0.100/0.000 ms\n")
+        return "".join(lines)
+
+    def iperf(self, names):
+        """
+        Pretends to test the throughput between two hosts
+        :param names: the names of the two hosts
+        :return: the text Mininet logs for the test
+        """
+        self.check(names)
+        return log("*** Iperf: testing TCP bandwidth between " + names[0] + " and " + names[1] + " \n"
+                   "*** Results: ['10.0 Mbits/sec', '10.0 Mbits/sec']\n")
+
+    def iperf_result(self, names, seconds, port):
+        """
+        Pretends to test the throughput between two hosts, taking as long as the test would
+        :param names: the names of the two hosts
+        :param seconds: how long to send traffic for
+        :param port: the port the server would listen on
+        :return: the [server, client] bandwidths Mininet reports
+        """
+        self.check(names)
+        time.sleep(seconds)
+        return ['10.0 Mbits/sec', '10.0 Mbits/sec']
+
+    def pingall(self):
+        """
+        Pretends to test the latency between every pair of hosts, logging what Mininet's pingAllFull does
+        :return: the text Mininet logs for the test
+        """
+        self.check([])
+        return log(self.ping_output(self.names, "*** Ping: testing ping reachability\n"))
+
+    def stop(self):
+        """
+        Forgets the running network
+        :return: the text Mininet logs while stopping a network
+        """
+        if self.names is None:
+            return ""
+        self.names = None
+        return log("*** Stopping network\n")
+
+
+def batch(network, tests):
+    """
+    Runs many ping and iperf tests one after the other on the running network. A test that
+    fails doesn't stop the rest.
+    :param network: the MininetNetwork or FakeNetwork
+    :param tests: a list of [test, host name, host name] lists, where test is 'ping' or 'iperf'
+    :return: a list with the result of each test
+    """
+    results = []
+    for test in tests:
+        try:
+            if test[0] == 'ping':
+                output = network.ping(test[1:])
+            elif test[0] == 'iperf':
+                output = network.iperf(test[1:])
+            else:
+                raise ValueError("Unknown test: " + str(test[0]))
+            results.append({'ok': True, 'output': output})
+        except Exception:
+            results.append({'ok': False, 'error': traceback.format_exc()})
+    return results
+
+
+def parse_bandwidth(output):
+    """
+    Reads the bandwidth iperf reported, the last one if it reported several
+    :param output: what iperf printed
+    :return: the bandwidth, such as 9.56 Mbits/sec
+    """
+    bandwidths = BANDWIDTH.findall(output.decode() if isinstance(output, bytes) else output)
+    if not bandwidths:
+        raise ValueError("iperf reported no bandwidth: " + repr(output))
+    return bandwidths[-1]
+
+
+def iperf_pair(network, names, seconds, port, result):
+    """
+    Tests the throughput between two hosts and fills in the result, run on its own thread
+    :param network: the MininetNetwork or FakeNetwork
+    :param names: the names of the two hosts
+    :param seconds: how long to send traffic for
+    :param port: the port of the pair's iperf server
+    :param result: the dict to store the result in
+    """
+    start = time.time()
+    try:
+        bandwidths = network.iperf_result(names, seconds, port)
+        result['ok'] = True
+        result['output'] = log("*** Iperf: testing TCP bandwidth between " + names[0] + " and " + names[1] + " \n"
+                               "*** Results: " + str([str(bandwidth) for bandwidth in bandwidths]) + "\n")
+    except Exception:
+        result['ok'] = False
+        result['error'] = traceback.format_exc()
+    result['seconds'] = time.time() - start
+
+
+def iperf_groups(network, groups, seconds):
+    """
+    Runs iperf tests in groups. The pairs of a group are tested at the same time on their own
+    threads, each with its own iperf server port, which is safe as long as no two pairs of a group share a host.
+    :param network: the MininetNetwork or FakeNetwork
+    :param groups: a list of groups, each a list of [host name, host name] pairs
+    :param seconds: how long each test sends traffic for
+    :return: a list for each group with the result of each pair
+    """
+    output = []
+    for group in groups:
+        results = [{} for pair in group]
+        threads = [threading.Thread(target=iperf_pair, args=(network, pair, seconds, IPERF_PORT + index, result))
+                   for index, (pair, result) in enumerate(zip(group, results))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        output.append(results)
+    return output
+
+
+def handle(network, request):
+    """
+    Runs one command on the network
+    :param network: the MininetNetwork or FakeNetwork
+    :param request: the decoded request
+    :return: the output of the command
+    """
+    command = request.get('cmd')
+    if command == 'build':
+        return network.build(request['script'], request.get('hosts', []))
+    elif command == 'stop':
+        with phase('stop'):
+            return network.stop()
+    with phase('test'):
+        if command == 'ping':
+            return network.ping(request['hosts'])
+        elif command == 'iperf':
+            return network.iperf(request['hosts'])
+        elif command == 'pingall':
+            return network.pingall()
+        elif command == 'batch':
+            return batch(network, request['tests'])
+        elif command == 'iperf_groups':
+            return iperf_groups(network, request['groups'], request.get('seconds', 5))
+    raise ValueError("Unknown command: " + str(command))
+
+
+def main(argv):
+    """
+    Answers requests until stdin is closed or a stop command is received
+    :param argv: the command line arguments, --fake to use a FakeNetwork
+    """
+    # Responses are written to a copy of stdout, and anything else printed to stdout
+    # (by Mininet or the commands it runs) goes to stderr so it can't break the protocol
+    global channel, request_id
+    channel = os.fdopen(os.dup(1), 'w')
+    os.dup2(2, 1)
+
+    network = FakeNetwork() if '--fake' in argv else MininetNetwork()
+    ready = time.time()
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
+        try:
+            request = json.loads(line)
+        except ValueError:
+            continue
+        if not isinstance(request, dict):
+            continue
+        request_id = request.get('id')
+        timings.clear()
+        try:
+            response = {'id': request.get('id'), 'ok': True, 'output': handle(network, request)}
+        except Exception:
+            response = {'id': request.get('id'), 'ok': False, 'error': traceback.format_exc()}
+        response['timings'] = dict(timings)
+        if ready is not None:
+            response['ready'] = ready
+            ready = None
+        send(response)
+        if request.get('cmd') == 'stop':
+            break
+    # Nobody is reading log lines anymore
+    channel = None
+    network.stop()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
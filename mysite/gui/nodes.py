@@ -6,6 +6,7 @@ __author__: Noah Lowry
 __author__: Miles Stanley
 __version__: 12/2/21
 """
+import numpy as np
 
 
 class Host:
@@ -14,6 +15,13 @@ class Host:
     author: Originally written by Cade Tipton and Gatlin Criz
     author: Additional modifications by Miles Stanley (80%)
     """
+    __slots__ = ('name', 'ip', 'iperf_log', 'ping_log')
+    type = 'host'
+    NO_IPERF_LOG = 'No IPERF data'
+    NO_PING_LOG = 'No PING data'
+    # Incremented whenever any host's logs change, since the logs are part of the graph's hover text
+    log_version = 0
+
     def __init__(self, name, ip):
         """
         Creates a new Host object
@@ -22,12 +30,17 @@ class Host:
         :return: None
         """
         self.name = name
-        self.type = 'host'
         self.ip = ip
-        self.link_log = ['No IPERF data', 'No PING data']
-        self.IPERF_LOG = 0
-        self.PING_LOG = 1
+        self.iperf_log = self.NO_IPERF_LOG
+        self.ping_log = self.NO_PING_LOG
 
+    @property
+    def link_log(self):
+        """
+        The latest iPerf and Ping information of the host
+        :return: a list of the latest iPerf information followed by the latest Ping information
+        """
+        return [self.iperf_log, self.ping_log]
 
     def __str__(self):
         """
@@ -43,20 +56,6 @@ class Host:
         """
         return self.name + ": ip - " + self.ip
 
-    def add_to_file(self):
-        """
-        Automates the text to add a host to a file
-        :return: the text to add a host to a file
-        """
-        return self.name + " = net.addHost( '" + self.name + "' )\n"
-
-    def add_ip_to_file(self):
-        """
-        Automates the text to add host ip to a file
-        :return: the text to add a host ip to a file
-        """
-        return self.name + ".setIP( '" + self.ip + "' )\n"
-
     def get_ip(self):
         """
         Getter for the ip address
@@ -87,24 +86,25 @@ class Host:
         """
         if type == 'iperf':
             # print("New iperf for " + self.name + " recorded")
-            self.link_log[self.IPERF_LOG] = output
+            self.iperf_log = output
         elif type == 'ping':
             # print("New ping for " + self.name + " recorded")
-            self.link_log[self.PING_LOG] = output
+            self.ping_log = output
+        Host.log_version += 1
 
     def get_iperf_log(self):
         """
         Returns the latest Ping information
         :return: the latest Ping information
         """
-        return self.link_log[self.IPERF_LOG].replace("'", "")
+        return self.iperf_log.replace("'", "")
 
     def get_ping_log(self):
         """
         Returns the latest iPerf information
         :return: the latest iPerf information
         """
-        return self.link_log[self.PING_LOG].replace("'", "")
+        return self.ping_log.replace("'", "")
 
     def equals(self, other):
         """
@@ -123,6 +123,9 @@ class Switch:
     author: Originally written by Cade Tipton and Gatlin Criz
     author: Additional modifications by Miles Stanley (40%)
     """
+    __slots__ = ('name',)
+    type = 'switch'
+
     def __init__(self, name):
         """
         Creates a new Switch object
@@ -130,7 +133,6 @@ class Switch:
         :return: None
         """
         self.name = name
-        self.type = 'switch'
 
     def __str__(self):
         """
@@ -146,13 +148,6 @@ class Switch:
         """
         return str(self.name)
 
-    def add_to_file(self):
-        """
-        Automates the text to add a switch to a file
-        :return: the text to add a switch to a file
-        """
-        return self.name + " = net.addSwitch( '" + self.name + "' )\n"
-    
     def get_name(self):
         """
         Getter for the name of a switch
@@ -183,6 +178,9 @@ class Controller:
     This class represents a Controller object within the network.
     author: Originally written by Cade Tipton and Gatlin Cruz
     """
+    __slots__ = ('name',)
+    type = 'controller'
+
     def __init__(self, name):
         """
         Creates a Controller object
@@ -190,7 +188,6 @@ class Controller:
         :return: None
         """
         self.name = name
-        self.type = 'controller'
 
     def __str__(self):
         """
@@ -206,13 +203,6 @@ class Controller:
         """
         return str(self.name)
 
-    def add_to_file(self):
-        """
-        Automates the text to add a controller to a file
-        :return: the text to add a controller to a file
-        """
-        return self.name + " = net.addController( '" + self.name + "' )\n"
-
     def get_name(self):
         """
         Getter for the name of a controller
@@ -243,7 +233,15 @@ class Link:
     This class represents a Host object within the network.
     author: Originally written by Cade Tipton and Gatlin Criz
     author: Additional modifications by Noah Lowry and Miles Stanley (90%)
+
+    A link that has been added to a topology is a thin view of one row of that topology's
+    LinkTable, so its endpoints and parameters are read from and written to the table's columns.
+    A link that hasn't been added yet keeps its own values until it is inserted.
+    Views are only valid until a link is removed from the table, since removal moves the last row.
     """
+    __slots__ = ('_table', '_row', '_first', '_second', '_values')
+    type = 'type'
+
     def __init__(self, first, second):
         """
         Creates a Link object
@@ -251,13 +249,111 @@ class Link:
         :param second: The second item in the link
         :return: None
         """
-        self.first = first
-        self.second = second
-        self.type = 'type'
-        self.bandwidth = 10 
-        self.delay = '0'
-        self.loss = '0'
-        self.max_queue_size = '1000'
+        self._table = None
+        self._row = -1
+        self._first = first
+        self._second = second
+        self._values = list(LinkTable.DEFAULTS)
+
+    @classmethod
+    def view(cls, table, row):
+        """
+        Creates a link that reads and writes one row of a LinkTable
+        :param table: the LinkTable holding the link
+        :param row: the row of the link within the table
+        :return: the Link view
+        """
+        link = cls.__new__(cls)
+        link._table = table
+        link._row = row
+        link._first = None
+        link._second = None
+        link._values = None
+        return link
+
+    def _get(self, index):
+        """
+        Returns one of the link parameters formatted as a string
+        :param index: the index of the parameter within LinkTable.PARAMS
+        :return: the value of the parameter
+        """
+        if self._table is None:
+            return format_number(self._values[index])
+        return format_number(self._table.params[index][self._row])
+
+    def _set(self, index, value):
+        """
+        Sets one of the link parameters
+        :param index: the index of the parameter within LinkTable.PARAMS
+        :param value: the new value of the parameter, as a number or a numeric string
+        :return: None
+        """
+        if self._table is None:
+            self._values[index] = LinkTable.convert(index, value)
+        else:
+            self._table.set_param(index, self._row, value)
+
+    @property
+    def first(self):
+        """
+        The name of the first item in the link
+        """
+        if self._table is None:
+            return self._first
+        return self._table.names[self._table.first[self._row]]
+
+    @property
+    def second(self):
+        """
+        The name of the second item in the link
+        """
+        if self._table is None:
+            return self._second
+        return self._table.names[self._table.second[self._row]]
+
+    @property
+    def bandwidth(self):
+        """
+        The bandwidth limit of the link (measured in megabits per second)
+        """
+        return self._get(0)
+
+    @bandwidth.setter
+    def bandwidth(self, value):
+        self._set(0, value)
+
+    @property
+    def delay(self):
+        """
+        The transmission delay of the link (measured in milliseconds)
+        """
+        return self._get(1)
+
+    @delay.setter
+    def delay(self, value):
+        self._set(1, value)
+
+    @property
+    def loss(self):
+        """
+        The precentage of loss in packets of the link
+        """
+        return self._get(2)
+
+    @loss.setter
+    def loss(self, value):
+        self._set(2, value)
+
+    @property
+    def max_queue_size(self):
+        """
+        The packet queue size of the link (measured in packet number)
+        """
+        return self._get(3)
+
+    @max_queue_size.setter
+    def max_queue_size(self, value):
+        self._set(3, value)
 
     def __str__(self):
         """
@@ -273,22 +369,6 @@ class Link:
         """
         return str(self.first) + " <-> " + str(self.second)
 
-    def add_to_file(self):
-        """
-        Automates the text to add a link to a file
-        :return: the text to add a link to a file
-        """
-
-        # Defining the linkOpts object for defining link parameters
-        linkOptsString = ("link_opts = dict(bw = " + str(self.bandwidth) + ", delay = '" + str(self.delay) + 
-            "ms', loss = " + str(self.loss) + ", max_queue_size = " + str(self.max_queue_size) + ")\n")
-        
-        # Defining the addLink function with linkOpts
-        linkInitializer = (linkOptsString + self.first + self.second + " = net.addLink( '" + 
-            self.first + "', " + "'" + self.second + "', **link_opts )\n")
-        return linkInitializer
-
-
     def to_tuple(self):
         """
         Converts the first and second item into a tuple
@@ -303,7 +383,7 @@ class Link:
         :return: None
         """
         # SET RESTRICTIONS
-        print("BANDWIDTH: " + bandwidth + " ADDED")
+        print("BANDWIDTH: " + str(bandwidth) + " ADDED")
         self.bandwidth = bandwidth
 
     def get_first(self):
@@ -335,7 +415,7 @@ class Link:
         """
         # SET RESTRICTIONS
         self.delay = delay
-        print("DELAY: " + delay + " ADDED")
+        print("DELAY: " + str(delay) + " ADDED")
 
     def get_delay(self):
         """
@@ -359,7 +439,7 @@ class Link:
         """
         # SET RESTRICTIONS
         self.loss = loss
-        print("LOSS: " + loss + " ADDED")
+        print("LOSS: " + str(loss) + " ADDED")
 
     def set_queue_size(self, size):
         """
@@ -369,7 +449,7 @@ class Link:
         """
         # SET RESTRICTIONS
         self.max_queue_size = size
-        print("MAX QUEUE SIZE: " + size + " ADDED")
+        print("MAX QUEUE SIZE: " + str(size) + " ADDED")
 
     def get_queue_size(self):
         """
@@ -396,6 +476,445 @@ class Link:
         return False
 
 
+def format_number(value):
+    """
+    Formats a link parameter the way it is written into Mininet scripts and the database,
+    without a trailing '.0' for whole numbers
+    :param value: the number to format
+    :return: the formatted string
+    """
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    return np.format_float_positional(np.float32(value), trim='-')
+
+
+class LinkTable:
+    """
+    This class stores every link of a topology as a struct of arrays. The endpoints are kept as
+    integer ids into a list of interned node names and the link parameters are kept in NumPy columns,
+    float32 except for the queue size, which is a whole number of packets written to Mininet scripts as is.
+    Scans over the link parameters can be done on whole columns at once.
+
+    The indexes are arrays as well, so a link costs a few dozen bytes instead of a Python object
+    and its dict entries:
+     - an open-addressing hash over the (first id, second id) pairs gives O(1) lookups,
+       duplicate checks and removals
+     - every node has a doubly linked list of the links touching it, threaded through the
+       next/prev arrays, so removing a node's links costs O(degree)
+    Each row has two list slots, 2 * row for its first endpoint and 2 * row + 1 for its second.
+    Rows are removed by moving the last row into their place.
+
+    Parameter changes are numbered by param_version and remembered per link, so results derived
+    from a parameter can be brought up to date for just the links that changed.
+    """
+    PARAMS = ('bandwidth', 'delay', 'loss', 'max_queue_size')
+    DEFAULTS = (10.0, 0.0, 0.0, 1000)
+    DTYPES = (np.float32, np.float32, np.float32, np.int64)
+    INITIAL_CAPACITY = 64
+    EMPTY = -1
+    DELETED = -2
+
+    def __init__(self):
+        """
+        Creates a new, empty LinkTable object
+        :return: None
+        """
+        self.names = []
+        self.ids = {}
+        self.param_version = 0
+        self.param_changes = {}
+        self.clear()
+
+    def __len__(self):
+        """
+        Returns the number of links in the table
+        """
+        return self.size
+
+    def __iter__(self):
+        """
+        Iterates over Link views of every row in the table
+        """
+        for row in range(self.size):
+            yield Link.view(self, row)
+
+    def __contains__(self, key):
+        """
+        Returns True if a link with the (first, second) names exists
+        :param key: a (first, second) tuple of node names
+        """
+        first_id = self.ids.get(key[0])
+        second_id = self.ids.get(key[1])
+        if first_id is None or second_id is None:
+            return False
+        return self._find_slot(first_id, second_id) is not None
+
+    def values(self):
+        """
+        Lets the table be iterated like the other topology dicts
+        :return: the table itself
+        """
+        return self
+
+    def clear(self):
+        """
+        Removes every link from the table
+        :return: None
+        """
+        capacity = self.INITIAL_CAPACITY
+        self.size = 0
+        self.deleted = 0
+        self.names.clear()
+        self.ids.clear()
+        self.param_changes.clear()
+        self.first = np.empty(capacity, dtype=np.int32)
+        self.second = np.empty(capacity, dtype=np.int32)
+        self.params = [np.empty(capacity, dtype=dtype) for dtype in self.DTYPES]
+        self.next = np.empty(2 * capacity, dtype=np.int32)
+        self.prev = np.empty(2 * capacity, dtype=np.int32)
+        self.head = np.full(capacity, self.EMPTY, dtype=np.int32)
+        self.degrees = np.zeros(capacity, dtype=np.int32)
+        self.slots = np.full(2 * capacity, self.EMPTY, dtype=np.int32)
+
+    def columns(self):
+        """
+        Returns the filled part of every column
+        :return: a dict of column name to NumPy array, including the 'first' and 'second' endpoint ids
+        """
+        columns = {'first': self.first[:self.size], 'second': self.second[:self.size]}
+        for name, column in zip(self.PARAMS, self.params):
+            columns[name] = column[:self.size]
+        return columns
+
+    def set_param(self, index, row, value):
+        """
+        Sets a parameter of a link and records the change
+        :param index: the index of the parameter within PARAMS
+        :param row: the row of the link
+        :param value: the new value, as a number or a numeric string
+        :return: None
+        """
+        self.params[index][row] = self.convert(index, value)
+        self.param_version += 1
+        self.param_changes[(int(self.first[row]), int(self.second[row]), index)] = self.param_version
+
+    @classmethod
+    def convert(cls, index, value):
+        """
+        Converts a parameter to the type of its column, so whole numbers of packets aren't rounded
+        :param index: the index of the parameter within PARAMS
+        :param value: the value, as a number or a numeric string
+        :return: the value as an int or a float
+        """
+        if cls.DTYPES[index] is not np.int64:
+            return float(value)
+        try:
+            return int(value)
+        except ValueError:
+            return int(float(value))
+
+    def changed_since(self, version, index):
+        """
+        Returns the links whose parameter changed after a param_version
+        :param version: the param_version the caller is up to date with
+        :param index: the index of the parameter within PARAMS
+        :return: a list of (first id, second id) pairs of the links still in the table
+        """
+        return [(first_id, second_id) for (first_id, second_id, changed), changed_version in self.param_changes.items()
+                if changed == index and changed_version > version and self._find_slot(first_id, second_id) is not None]
+
+    def endpoint_pairs(self):
+        """
+        Returns the (first, second) names of every link, built from the endpoint id columns
+        :return: a list of (first name, second name) tuples
+        """
+        names = np.empty(len(self.names), dtype=object)
+        names[:] = self.names
+        return list(zip(names[self.first[:self.size]], names[self.second[:self.size]]))
+
+    def intern(self, name):
+        """
+        Returns the integer id of a node name, assigning a new one if needed
+        :param name: the node name
+        :return: the id of the name
+        """
+        node_id = self.ids.get(name)
+        if node_id is None:
+            node_id = len(self.names)
+            self.ids[name] = node_id
+            self.names.append(name)
+            if node_id == len(self.head):
+                self.head = np.concatenate((self.head, np.full(node_id, self.EMPTY, dtype=np.int32)))
+                self.degrees = np.concatenate((self.degrees, np.zeros(node_id, dtype=np.int32)))
+        return node_id
+
+    def _hash(self, first_id, second_id):
+        """
+        Returns the starting position of a (first id, second id) pair within the hash slots
+        :param first_id: the id of the first node
+        :param second_id: the id of the second node
+        :return: the index of the first slot to probe
+        """
+        return ((first_id * 0x9E3779B1) ^ (second_id * 0x85EBCA77)) & (len(self.slots) - 1)
+
+    def _find_slot(self, first_id, second_id):
+        """
+        Finds the hash slot holding the row of the (first id, second id) link
+        :param first_id: the id of the first node
+        :param second_id: the id of the second node
+        :return: the index of the slot or None if the link does not exist
+        """
+        slots = self.slots
+        mask = len(slots) - 1
+        index = self._hash(first_id, second_id)
+        while True:
+            row = slots[index]
+            if row == self.EMPTY:
+                return None
+            if row >= 0 and self.first[row] == first_id and self.second[row] == second_id:
+                return index
+            index = (index + 1) & mask
+
+    def _insert_slot(self, row):
+        """
+        Stores a row in the first free hash slot for its key
+        :param row: the row to store
+        :return: None
+        """
+        slots = self.slots
+        mask = len(slots) - 1
+        index = self._hash(int(self.first[row]), int(self.second[row]))
+        while slots[index] >= 0:
+            index = (index + 1) & mask
+        if slots[index] == self.DELETED:
+            self.deleted -= 1
+        slots[index] = row
+
+    def _rehash(self, slot_count):
+        """
+        Rebuilds the hash slots, dropping deleted markers
+        :param slot_count: the new number of slots, a power of two
+        :return: None
+        """
+        self.slots = np.full(slot_count, self.EMPTY, dtype=np.int32)
+        self.deleted = 0
+        for row in range(self.size):
+            self._insert_slot(row)
+
+    def _grow(self):
+        """
+        Doubles the capacity of every column
+        :return: None
+        """
+        capacity = 2 * len(self.first)
+        self.first = np.resize(self.first, capacity)
+        self.second = np.resize(self.second, capacity)
+        self.params = [np.resize(column, capacity) for column in self.params]
+        self.next = np.resize(self.next, 2 * capacity)
+        self.prev = np.resize(self.prev, 2 * capacity)
+
+    def _link_slot(self, slot, node_id):
+        """
+        Pushes a list slot onto the front of a node's incident-link list
+        :param slot: the list slot of the row
+        :param node_id: the id of the node
+        :return: None
+        """
+        head = self.head[node_id]
+        self.next[slot] = head
+        self.prev[slot] = self.EMPTY
+        if head != self.EMPTY:
+            self.prev[head] = slot
+        self.head[node_id] = slot
+        self.degrees[node_id] += 1
+
+    def _unlink_slot(self, slot, node_id):
+        """
+        Takes a list slot out of a node's incident-link list
+        :param slot: the list slot of the row
+        :param node_id: the id of the node
+        :return: None
+        """
+        prev = self.prev[slot]
+        next = self.next[slot]
+        if prev != self.EMPTY:
+            self.next[prev] = next
+        else:
+            self.head[node_id] = next
+        if next != self.EMPTY:
+            self.prev[next] = prev
+        self.degrees[node_id] -= 1
+
+    def _move_slot(self, old, new, node_id):
+        """
+        Moves a list slot to a new position, keeping its place in the node's incident-link list
+        :param old: the list slot being moved
+        :param new: the list slot it is moved to
+        :param node_id: the id of the node the list belongs to
+        :return: None
+        """
+        prev = self.prev[old]
+        next = self.next[old]
+        self.prev[new] = prev
+        self.next[new] = next
+        if prev != self.EMPTY:
+            self.next[prev] = new
+        else:
+            self.head[node_id] = new
+        if next != self.EMPTY:
+            self.prev[next] = new
+
+    def add(self, link):
+        """
+        Copies a link into a new row of the table, unless the same (first, second) link exists
+        :param link: the link object to add
+        :return: True if the link was added, False if it was a duplicate
+        """
+        first_id = self.intern(link.first)
+        second_id = self.intern(link.second)
+        if self._find_slot(first_id, second_id) is not None:
+            return False
+        if self.size == len(self.first):
+            self._grow()
+        if 2 * (self.size + self.deleted + 1) > len(self.slots):
+            self._rehash(max(len(self.slots), 1 << (4 * (self.size + 1) - 1).bit_length()))
+
+        row = self.size
+        self.first[row] = first_id
+        self.second[row] = second_id
+        if link._table is None:
+            values = link._values
+        else:
+            values = [column[link._row] for column in link._table.params]
+        for column, value in zip(self.params, values):
+            column[row] = value
+        self.size += 1
+        self._insert_slot(row)
+        self._link_slot(2 * row, first_id)
+        self._link_slot(2 * row + 1, second_id)
+        return True
+
+    def find(self, first_name, second_name):
+        """
+        Returns the row of the link between two nodes regardless of the order it was added in
+        :param first_name: the name of one endpoint
+        :param second_name: the name of the other endpoint
+        :return: the row of the link or None if the nodes are not linked
+        """
+        first_id = self.ids.get(first_name)
+        second_id = self.ids.get(second_name)
+        if first_id is None or second_id is None:
+            return None
+        slot = self._find_slot(first_id, second_id)
+        if slot is None:
+            slot = self._find_slot(second_id, first_id)
+            if slot is None:
+                return None
+        return int(self.slots[slot])
+
+    def get(self, first_name, second_name):
+        """
+        Gets the link between two nodes regardless of the order it was added in
+        :param first_name: the name of one endpoint
+        :param second_name: the name of the other endpoint
+        :return: a Link view or None if the nodes are not linked
+        """
+        row = self.find(first_name, second_name)
+        if row is None:
+            return None
+        return Link.view(self, row)
+
+    def _detach(self, row):
+        """
+        Copies a row out of the table into a standalone Link object
+        :param row: the row to copy
+        :return: the Link object
+        """
+        link = Link(self.names[self.first[row]], self.names[self.second[row]])
+        link._values = [column[row].item() for column in self.params]
+        return link
+
+    def _remove_row(self, row):
+        """
+        Removes a row by moving the last row into its place
+        :param row: the row to remove
+        :return: None
+        """
+        first_id = int(self.first[row])
+        second_id = int(self.second[row])
+        self.slots[self._find_slot(first_id, second_id)] = self.DELETED
+        self.deleted += 1
+        self._unlink_slot(2 * row, first_id)
+        self._unlink_slot(2 * row + 1, second_id)
+
+        last = self.size - 1
+        if row != last:
+            last_first = int(self.first[last])
+            last_second = int(self.second[last])
+            self.slots[self._find_slot(last_first, last_second)] = row
+            self.first[row] = last_first
+            self.second[row] = last_second
+            for column in self.params:
+                column[row] = column[last]
+            self._move_slot(2 * last, 2 * row, last_first)
+            self._move_slot(2 * last + 1, 2 * row + 1, last_second)
+        self.size = last
+
+    def remove(self, first_name, second_name):
+        """
+        Removes the link between two nodes regardless of the order it was added in
+        :param first_name: the name of one endpoint
+        :param second_name: the name of the other endpoint
+        :return: a standalone copy of the removed link or None if the nodes are not linked
+        """
+        row = self.find(first_name, second_name)
+        if row is None:
+            return None
+        link = self._detach(row)
+        self._remove_row(row)
+        return link
+
+    def incident_rows(self, name):
+        """
+        Returns the rows of every link touching a node by walking its incident-link list
+        :param name: the name of the node
+        :return: a list of rows, a link from the node to itself is listed once
+        """
+        node_id = self.ids.get(name)
+        if node_id is None:
+            return []
+        rows = []
+        slot = self.head[node_id]
+        while slot != self.EMPTY:
+            if slot & 1 == 0 or self.first[slot >> 1] != node_id:
+                rows.append(int(slot >> 1))
+            slot = self.next[slot]
+        return rows
+
+    def remove_incident(self, name):
+        """
+        Removes every link touching a node using the incident-link lists. Rows are removed from
+        the highest down so moving the last row never moves a row that is still to be removed.
+        :param name: the name of the node whose links should be removed
+        :return: the number of links removed
+        """
+        rows = self.incident_rows(name)
+        for row in sorted(rows, reverse=True):
+            self._remove_row(row)
+        return len(rows)
+
+    def degree(self, name):
+        """
+        Returns the number of links touching a node
+        :param name: the name of the node
+        :return: the number of links touching the node
+        """
+        node_id = self.ids.get(name)
+        if node_id is None:
+            return 0
+        return int(self.degrees[node_id])
+
+
 graph = {
     "hosts": [],
     "switches": [],
@@ -0,0 +1,211 @@
+"""
+This file turns the text Mininet's pingAllFull logs into an N x N reachability and round trip time matrix,
+compares a run with the one before it, and draws the matrices as Plotly heatmaps, since the text itself
+can't be read for more than a dozen hosts.
+"""
+import re
+import time
+
+import numpy as np
+from django.conf import settings
+
+"""Matches a row of reachability results, such as h1 -> h2 X h4"""
+ROW = re.compile(r"^(\S+) -> ?(.*)$", re.M)
+
+"""Matches the round trip time of a pair logged by pingAllFull, keeping the names and the average"""
+RTT = re.compile(r"^ (\S+)->(\S+): \d+/\d+, rtt min/avg/max/mdev [\d.]+/([\d.]+)/", re.M)
+
+"""Matches only the average round trip time of a pair, which is much faster to find for every pair"""
+AVERAGE = re.compile(r"mdev [\d.]+/([\d.]+)")
+
+"""A pair that was answered before counts as slower when its round trip time grows by at least this factor"""
+REGRESSION_RATIO = 1.5
+
+"""How many lost or slower pairs are listed in the output panel"""
+LISTED_PAIRS = 20
+
+
+class PingAllRun:
+    """
+    This class holds the results of one Ping All: which hosts answered each other and in how many ms.
+    Row i and column j are the pings sent from names[i] to names[j].
+    """
+
+    def __init__(self, names, reachable, rtt):
+        """
+        Creates a new PingAllRun object
+        :param names: the host names, in the order of the rows and columns
+        :param reachable: an N x N NumPy array of booleans, True where the ping was answered
+        :param rtt: an N x N float32 NumPy array of round trip times in ms, nan where unknown
+        """
+        self.names = names
+        self.reachable = reachable
+        self.rtt = rtt
+        self.time = time.time()
+
+    def pairs(self):
+        """
+        Returns the number of pings, one each way between every two hosts
+        :return: the number of pings
+        """
+        return len(self.names) * (len(self.names) - 1)
+
+    def summary(self):
+        """
+        Returns the line describing the run in the output panel
+        :return: the line
+        """
+        answered = int(self.reachable.sum())
+        sent = self.pairs()
+        dropped = 100.0 * (sent - answered) / sent if sent else 0.0
+        line = ("*** Ping All: " + str(answered) + "/" + str(sent) + " pings answered between " + str(len(self.names)) +
+                " hosts ({:.0f}% dropped)".format(dropped))
+        rtts = self.rtt[self.reachable & ~np.isnan(self.rtt)]
+        if len(rtts):
+            line += ", rtt median {:.3f} ms, max {:.3f} ms".format(float(np.median(rtts)), float(rtts.max()))
+        return line + "\n"
+
+
+def parse(output):
+    """
+    Reads the results of a Ping All. Each row names its host followed by the other hosts in the order of the rows,
+    or X for those that didn't answer. Round trip times are read from the lines pingAllFull logs after the results,
+    and only kept for the pings that were answered.
+    :param output: the text Mininet logged for the test
+    :return: the PingAllRun, or None if the output holds no results
+    """
+    # The rows come before the round trip times, which are a line for every pair
+    first_rtt = RTT.search(output)
+    rows = [(name, rest) for name, rest in ROW.findall(output, 0, first_rtt.start() if first_rtt else len(output))
+            if name != "***"]
+    if not rows:
+        return None
+    names = [name for name, rest in rows]
+    count = len(names)
+    reachable = np.zeros((count, count), dtype=bool)
+    # Row i lists every column except i, in order
+    others = np.arange(count)
+    for row, (name, rest) in enumerate(rows):
+        answered = np.array(rest.split(), dtype=object) != "X"
+        columns = np.delete(others, row)
+        reachable[row, columns[:len(answered)]] = answered[:len(columns)]
+
+    rtt = np.full((count, count), np.nan, dtype=np.float32)
+    averages = AVERAGE.findall(output, first_rtt.start()) if first_rtt else []
+    if len(averages) == count * (count - 1) and first_rtt.group(1, 2) == (names[0], names[1]):
+        # pingAllFull logs the round trip times in the order of the rows, so they fill the matrix
+        # without reading the names of each line, which is what takes the time for thousands of hosts
+        off_diagonal = ~np.eye(count, dtype=bool)
+        rtt[off_diagonal] = np.array(averages, dtype=np.float32)
+    elif averages:
+        index = {name: position for position, name in enumerate(names)}
+        lines = RTT.findall(output, first_rtt.start())
+        firsts = np.array([index.get(line[0], -1) for line in lines])
+        seconds = np.array([index.get(line[1], -1) for line in lines])
+        values = np.array([line[2] for line in lines], dtype=np.float32)
+        known = (firsts >= 0) & (seconds >= 0)
+        rtt[firsts[known], seconds[known]] = values[known]
+    rtt[~reachable] = np.nan
+    return PingAllRun(names, reachable, rtt)
+
+
+def diff(previous, current, ratio=None):
+    """
+    Compares a run with the one before it, on the hosts both runs tested
+    :param previous: the earlier PingAllRun
+    :param current: the later PingAllRun
+    :param ratio: how much longer a round trip has to take to count as slower, defaults to MINIGNC_PINGALL_REGRESSION_RATIO
+    :return: a dict of the common 'names' and N x N arrays of the pairs 'lost' (answered before, not now),
+             'regained' (the other way around) and 'slower', with the 'rtt_change' in ms
+    """
+    if ratio is None:
+        ratio = getattr(settings, 'MINIGNC_PINGALL_REGRESSION_RATIO', REGRESSION_RATIO)
+    positions = {name: position for position, name in enumerate(previous.names)}
+    common = [(position, positions[name]) for position, name in enumerate(current.names) if name in positions]
+    names = [current.names[position] for position, previous_position in common]
+    now = np.array([position for position, previous_position in common], dtype=np.int64)
+    before = np.array([previous_position for position, previous_position in common], dtype=np.int64)
+    reachable_now = current.reachable[np.ix_(now, now)]
+    reachable_before = previous.reachable[np.ix_(before, before)]
+    rtt_now = current.rtt[np.ix_(now, now)]
+    rtt_before = previous.rtt[np.ix_(before, before)]
+    with np.errstate(invalid='ignore'):
+        slower = reachable_now & reachable_before & (rtt_now >= ratio * rtt_before) & (rtt_now > rtt_before)
+    return {
+        'names': names,
+        'lost': reachable_before & ~reachable_now,
+        'regained': ~reachable_before & reachable_now,
+        'slower': slower,
+        'rtt_change': rtt_now - rtt_before,
+    }
+
+
+def diff_summary(changes):
+    """
+    Returns the lines describing the changes from the previous run in the output panel, listing the first
+    LISTED_PAIRS pairs that were lost or got slower
+    :param changes: the dict returned by diff
+    :return: the text
+    """
+    names = changes['names']
+    lost = np.argwhere(changes['lost'])
+    slower = np.argwhere(changes['slower'])
+    lines = ["*** Compared with the previous run: " + str(len(lost)) + " pings lost, " +
+             str(int(changes['regained'].sum())) + " regained, " + str(len(slower)) + " slower"]
+    for first, second in lost[:LISTED_PAIRS]:
+        lines.append(names[first] + " -> " + names[second] + ": lost")
+    for first, second in slower[:max(0, LISTED_PAIRS - len(lost))]:
+        lines.append(names[first] + " -> " + names[second] + ": rtt " +
+                     "+{:.3f} ms".format(float(changes['rtt_change'][first, second])))
+    return "\n".join(lines) + "\n"
+
+
+def heatmap(run):
+    """
+    Draws a run as a heatmap of the round trip times, with the pings that weren't answered in red
+    :param run: the PingAllRun
+    :return: the figure as a dict
+    """
+    rtt = np.where(run.reachable, run.rtt, np.nan)
+    missing = np.where(run.reachable | np.eye(len(run.names), dtype=bool), np.nan, 1.0)
+    data = [
+        dict(type='heatmap', z=np.round(rtt, 3), x=run.names, y=run.names, colorscale='Viridis',
+             colorbar=dict(title='rtt (ms)'), hovertemplate='%{y} -> %{x}: %{z} ms<extra></extra>'),
+        dict(type='heatmap', z=missing, x=run.names, y=run.names, colorscale=[[0, 'red'], [1, 'red']],
+             showscale=False, hovertemplate='%{y} -> %{x}: no answer<extra></extra>'),
+    ]
+    return dict(data=data, layout=heatmap_layout(run.summary().strip("*\n ")))
+
+
+def diff_heatmap(changes):
+    """
+    Draws the changes from the previous run as a heatmap of how much each round trip time grew, with the
+    pings that were lost in red and those regained in green
+    :param changes: the dict returned by diff
+    :return: the figure as a dict
+    """
+    names = changes['names']
+    largest = np.nanmax(np.abs(changes['rtt_change'])) if np.isfinite(changes['rtt_change']).any() else 0.0
+    lost = np.where(changes['lost'], 1.0, np.nan)
+    regained = np.where(changes['regained'], 1.0, np.nan)
+    data = [
+        dict(type='heatmap', z=np.round(changes['rtt_change'], 3), x=names, y=names, colorscale='RdBu',
+             reversescale=True, zmid=0, zmin=-float(largest), zmax=float(largest), colorbar=dict(title='rtt change (ms)'),
+             hovertemplate='%{y} -> %{x}: %{z:+} ms<extra></extra>'),
+        dict(type='heatmap', z=lost, x=names, y=names, colorscale=[[0, 'red'], [1, 'red']], showscale=False,
+             hovertemplate='%{y} -> %{x}: lost<extra></extra>'),
+        dict(type='heatmap', z=regained, x=names, y=names, colorscale=[[0, 'green'], [1, 'green']], showscale=False,
+             hovertemplate='%{y} -> %{x}: regained<extra></extra>'),
+    ]
+    title = diff_summary(changes).splitlines()[0].strip("* ")
+    return dict(data=data, layout=heatmap_layout(title))
+
+
+def heatmap_layout(title):
+    """
+    Returns the layout of a heatmap, with the first host at the top like the rows of the text output
+    :param title: the title of the figure
+    :return: the layout dict
+    """
+    return dict(title=dict(text=title), margin=dict(b=40, l=60, r=5, t=40),
+                xaxis=dict(title='to', showgrid=False), yaxis=dict(title='from', autorange='reversed', showgrid=False))
@@ -0,0 +1,267 @@
+"""
+This file finds the paths traffic takes through the network, working on the link table's
+endpoint id columns as a sparse matrix so paths for many host pairs are found at once.
+"""
+import threading
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra, shortest_path
+
+from .nodes import LinkTable
+
+"""The column of the link table holding the delay"""
+DELAY = LinkTable.PARAMS.index('delay')
+
+
+def link_matrix(graph):
+    """
+    Returns the links of the topology as a symmetric sparse matrix indexed by the link table's node ids.
+    It is built once per topology version.
+    :param graph: the topology store
+    :return: an n x n scipy CSR matrix with a 1 for every pair of linked nodes
+    """
+    def build(graph):
+        columns = graph.links.columns()
+        count = len(graph.links.names)
+        rows = np.concatenate((columns['first'], columns['second']))
+        cols = np.concatenate((columns['second'], columns['first']))
+        matrix = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(count, count))
+        matrix.data[:] = 1.0
+        return matrix
+
+    return graph.cached('link-matrix', build)
+
+
+def hop_paths(graph, pairs):
+    """
+    Finds the path with the fewest hops between each pair of nodes. This is the path a tree
+    network forwards along, and one of the shortest ones for networks with loops.
+    One breadth-first search is run for each distinct first node.
+    :param graph: the topology store
+    :param pairs: a list of (node name, node name) pairs
+    :return: a list with, for each pair, the list of node ids along the path, or None if there is no path
+    """
+    ids = graph.links.ids
+    sources = sorted({ids[first] for first, second in pairs if first in ids})
+    if not sources:
+        return [None] * len(pairs)
+    source_row = {source: row for row, source in enumerate(sources)}
+    distances, predecessors = shortest_path(link_matrix(graph), directed=False, unweighted=True,
+                                            indices=sources, return_predecessors=True)
+
+    paths = []
+    for first, second in pairs:
+        if first not in ids or second not in ids:
+            paths.append(None)
+            continue
+        row = source_row[ids[first]]
+        node = ids[second]
+        if np.isinf(distances[row, node]):
+            paths.append(None)
+            continue
+        path = [node]
+        while node != ids[first]:
+            node = int(predecessors[row, node])
+            path.append(node)
+        path.reverse()
+        paths.append(path)
+    return paths
+
+
+def path_links(path):
+    """
+    Returns the links along a path, each as an (id, id) pair with the smaller id first
+    :param path: a list of node ids
+    :return: a set of the links along the path
+    """
+    return {(min(a, b), max(a, b)) for a, b in zip(path, path[1:])}
+
+
+def leaf_anchors(table):
+    """
+    Finds the leaves of the network: nodes with a single link to a node with more links, like the
+    hosts of a switch. Traffic never passes through a leaf, so paths to it are the paths to the node
+    it hangs off (its anchor) plus its own link.
+    :param table: the LinkTable
+    :return: a tuple of (the anchor of every node id, itself for nodes that aren't leaves;
+             the row of the link each leaf hangs off, -1 for nodes that aren't leaves)
+    """
+    columns = table.columns()
+    count = len(table.names)
+    first = columns['first'].astype(np.int64)
+    second = columns['second'].astype(np.int64)
+    degrees = np.bincount(np.concatenate((first, second)), minlength=count)
+    anchor = np.arange(count)
+    access = np.full(count, -1)
+    for leaf, other in ((first, second), (second, first)):
+        rows = np.flatnonzero((degrees[leaf] == 1) & (degrees[other] > 1))
+        anchor[leaf[rows]] = other[rows]
+        access[leaf[rows]] = rows
+    return anchor, access
+
+
+def weight_matrix(table, column):
+    """
+    Returns a link parameter as a symmetric sparse matrix indexed by the link table's node ids.
+    Nodes linked more than once get the smallest value, and links with a value of 0 are kept.
+    :param table: the LinkTable
+    :param column: the name of the parameter, such as 'delay'
+    :return: an n x n scipy CSR matrix
+    """
+    columns = table.columns()
+    count = len(table.names)
+    first = columns['first'].astype(np.int64)
+    second = columns['second'].astype(np.int64)
+    values = columns[column].astype(np.float64)
+    loops = first == second
+    low = np.minimum(first, second)[~loops]
+    high = np.maximum(first, second)[~loops]
+    keys, inverse = np.unique(low * count + high, return_inverse=True)
+    weights = np.full(len(keys), np.inf)
+    np.minimum.at(weights, inverse, values[~loops])
+    rows = np.concatenate((keys // max(count, 1), keys % max(count, 1)))
+    cols = np.concatenate((keys % max(count, 1), keys // max(count, 1)))
+    return csr_matrix((np.concatenate((weights, weights)), (rows, cols)), shape=(count, count))
+
+
+class LatencyMatrix:
+    """
+    This class holds the one-way latency between every pair of hosts along the paths with the least
+    delay, found with Dijkstra's algorithm from every host at once.
+    A host with a single link to a switch (a leaf) is never passed through, so the search is only run
+    from the nodes the hosts hang off (their anchors) and each host's own link delay is added at both ends.
+    When a link delay changes, only the searches whose result could change are run again: those whose
+    paths use the link, and those the new delay gives a shorter path to.
+    """
+
+    def __init__(self, graph):
+        """
+        Creates a new LatencyMatrix object, searching from the anchor of every host
+        :param graph: the topology store
+        """
+        self.table = table = graph.links
+        self.names = [host.name for host in graph.get('hosts')]
+        self.lock = threading.Lock()
+        count = len(table.names)
+        self.anchor, self.access = leaf_anchors(table)
+
+        self.ids = np.array([table.ids.get(name, -1) for name in self.names], dtype=np.int64)
+        known = self.ids >= 0
+        self.sources = np.unique(self.anchor[self.ids[known]])
+        self.source_row = np.full(count, -1)
+        self.source_row[self.sources] = np.arange(len(self.sources))
+
+        self.version = table.param_version
+        self.weights = weight_matrix(table, 'delay')
+        self.distances = np.empty((0, count))
+        self.predecessors = np.empty((0, count), dtype=np.int32)
+        if len(self.sources):
+            self.distances, self.predecessors = dijkstra(self.weights, directed=False, indices=self.sources,
+                                                         return_predecessors=True)
+        self.refreshed = len(self.sources)
+
+    def refresh(self):
+        """
+        Brings the searches up to date with the link delays changed since they were run.
+        Changing the delay of a leaf's own link needs no search, it is read when the latency is looked up.
+        :return: the number of searches that were run again
+        """
+        with self.lock:
+            changes = self.table.changed_since(self.version, DELAY)
+            self.version = self.table.param_version
+            changes = [(first, second) for first, second in changes
+                       if self.access[first] < 0 and self.access[second] < 0 and first != second]
+            if not changes:
+                self.refreshed = 0
+                return 0
+            weights = weight_matrix(self.table, 'delay')
+            affected = np.zeros(len(self.sources), dtype=bool)
+            for first, second in changes:
+                weight = weights[first, second]
+                affected |= self.predecessors[:, second] == first
+                affected |= self.predecessors[:, first] == second
+                affected |= self.distances[:, first] + weight < self.distances[:, second]
+                affected |= self.distances[:, second] + weight < self.distances[:, first]
+            self.weights = weights
+            rows = np.flatnonzero(affected)
+            if len(rows):
+                distances, predecessors = dijkstra(weights, directed=False, indices=self.sources[rows],
+                                                   return_predecessors=True)
+                self.distances[rows] = distances
+                self.predecessors[rows] = predecessors
+            self.refreshed = len(rows)
+            return len(rows)
+
+    def access_delays(self, ids):
+        """
+        Returns the delay of the link each node hangs off, or 0 for nodes that aren't leaves
+        :param ids: a NumPy array of link table ids
+        :return: a NumPy array of delays in ms
+        """
+        access = self.access[ids]
+        delays = self.table.columns()['delay'].astype(np.float64)
+        return np.where(access >= 0, delays[access], 0.0)
+
+    def matrix(self):
+        """
+        Returns the one-way latency between every pair of hosts
+        :return: a len(names) x len(names) NumPy array of latencies in ms, inf for hosts that can't reach each other
+        """
+        count = len(self.names)
+        known = self.ids >= 0
+        ids = np.maximum(self.ids, 0)
+        with self.lock:
+            if len(self.sources) == 0:
+                latency = np.full((count, count), np.inf)
+            else:
+                anchors = self.anchor[ids]
+                access = self.access_delays(ids)
+                latency = self.distances[self.source_row[anchors]][:, anchors] + access[:, None] + access[None, :]
+        latency[~known, :] = np.inf
+        latency[:, ~known] = np.inf
+        np.fill_diagonal(latency, 0.0)
+        return latency
+
+    def path(self, first, second):
+        """
+        Rebuilds the path with the least delay between two hosts
+        :param first: the name of the first host
+        :param second: the name of the second host
+        :return: a tuple of (the node names along the path, its one-way latency in ms), or (None, inf) if there is no path
+        """
+        ids = self.table.ids
+        if first not in ids or second not in ids or self.source_row[self.anchor[ids[first]]] < 0:
+            return None, np.inf
+        start = ids[first]
+        end = ids[second]
+        row = self.source_row[self.anchor[start]]
+        if start == end:
+            return [first], 0.0
+        with self.lock:
+            target = self.anchor[end]
+            if np.isinf(self.distances[row, target]):
+                return None, np.inf
+            path = [target]
+            while path[-1] != self.anchor[start]:
+                path.append(int(self.predecessors[row, path[-1]]))
+            path.reverse()
+            latency = float(self.distances[row, target])
+        if path[0] != start:
+            path.insert(0, start)
+            latency += float(self.access_delays(np.array([start]))[0])
+        if path[-1] != end:
+            path.append(end)
+            latency += float(self.access_delays(np.array([end]))[0])
+        return [self.table.names[node] for node in path], latency
+
+
+def get_latency(graph):
+    """
+    Returns the LatencyMatrix of the current topology version, brought up to date with any link delay changes
+    :param graph: the topology store
+    :return: the LatencyMatrix
+    """
+    latency = graph.cached('latency', LatencyMatrix)
+    latency.refresh()
+    return latency
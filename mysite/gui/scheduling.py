@@ -0,0 +1,121 @@
+"""
+This file schedules iPerf tests so pairs whose traffic doesn't share any link run at the same time.
+Pairs are grouped using the paths between them in the link graph, and each group is run
+concurrently by the emulation worker.
+"""
+import re
+
+from django.conf import settings
+
+from . import emulation
+from . import routing
+
+"""How many iPerf tests run at the same time at most"""
+MAX_PARALLEL = 4
+
+"""How long each iPerf test sends traffic for, the same as Mininet's default"""
+IPERF_SECONDS = 5
+
+"""Matches a bandwidth reported by iPerf, such as 9.56 Mbits/sec"""
+BANDWIDTH = re.compile(r"([\d.]+)\s*([KMG]?)bits/sec")
+
+"""The factor that converts each unit of BANDWIDTH to Mbits/sec"""
+UNITS = {'': 1e-6, 'K': 1e-3, 'M': 1.0, 'G': 1e3}
+
+
+def group_pairs(graph, pairs, max_parallel):
+    """
+    Groups host pairs so that the pairs of a group share no link along their paths and no host,
+    with at most max_parallel pairs in a group. Pairs with the longest paths are placed first,
+    each into the first group it fits in.
+    :param graph: the topology store
+    :param pairs: a list of (host name, host name) pairs
+    :param max_parallel: the most pairs a group can have
+    :return: a list of groups, each a list of indexes into pairs
+    """
+    paths = routing.hop_paths(graph, pairs)
+    links = [routing.path_links(path) if path is not None else set() for path in paths]
+    order = sorted(range(len(pairs)), key=lambda index: -len(links[index]))
+
+    groups = []
+    for index in order:
+        hosts = set(pairs[index])
+        for group in groups:
+            if (len(group['pairs']) < max_parallel and group['links'].isdisjoint(links[index]) and
+                    group['hosts'].isdisjoint(hosts)):
+                break
+        else:
+            group = {'pairs': [], 'links': set(), 'hosts': set()}
+            groups.append(group)
+        group['pairs'].append(index)
+        group['links'] |= links[index]
+        group['hosts'] |= hosts
+    return [group['pairs'] for group in groups]
+
+
+def parse_throughput(output):
+    """
+    Reads the bandwidths from the output of an iPerf test
+    :param output: the text Mininet logged for the test
+    :return: a list of the [server, client] bandwidths in Mbits/sec
+    """
+    return [float(value) * UNITS[unit] for value, unit in BANDWIDTH.findall(output)]
+
+
+def run_concurrent_iperf(graph, pairs, max_parallel=None, seconds=None, session=None, on_line=None, check=None):
+    """
+    Runs iPerf on every pair, testing the pairs of each group from group_pairs at the same time
+    :param graph: the topology store
+    :param pairs: a list of (host name, host name) pairs
+    :param max_parallel: the most tests run at the same time, defaults to MINIGNC_IPERF_MAX_PARALLEL
+    :param seconds: how long each test sends traffic for, defaults to MINIGNC_IPERF_SECONDS
+    :param session: the EmulationSession to use, defaults to the one shared by the GUI
+    :param on_line: a function called with each line logged as the tests finish
+    :param check: a function that raises if the caller was stopped while it waited for the session
+    :return: a dict with the 'results' in the order of pairs, the number of 'groups', the
+             'parallel_seconds' the tests took in groups, the 'estimated_sequential_seconds' they would
+             take one after the other and the 'estimated_saved_seconds' between the two. The sequential
+             time isn't measured: it is estimated as the sum of the durations of the concurrent tests.
+             Each result is a dict of 'test', 'first', 'second', 'ok', 'output', 'seconds', 'group'
+             and 'throughput' in Mbits/sec.
+    """
+    if max_parallel is None:
+        max_parallel = getattr(settings, 'MINIGNC_IPERF_MAX_PARALLEL', MAX_PARALLEL)
+    if max_parallel < 1:
+        raise ValueError("The maximum parallelism must be at least 1")
+    if seconds is None:
+        seconds = getattr(settings, 'MINIGNC_IPERF_SECONDS', IPERF_SECONDS)
+    if session is None:
+        session = emulation.get_session()
+
+    groups = group_pairs(graph, pairs, max_parallel)
+    responses = session.run_iperf_groups(graph, [[pairs[index] for index in group] for group in groups],
+                                         seconds, on_line, check) if groups else []
+
+    results = [None] * len(pairs)
+    parallel_seconds = 0.0
+    for number, (group, group_responses) in enumerate(zip(groups, responses)):
+        for index, response in zip(group, group_responses):
+            output = response['output'] if response['ok'] else response['error']
+            results[index] = {
+                'test': 'iperf',
+                'first': pairs[index][0],
+                'second': pairs[index][1],
+                'ok': response['ok'],
+                'output': output,
+                'seconds': response['seconds'],
+                'group': number,
+                'throughput': parse_throughput(output) if response['ok'] else [],
+            }
+        parallel_seconds += max(response['seconds'] for response in group_responses)
+
+    # Running the tests one at a time as well would double the time of the plan, so that time is estimated
+    sequential_seconds = sum(result['seconds'] for result in results)
+    return {
+        'results': results,
+        'groups': len(groups),
+        'max_parallel': max_parallel,
+        'parallel_seconds': parallel_seconds,
+        'estimated_sequential_seconds': sequential_seconds,
+        'estimated_saved_seconds': sequential_seconds - parallel_seconds,
+    }
@@ -0,0 +1,152 @@
+"""
+This file generates the Python scripts that build a network with Mininet. A script holds the nodes
+and links as data tables that a few loops add to the network, instead of a statement for every node
+and link, so it is quick both to generate and for Python 2 to compile. Scripts are kept by a hash of
+the topology, so an unchanged network isn't generated again, and written to disk in one atomic step.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .nodes import LinkTable, format_number
+
+"""How many generated scripts are kept"""
+CACHE_SIZE = 8
+
+"""The name of the script make_file writes for the user to run with Mininet"""
+FILE_NAME = "new_file.py"
+
+"""The first line of every script, naming the hash of the topology it builds"""
+HEADER = "# -*- coding: utf-8 -*-\n# minignc network {digest}\n"
+
+"""The part of the script that builds the network from the tables into a Mininet object named net"""
+TEMPLATE = """from mininet.net import Mininet
+from mininet.link import TCLink
+net = Mininet(link=TCLink)
+
+HOSTS = [{hosts}]
+SWITCHES = [{switches}]
+CONTROLLERS = [{controllers}]
+# first, second, bandwidth (Mbits/sec), delay, loss (%), max queue size
+LINKS = [{links}]
+
+for name, ip in HOSTS:
+    net.addHost(name)
+for name in SWITCHES:
+    net.addSwitch(name)
+for name in CONTROLLERS:
+    net.addController(name)
+for first, second, bw, delay, loss, max_queue_size in LINKS:
+    net.addLink(first, second, bw=bw, delay=delay, loss=loss, max_queue_size=max_queue_size)
+for name, ip in HOSTS:
+    net.get(name).setIP(ip)
+"""
+
+"""The scripts generated so far, by the hash of their topology, least recently used first"""
+cache = OrderedDict()
+cache_lock = threading.Lock()
+
+
+def topology_digest(graph):
+    """
+    Hashes everything a script is generated from: the nodes, the host IPs and the link table's columns
+    :param graph: the topology store
+    :return: the hex digest
+    """
+    digest = hashlib.sha1()
+    for key in ('hosts', 'switches', 'controllers'):
+        digest.update(("\0" + key + "\0").encode())
+        for node in graph.get(key):
+            digest.update((node.name + "\0" + (node.ip if key == 'hosts' else "") + "\0").encode())
+    table = graph.links
+    digest.update("\0".join(table.names).encode())
+    for column in table.columns().values():
+        digest.update(np.ascontiguousarray(column).tobytes())
+    return digest.hexdigest()
+
+
+def link_rows(table):
+    """
+    Returns the rows of the LINKS table. Each column is formatted once per distinct value.
+    :param table: the LinkTable
+    :return: a list of the rows as Python literals
+    """
+    if not len(table):
+        return []
+    columns = table.columns()
+    names = np.array([repr(name) for name in table.names], dtype=object)
+    formatted = []
+    for param in LinkTable.PARAMS:
+        values, inverse = np.unique(columns[param], return_inverse=True)
+        text = [format_number(value) for value in values]
+        if param == 'delay':
+            text = [repr(value + "ms") for value in text]
+        formatted.append(np.array(text, dtype=object)[inverse.reshape(-1)])
+    rows = zip(names[columns['first']], names[columns['second']], *formatted)
+    return ["(" + ", ".join(row) + ")" for row in rows]
+
+
+def build_script(graph, digest=None):
+    """
+    Generates the script that builds a network
+    :param graph: the topology store
+    :param digest: the hash of the topology, see topology_digest
+    :return: the script as a string
+    """
+    def table(rows):
+        return "".join("\n    " + row + "," for row in rows) + ("\n" if rows else "")
+
+    return HEADER.format(digest=digest or topology_digest(graph)) + TEMPLATE.format(
+        hosts=table([repr((host.name, host.ip)) for host in graph.get('hosts')]),
+        switches=table([repr(switch.name) for switch in graph.get('switches')]),
+        controllers=table([repr(controller.name) for controller in graph.get('controllers')]),
+        links=table(link_rows(graph.links)),
+    )
+
+
+def network_script(graph):
+    """
+    Returns the script that builds a network into a Mininet object named net. Scripts are kept for each
+    version of the topology, and by the hash of the topology so a network built again reuses its script.
+    :param graph: the topology store
+    :return: the script as a string
+    """
+    def lookup(graph):
+        digest = topology_digest(graph)
+        with cache_lock:
+            if digest in cache:
+                cache.move_to_end(digest)
+                return cache[digest]
+        script = build_script(graph, digest)
+        with cache_lock:
+            cache[digest] = script
+            while len(cache) > CACHE_SIZE:
+                cache.popitem(last=False)
+        return script
+
+    return graph.cached('network-script', lookup, params=True)
+
+
+def write_script(script, path, name=FILE_NAME):
+    """
+    Writes a script in one step, through a temporary file that replaces the old script,
+    so the script can't be run half written
+    :param script: the script
+    :param path: the directory to write it to
+    :param name: the name of the file
+    :return: the path of the file
+    """
+    file_path = os.path.join(path, name)
+    descriptor, temporary = tempfile.mkstemp(dir=path, prefix="." + name + "-", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+            file.write(script)
+        os.replace(temporary, file_path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return file_path
@@ -0,0 +1,93 @@
+"""
+This file streams the output of emulation jobs to the browser as server-sent events while it is produced.
+Each job writes its lines to an OutputBuffer, which only keeps the most recent lines, so a run
+that logs a lot can't grow the memory of the server. Readers that fall behind skip the lines that
+were dropped and are told how many they missed.
+"""
+import threading
+from collections import deque
+
+"""How many lines of output a job keeps for readers that haven't read them yet"""
+BUFFER_LINES = 1000
+
+"""Longer lines are cut, so output without new lines can't grow without bound either"""
+MAX_LINE = 4096
+
+"""How often a keep-alive comment is sent while a job is quiet, in seconds"""
+KEEPALIVE_SECONDS = 15
+
+
+class OutputBuffer:
+    """
+    This class holds the most recent lines of output of a job. Every line is numbered from 1,
+    so a reader can ask for the lines after the last one it read.
+    """
+
+    def __init__(self, size=BUFFER_LINES):
+        """
+        Creates a new, empty OutputBuffer object
+        :param size: how many lines are kept
+        """
+        self.lines = deque(maxlen=size)
+        self.count = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def write(self, line):
+        """
+        Adds a line, dropping the oldest line if the buffer is full
+        :param line: the line, without its new line
+        """
+        with self.condition:
+            if self.closed:
+                return
+            self.count += 1
+            self.lines.append(line[:MAX_LINE])
+            self.condition.notify_all()
+
+    def close(self):
+        """
+        Marks the output as complete, waking up the readers
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def read(self, after=0, timeout=None):
+        """
+        Returns the lines after a line number, waiting for one if there isn't any yet
+        :param after: the number of the last line already read
+        :param timeout: how many seconds to wait, or None to wait until a line is written or the buffer is closed
+        :return: a tuple of (the number of the first line returned, the lines, how many lines after
+                 the given one were dropped before they could be read, whether the buffer is closed)
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.count > after or self.closed, timeout)
+            first = self.count - len(self.lines) + 1
+            start = max(after + 1, first)
+            lines = list(self.lines)[start - first:]
+            return start, lines, start - after - 1, self.closed
+
+
+def event_stream(buffer, after=0, finish=None):
+    """
+    Yields the lines of a buffer as server-sent events until it is closed. Each line is a message with
+    its line number as the event id, so a browser that reconnects carries on where it stopped.
+    Dropped lines are sent as a skipped event with their count and the end of the output as an end event.
+    :param buffer: the OutputBuffer to read
+    :param after: the number of the last line already read
+    :param finish: a function returning the data of the end event, such as the status of the job
+    :return: a generator of the text of the events
+    """
+    while True:
+        start, lines, dropped, closed = buffer.read(after, KEEPALIVE_SECONDS)
+        if dropped:
+            yield "event: skipped\ndata: " + str(dropped) + "\n\n"
+        for number, line in enumerate(lines, start):
+            yield "id: " + str(number) + "\ndata: " + line.replace("\r", "") + "\n\n"
+        after = start + len(lines) - 1
+        if closed and not lines:
+            yield "event: end\ndata: " + (finish() if finish is not None else "") + "\n\n"
+            return
+        if not lines and not dropped:
+            yield ": keep-alive\n\n"
@@ -1,10 +1,16 @@
-import plotly.graph_objects as go
 import networkx as nx
+import numpy as np
+from django.conf import settings
 from pathlib import Path
 import os
-import subprocess
 import importlib.util
-import copy
+from gui import capacity
+from gui import clustering
+from gui import emulation
+from gui import layout
+from gui import scripts
+from gui import timings
+from gui import viewport
 
 """
 This file handles the logic when a button is pressed on our GUI
@@ -30,51 +36,198 @@ spec.loader.exec_module(db_testing)
 
 filename = ''
 
+"""Graphs with more nodes and links than this are drawn with WebGL (Scattergl) instead of SVG"""
+WEBGL_THRESHOLD = 5000
 
-def make_graph(graph):
+
+def make_graph(graph, engine=None, detail=None, expanded=()):
     """
-    This sets up the graph based on the parameters from the user and makes an HTML file of the graph
+    This sets up the graph based on the parameters from the user. The figure is returned as a dict
+    so it can be sent to the browser as JSON, see views.figure_json.
+    Large networks are drawn at a lower level of detail, where each edge switch and its hosts
+    are collapsed into a single cluster node (see clustering.py).
     :param graph: The object that stores the different nodes and links within the network
+    :param engine: the name of the layout engine to use, or None/'auto' to pick one by graph size
+    :param detail: 'clusters', 'full', or None/'auto' to draw clusters for graphs over MINIGNC_CLUSTER_MIN_NODES
+    :param expanded: the names of the clusters to draw in full
+    :return: a tuple of (the Plotly figure as a dict, the key of the layout used)
 
     Author: Orignally Written by Gatlin and Cade. Modified by Noah and Miles (roughly 60% was modified)
     """
+    nx_graph, layout_key, names, positions, edges = lay_out_graph(graph, engine)
+
+    # Collapsing the clusters that aren't expanded, each cluster is drawn where its switch is
+    hierarchy = None
+    if clustering.use_clusters(detail, len(names)):
+        hierarchy = clustering.get_hierarchy(graph)
+        rows, edges, collapsed_rows, expanded_rows = hierarchy.collapse(names, edges, expanded)
+        names = [names[row] for row in rows]
+        positions = positions[rows]
+
+    # WebGL traces are used for large graphs since SVG slows the browser down with many points
+    use_webgl = len(names) + len(edges) > getattr(settings, 'MINIGNC_WEBGL_THRESHOLD', WEBGL_THRESHOLD)
+
+    # Setting node_trace and edge_trace for Plotly graphing
+    node_trace = get_node_trace(positions, use_webgl)
+    edge_trace = get_edge_trace(edges, positions, use_webgl)
+
+    # Setting the text to display on node hover
+    set_node_text(nx_graph, names, node_trace)
+    if hierarchy is not None:
+        clustering.set_cluster_text(hierarchy, node_trace, collapsed_rows, expanded_rows)
+
+    # The figure is kept as a plain dict, since validating every point through plotly's
+    # graph objects costs more than building the traces for large graphs
+    fig = dict(data=[edge_trace, node_trace], layout=get_figure_layout())
+
+    return fig, layout_key
+
+
+def lay_out_graph(graph, engine=None):
+    """
+    This builds the nx_graph of the network, lays it out and gathers the positions and edges into arrays.
+    :param graph: The object that stores the different nodes and links within the network
+    :param engine: the name of the layout engine to use, or None/'auto' to pick one by graph size
+    :return: a tuple of (the nx_graph, the key of the layout used, the node names, an n x 2 array of
+             node positions in the order of the names, an m x 2 array of the rows of the endpoints of every edge)
+    """
     # The graph object used to build the network throughout the function
     nx_graph = nx.Graph()
 
-    # Adds links from within the network
-    link_list = []
-    for link in graph.get('links'):
-        link_list.append(link.to_tuple())
-
-    # Sets edges for nx_graph
-    nx_graph.add_edges_from(link_list)
+    # Adds links from within the network, read straight from the link table's endpoint columns
+    nx_graph.add_edges_from(graph.get('links').endpoint_pairs())
 
     # Setting the nodes and positions for nx_graph
-    set_nx_graph_nodes(graph, nx_graph)
+    layout_key = set_nx_graph_nodes(graph, nx_graph, engine)
 
-    # Setting node_trace and edge_trace for Plotly graphing
-    node_trace = get_node_trace(nx_graph)
-    edge_trace = get_edge_trace(nx_graph)
+    # Gathering every position into one matrix so the traces can be built with array operations
+    names = list(nx_graph.nodes())
+    positions = get_position_matrix(nx_graph, names)
+    edges = get_edge_matrix(nx_graph, names)
+    return nx_graph, layout_key, names, positions, edges
 
-    # Setting the text to display on node hover
-    set_node_text(nx_graph, node_trace)
 
-    fig = go.Figure(data=[edge_trace, node_trace],
-                    layout=go.Layout(
-                        showlegend=False, hovermode='closest',
-                        margin=dict(b=20, l=5, r=5, t=40),
-                        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-                        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False))
-                    )
+def get_figure_layout(rect=None):
+    """
+    This sets up the layout of the figure, which hides the axes since positions have no units.
+    :param rect: the [x0, y0, x1, y1] range to show, or None to fit the whole graph
+    :return: the layout dict of the figure
+    """
+    figure_layout = dict(
+        showlegend=False, hovermode='closest',
+        margin=dict(b=20, l=5, r=5, t=40),
+        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False))
+    if rect is not None:
+        figure_layout['xaxis']['range'] = [rect[0], rect[2]]
+        figure_layout['yaxis']['range'] = [rect[1], rect[3]]
+    return figure_layout
 
-    fig.write_html(PATH + 'figure.html')
 
-def set_nx_graph_nodes(graph, nx_graph):
+def get_spatial_indexes(graph, engine=None):
+    """
+    This builds the spatial indexes used to send the browser only the part of the graph it shows.
+    There is one for the full graph and, if the network has clusters, one with every cluster collapsed.
+    They are built once per topology version and layout engine.
+    :param graph: The object that stores the different nodes and links within the network
+    :param engine: the name of the layout engine to use, or None/'auto' to pick one by graph size
+    :return: a dict of 'full' and 'clusters' to viewport.SpatialIndex
+    """
+    def build(graph):
+        nx_graph, layout_key, names, positions, edges = lay_out_graph(graph, engine)
+        colors = [nx_graph.nodes[name]['color'] for name in names]
+        indexes = {'full': viewport.SpatialIndex(names, positions, edges, colors)}
+
+        hierarchy = clustering.get_hierarchy(graph)
+        if len(hierarchy):
+            rows, cluster_edges, collapsed_rows, expanded_rows = hierarchy.collapse(names, edges)
+            cluster_colors = [colors[row] for row in rows]
+            for row in collapsed_rows:
+                cluster_colors[row] = clustering.CLUSTER_COLOR
+            indexes['clusters'] = viewport.SpatialIndex([names[row] for row in rows], positions[rows],
+                                                        cluster_edges, cluster_colors, collapsed_rows)
+        return indexes
+
+    return graph.cached('spatial-indexes-' + layout.requested_engine(engine), build)
+
+
+def make_viewport(graph, engine=None, detail=None, rect=None):
+    """
+    This sets up the part of the graph within a viewport. Only the nodes inside the viewport and
+    the edges crossing it are sent, so the size of the response follows what is on screen rather
+    than the size of the network. Hover text is left out and looked up with get_nearest_node instead.
+    :param graph: The object that stores the different nodes and links within the network
+    :param engine: the name of the layout engine to use, or None/'auto' to pick one by graph size
+    :param detail: 'clusters', 'full', or None/'auto' to draw clusters when the viewport holds too many nodes
+    :param rect: the [x0, y0, x1, y1] viewport, or None for the whole graph
+    :return: a dict with the figure 'data' and 'layout', the 'detail' level used, the 'bounds' of the
+             whole graph and the number of 'nodes' and 'edges' sent
+    """
+    level, index = viewport.choose_index(get_spatial_indexes(graph, engine), detail, rect)
+    bounds = index.bounds()
+    rows, edge_rows = index.query(*(rect if rect is not None else bounds))
+
+    use_webgl = len(rows) + len(edge_rows) > getattr(settings, 'MINIGNC_WEBGL_THRESHOLD', WEBGL_THRESHOLD)
+    node_trace = get_node_trace(index.positions[rows], use_webgl)
+    node_trace['hoverinfo'] = 'none'
+    node_trace['marker']['color'] = index.colors[rows].tolist()
+    if index.clusters:
+        node_trace['marker']['size'] = [clustering.CLUSTER_SIZE if row in index.clusters else clustering.NODE_SIZE
+                                        for row in rows.tolist()]
+    edge_trace = get_edge_trace(index.edges[edge_rows], index.positions, use_webgl)
+
+    return {
+        'data': [edge_trace, node_trace],
+        'layout': get_figure_layout(rect if rect is not None else bounds),
+        'detail': level,
+        'bounds': bounds,
+        'nodes': len(rows),
+        'edges': len(edge_rows),
+    }
+
+
+def get_nearest_node(graph, x, y, engine=None, detail=None, rect=None):
+    """
+    This finds the node closest to a point of a viewport, used for hover and click lookups.
+    :param graph: The object that stores the different nodes and links within the network
+    :param x: the x coordinate of the point
+    :param y: the y coordinate of the point
+    :param engine: the name of the layout engine to use, or None/'auto' to pick one by graph size
+    :param detail: the detail level of the viewport, see make_viewport
+    :param rect: the [x0, y0, x1, y1] viewport, or None for the whole graph
+    :return: a dict with the 'name', hover 'text', position and 'distance' of the node, or None for an empty graph
+    """
+    level, index = viewport.choose_index(get_spatial_indexes(graph, engine), detail, rect)
+    found = index.nearest(x, y)
+    if found is None:
+        return None
+    row, distance = found
+    name = index.names[row]
+    if row in index.clusters:
+        text = clustering.get_hierarchy(graph).get_hover_text(index.clusters[row])
+    else:
+        node = graph.get_node(name)
+        if node is not None and node.get_type() == 'host':
+            text = get_hover_text({'name': name, 'ip': node.ip, 'links_info': node.link_log,
+                                   'capacity': capacity.get_hover_text(graph).get(name, "")})
+        else:
+            text = name
+    return {
+        'name': name,
+        'text': text,
+        'x': float(index.positions[row, 0]),
+        'y': float(index.positions[row, 1]),
+        'distance': distance,
+    }
+
+def set_nx_graph_nodes(graph, nx_graph, engine=None):
     """
     This function sets up the different nodes for the nx_graph object used to graph the network.
 
     :param graph: The object that stores the different nodes and links within the network
     :param nx_graph: The object used to represent the network
+    :param engine: the name of the layout engine to use, or None/'auto' to pick one by graph size
+    :return: the key of the layout used, which names the engine and the topology fingerprint
 
     Author: Orignally Written by Gatlin and Cade. Modified by Noah and Miles (roughly 70% was modified for position plotting)
     """
@@ -85,39 +238,52 @@ def set_nx_graph_nodes(graph, nx_graph):
     for controller in graph.get('controllers'):
         nx_graph.add_node(controller.name, type='Controller', color='blue', name=controller.name, ip="")
         # print("Added controller " + controller.name)
+    # Hosts also show the range of bandwidths of their widest paths to the other hosts
+    capacities = capacity.get_hover_text(graph)
     for host in graph.get('hosts'):
-        nx_graph.add_node(host.name, type='Host', color='red', name=host.name, ip=host.ip, links_info=host.link_log)
+        nx_graph.add_node(host.name, type='Host', color='red', name=host.name, ip=host.ip, links_info=host.link_log,
+                          capacity=capacities.get(host.name, ""))
         # print("Added host " + host.name)
 
-    # Using NetworkX's Kamada Kawai layout to generate positions for graph nodes. 
-    # For more information on how this works, look into Force directed graphs.
-    position_dict = nx.kamada_kawai_layout(nx_graph, weight = None)
+    # Small graphs use NetworkX's Kamada Kawai layout, larger ones a sparse force-directed or multilevel layout.
+    # Layouts are cached on a fingerprint of the nodes and edges, so an unchanged network is not laid out again.
+    # The fingerprint only changes with the topology, so redrawing an unchanged network
+    # (to expand a cluster for example) doesn't hash every node and edge again
+    fingerprint = graph.cached('fingerprint', lambda graph: layout.topology_fingerprint(nx_graph))
+    layout_key, position_dict = layout.get_layout(nx_graph, engine=engine, fingerprint=fingerprint)
     for node, position in position_dict.items():
         nx_graph.nodes[node]['pos'] = position
+    return layout_key
 
 
-def get_node_trace(nx_graph):
+def get_position_matrix(nx_graph, names):
     """
-    This function sets up the object that will determine how nodes are graphed.
+    This function gathers the positions of the nodes into a single array.
     :param nx_graph: The object used to represent the network
+    :param names: the node names, in the order of the rows
 
-    :return node_trace: the object that allows Plotly to graph the nodes of the network
+    :return positions: an n x 2 NumPy array of node positions
+    """
+    positions = np.empty((len(names), 2))
+    for row, name in enumerate(names):
+        positions[row] = nx_graph.nodes[name]['pos']
+    return positions
 
-    Author: Orignally Written by Gatlin and Cade. Modified by Noah and Miles (roughly 40% was modified for position plotting)
+
+def get_node_trace(positions, use_webgl=False):
     """
-    node_x = []
-    node_y = []
+    This function sets up the object that will determine how nodes are graphed.
+    :param positions: an n x 2 NumPy array of node positions
+    :param use_webgl: True to draw the nodes with WebGL (Scattergl) instead of SVG
 
-    # Assigns positions to node_x and node_y lists
-    for node in nx_graph.nodes():
-    
-        x, y = nx_graph.nodes[node]['pos']
-        node_x.append(x)
-        node_y.append(y)
+    :return node_trace: the trace dict that allows Plotly to graph the nodes of the network
 
+    Author: Orignally Written by Gatlin and Cade. Modified by Noah and Miles (roughly 40% was modified for position plotting)
+    """
     # Graphs the nodes based on the positions provided and other parameters
-    node_trace = go.Scatter(
-        x=node_x, y=node_y,
+    node_trace = dict(
+        type='scattergl' if use_webgl else 'scatter',
+        x=positions[:, 0], y=positions[:, 1],
         mode='markers',
         hoverinfo='text',
         marker=dict(
@@ -138,30 +304,40 @@ def get_node_trace(nx_graph):
 
     return node_trace
 
-def get_edge_trace(nx_graph):
+def get_edge_matrix(nx_graph, names):
     """
-    This function sets up the object used to graph the edges of the network.
+    This function gathers the edges of the graph into a single array.
     :param nx_graph: The object used to represent the network
+    :param names: the node names, in the order of the rows of the position matrix
+
+    :return edges: an m x 2 NumPy array of the rows of the endpoints of every edge
+    """
+    index = {name: row for row, name in enumerate(names)}
+    return np.array([(index[first], index[second]) for first, second in nx_graph.edges()], dtype=np.intp).reshape(-1, 2)
 
-    :return edge_trace: the object that allows Plotly to graph the edges of the network
+
+def get_edge_trace(edges, positions, use_webgl=False):
+    """
+    This function sets up the object used to graph the edges of the network.
+    :param edges: an m x 2 NumPy array of the rows of the endpoints of every edge
+    :param positions: an n x 2 NumPy array of node positions
+    :param use_webgl: True to draw the edges with WebGL (Scattergl) instead of SVG
+
+    :return edge_trace: the trace dict that allows Plotly to graph the edges of the network
 
     Author: Orignally Written by Gatlin and Cade. Modified by Noah and Miles (roughly 5% was modified for position plotting)
     """
-    # Declaring and defining edges within the network
-    edge_x = []
-    edge_y = []
-    for edge in nx_graph.edges():
-        x0, y0 = nx_graph.nodes[edge[0]]['pos']
-        x1, y1 = nx_graph.nodes[edge[1]]['pos']
-        edge_x.append(x0)
-        edge_x.append(x1)
-        edge_x.append(None)
-        edge_y.append(y0)
-        edge_y.append(y1)
-        edge_y.append(None)
+    # Every edge is drawn as its two endpoints followed by a NaN gap
+    edge_x = np.full(3 * len(edges), np.nan)
+    edge_y = np.full(3 * len(edges), np.nan)
+    edge_x[0::3] = positions[edges[:, 0], 0]
+    edge_x[1::3] = positions[edges[:, 1], 0]
+    edge_y[0::3] = positions[edges[:, 0], 1]
+    edge_y[1::3] = positions[edges[:, 1], 1]
 
     # Graphing the edges
-    edge_trace = go.Scatter(
+    edge_trace = dict(
+        type='scattergl' if use_webgl else 'scatter',
         x=edge_x, y=edge_y,
         line=dict(width=.5, color='black'),
         hoverinfo='none',
@@ -169,35 +345,42 @@ def get_edge_trace(nx_graph):
 
     return edge_trace
 
-def set_node_text(nx_graph, node_trace):
+def set_node_text(nx_graph, names, node_trace):
     """
     This function sets up text that will be displayed upon hovering over a node within the graph.
     :param nx_graph: The object used to represent the network
-    :param node_trace: the object that allows Plotly to graph the nodes of the network
+    :param names: the names of the nodes being drawn, in the order of the node trace
+    :param node_trace: the trace dict that allows Plotly to graph the nodes of the network
 
     Author: Orignally Written by Gatlin and Cade. Modified by Noah and Miles (roughly 20% was modified for position plotting)
     """
     # Determines the text to display for identifying nodes on the graph
-    node_text = []
-    node_color = []
-    for node in nx_graph.nodes():
-        if nx_graph.nodes[node]['ip'] != "":
-            node_text.append(nx_graph.nodes[node]['name'] + " | " + nx_graph.nodes[node]['ip'] + "<br>" + 
-            nx_graph.nodes[node]['links_info'][0] + "<br>" + nx_graph.nodes[node]['links_info'][1])  # use <br> for new lines
-        else:
-            node_text.append((nx_graph.nodes[node]['name']))
-        node_color.append(nx_graph.nodes[node]['color'])
-    node_trace.marker.color = node_color
-    node_trace.text = node_text
+    node_data = [nx_graph.nodes[name] for name in names]
+    node_trace['marker']['color'] = [data['color'] for data in node_data]
+    node_trace['text'] = [get_hover_text(data) for data in node_data]
+
+
+def get_hover_text(data):
+    """
+    This function builds the text displayed when hovering over a single node.
+    :param data: the attributes of the node within the nx_graph
+
+    :return: the hover text, using <br> for new lines
+    """
+    if data['ip'] != "":
+        text = "".join((data['name'], " | ", data['ip'], "<br>", data['links_info'][0], "<br>", data['links_info'][1]))
+        if data.get('capacity'):
+            text += "<br>" + data['capacity']
+        return text
+    return data['name']
 
 
 def reset_graph(graph):
     """
     Resets the values of the graph to empty lists
-    :param graph: The graph list being used
+    :param graph: The topology store being used
     """
-    for key in graph.keys():
-        graph[key].clear()
+    graph.clear()
 
 
 def clear_output(extra):
@@ -209,95 +392,50 @@ def clear_output(extra):
         extra[key] = ""
 
 
-def make_file(graph):
+def make_file(graph, path=None):
     """
-    Creates a Python file that represents a network using Mininet
+    Creates a Python file that represents a network using Mininet, see scripts.network_script.
+    The script is generated in memory and written in one step.
     :param graph: The graph list with the values for the network
+    :param path: the directory to write new_file.py to, defaults to the Desktop
+    :return: the path of the file
 
     Author: Written by Cade and Gatlin. Modified by Miles and Noah (10%)
     """
+    path = path or str(Path.home()) + "/Desktop/"
+    return scripts.write_script(scripts.network_script(graph), path)
 
-    path = str(Path.home()) + "/Desktop/"
-    new_file = open(path + "new_file.py", "w+")
-    # Writing the initial imports needed for our Mininet functions to work
-    new_file.write("from mininet.net import Mininet\nfrom mininet.cli import CLI\n"
-                   "from mininet.link import TCLink\nnet = Mininet(link=TCLink)\n")
-
-    # By key, navigate through the network and write the Mininet code needed to new_file.py
-    for key in graph.keys():
-        for node in graph.get(key):
-            new_file.write(node.add_to_file())
-        new_file.write("\n")
-
-    # Sets IP within Mininet for each host
-    for host in graph.get('hosts'):
-        new_file.write(host.add_ip_to_file())
-
-
-def get_mininet_file():
-    """
-    Returns a reference to the new file used to run Mininet commands
-    Author: Written by Cade and Gatlin.
-    """
-    path = str(Path.home()) + "/Desktop/"
-    return open(path + "new_file.py", "a")
-
-# Measures latency
-def add_ping(host1, host2):
-    """
-    Method to test the latency between two hosts.
-    Author: Miles and Noah
-    """
-    new_file = get_mininet_file()
-    new_file.write("\nnet.start()\nnet.ping([" + host1 + ", " + host2 + "])\nnet.stop()\n")
-
-# Measures latency
-def add_ping_all():
-    """
-    Method to test the latency for all nodes.
-    Author: Miles and Noah
-    """
-    new_file = get_mininet_file()
-    new_file.write("\nnet.start()\nnet.pingAll()\nnet.stop()\n")
 
-# Measures throughput
-def add_iperf(host1, host2):
+def run_test(graph, command, extra, hosts=(), job=None, timing=None):
     """
-    Method to test the throughput between two hosts.
-    Author: Written by Cade and Gatlin.
-    """
-    new_file = get_mininet_file()
-    new_file.write("\nnet.start()\nnet.iperf([" + host1 + ", " + host2 + "])\nnet.stop()\n")
-
-
-def run_mininet(extra):
-    """
-    Method to run Mininet in the background so the user can run commands through it
+    Runs a test on the network kept running by the emulation worker, which is only rebuilt
+    when the topology has changed since the last test. The phases of the run are timed,
+    shown after its output and kept, see timings.py.
+    :param graph: The topology store being used
+    :param command: one of 'ping', 'iperf' or 'pingall'
     :param extra: The holder for the results to be stored to
-    :return: None
-    Author: Written by Cade and Gatlin. Edited by Noah and Miles (20%)
-    """
-
-    path = str(Path.home()) + "/Desktop/"
-
-    sudo_pw = "Mininet"
-    command = "python2 " + path + "new_file.py"
-    command = command.split()
-
-    cmd1 = subprocess.Popen(['echo', sudo_pw], stdout=subprocess.PIPE)
-    cmd2 = subprocess.Popen(['sudo', '-S'] + command, stdin=cmd1.stdout,
-                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
-    outs, errors = cmd2.communicate()
-    print("outs" + outs + "\nerrors: " + errors + "end")
-
-    # REPLACE USERNAME WITH CURRENT USERNAME IF NEEDED
-    errors = errors.replace("[sudo] password for milobyte: ", "")
-
-    # print("\nAdding '" + errors + "' to output!\n")
-    extra['ping'] = errors
-
-    # Returning text to add to respective hosts' link logs
-    return errors
+    :param hosts: the names of the hosts to test between
+    :param job: the jobs.Job running the test, which interrupts the worker when cancelled
+                and has the lines Mininet logs written to its output as they come
+    :param timing: the timings.RunTimings to fill in, or None to start one
+    :return: the output of the test, without the timings
+    """
+    timing = timing or timings.RunTimings(command, graph)
+    session = emulation.get_session()
+    on_line = check = None
+    if job is not None:
+        job.stop_session(session)
+        on_line = job.output.write
+        check = job.check
+    try:
+        output = session.run(graph, command, hosts, on_line, timing, check)
+    except emulation.EmulationError as error:
+        output = "Error: " + str(error)
+    timings.add(timing)
+    if job is not None:
+        job.check()
+    extra['ping'] = output + timing.summary()
+    return output
 
 def init_database(graph_name = None):
     """
@@ -376,73 +514,69 @@ def clear_database(db = "neo4j"):
 
 def remove_host(node, graph):
     """
-    This method removes a node from the graph by checking for equivilant attributes within a list
+    This method removes a node and its links from the graph by looking it up by name within the topology store
     :param node: the node to remove from a graph
     :param graph: the graph object that represents a network
     Author: Miles and Noah
     """
-    for host in graph['hosts']:
-        if host.get_name() == node.get('name'):
-            graph['hosts'].remove(host)
-            print(str(host.get_name()) + " removed")
-            remove_assoc_links(node, graph)
-            return
+    host = graph.remove_node('hosts', node.get('name'))
+    if host is not None:
+        print(str(host.get_name()) + " removed")
 
 def remove_switch(node, graph):
     """
-    This method removes a node from the graph by checking for equivilant attributes within a list
+    This method removes a node and its links from the graph by looking it up by name within the topology store
     :param node: the node to remove from a graph
     :param graph: the graph object that represents a network
     Author: Noah and Miles
     """
-    for switch in graph['switches']:
-        if switch.get_name() == node.get('name'):
-            graph['switches'].remove(switch)
-            print(str(switch.get_name()) + " removed")
-            remove_assoc_links(node, graph)
-            return
+    switch = graph.remove_node('switches', node.get('name'))
+    if switch is not None:
+        print(str(switch.get_name()) + " removed")
 
 def remove_controller(node, graph):
     """
-    This method removes a node from the graph by checking for equivilant attributes within a list
+    This method removes a node and its links from the graph by looking it up by name within the topology store
     :param node: the node to remove from a graph
     :param graph: the graph object that represents a network
     Author: Miles and Noah
     """
-    for controller in graph['controllers']:
-        if controller.get_name() == node.get('name'):
-            graph['controllers'].remove(controller)
-            print(str(controller.get_name()) + " removed")
-            remove_assoc_links(node, graph)
-            return
+    controller = graph.remove_node('controllers', node.get('name'))
+    if controller is not None:
+        print(str(controller.get_name()) + " removed")
 
 def remove_links(first_name, second_name, graph):
     """
-    This method removes a link from the graph by checking for equivilant attributes within a list
+    This method removes a link from the graph by looking up its endpoints within the topology store
     :param first_name: the name of the first node within a respective link to remove
     :param second_name: the name of the second node within a respective link to remove
     :param graph: the graph object that represents a network
     Author: Miles and Noah
     """
-    for link in graph['links']:
-        if ((link.first == first_name) or (link.first == second_name)) and ((link.second == first_name) or (link.second == second_name)):
-            graph['links'].remove(link)
-            print("Link between " + first_name + " and " + second_name + " removed")
-            return
+    if graph.remove_link(first_name, second_name) is not None:
+        print("Link between " + first_name + " and " + second_name + " removed")
 
 def remove_assoc_links(node, graph):
     """
-    This method removes any links associated with a node
+    This method removes any links associated with a node using the topology store's
+    incident-link index, so it only touches the links incident to the node
     :param node: the node to remove links from within a graph
     :param graph: the graph object that represents a network
+    :return: the number of links removed
     Author: Miles and Noah
     """
-    for link in copy.deepcopy(graph['links']):
-        print("Comparing " + node.get('name') + " to " + link.first + " and " + link.second)
-        if ((link.first == node.get('name')) or (link.second == node.get('name'))):
-            remove_links(link.first, link.second, graph)
+    return graph.remove_incident_links(node.get('name'))
 
-    return
+def remove_nodes(names, graph):
+    """
+    This method removes many nodes and all of their links from the graph in one pass
+    :param names: an iterable of the names of the nodes to remove
+    :param graph: the graph object that represents a network
+    :return: a tuple of (number of nodes removed, number of links removed)
+    """
+    node_count, link_count = graph.remove_nodes(names)
+    print(str(node_count) + " nodes and " + str(link_count) + " links removed")
+    return node_count, link_count
 
 def get_databases():
     """
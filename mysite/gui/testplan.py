@@ -0,0 +1,182 @@
+"""
+This file turns a test plan, a list of host pairs to ping and/or iPerf, into tests that are
+run together on the emulated network, so hundreds of pairs only need the network started once.
+"""
+import ipaddress
+import itertools
+import time
+
+from django.conf import settings
+
+from . import emulation
+from . import scheduling
+
+"""The tests a plan can run on each pair"""
+TESTS = {
+    'ping': ('ping',),
+    'iperf': ('iperf',),
+    'both': ('ping', 'iperf'),
+}
+
+"""Plans with more pairs than this are refused"""
+MAX_PAIRS = 10000
+
+
+def host_address(host):
+    """
+    Returns the IP address of a host, whose IP may have a prefix length like 10.0.0.1/8
+    :param host: the host object
+    :return: the ipaddress address, or None if the IP is not valid
+    """
+    try:
+        return ipaddress.ip_interface(host.ip.strip()).ip
+    except ValueError:
+        return None
+
+
+def parse_pairs(text, graph):
+    """
+    Reads the host pairs of a test plan. The plan is one of:
+    - a list of pairs separated by commas, semicolons or new lines, each written h1 h2 or h1-h2
+    - all, for every pair of hosts
+    - a subnet such as 10.0.0.0/24, optionally after the word subnet, for every pair of hosts within it
+    Each pair is only tested once, whichever order it is given in.
+    :param text: the test plan
+    :param graph: the topology store holding the hosts
+    :return: a list of (host name, host name) pairs
+    """
+    text = text.strip()
+    words = text.split()
+    if text.lower() == 'all':
+        names = [host.name for host in graph.get('hosts')]
+    elif words and (words[0].lower() == 'subnet' or ('/' in text and len(words) == 1)):
+        try:
+            network = ipaddress.ip_network(words[-1], strict=False)
+        except ValueError:
+            raise ValueError("Not a subnet: " + words[-1])
+        names = [host.name for host in graph.get('hosts') if host_address(host) in network]
+    else:
+        names = None
+
+    if names is not None:
+        count = len(names) * (len(names) - 1) // 2
+        check_size(count)
+        return list(itertools.combinations(names, 2))
+
+    pairs = []
+    seen = set()
+    for entry in text.replace(';', ',').replace('\n', ',').split(','):
+        entry = entry.strip()
+        if entry == "":
+            continue
+        pair = entry.split() if len(entry.split()) > 1 else entry.split('-')
+        if len(pair) != 2:
+            raise ValueError("Not a host pair: " + entry)
+        for name in pair:
+            if graph.get_host(name) is None:
+                raise ValueError("No host named " + name)
+        if pair[0] == pair[1]:
+            raise ValueError("A host can't be tested with itself: " + entry)
+        key = frozenset(pair)
+        if key not in seen:
+            seen.add(key)
+            pairs.append((pair[0], pair[1]))
+    check_size(len(pairs))
+    return pairs
+
+
+def check_size(count):
+    """
+    Raises a ValueError if a plan has too many pairs, see MINIGNC_TEST_PLAN_MAX_PAIRS
+    :param count: the number of pairs in the plan
+    """
+    limit = getattr(settings, 'MINIGNC_TEST_PLAN_MAX_PAIRS', MAX_PAIRS)
+    if count > limit:
+        raise ValueError("The plan has " + str(count) + " pairs, more than the limit of " + str(limit))
+
+
+def run_plan(graph, pairs, tests='ping', session=None, max_parallel=None, on_line=None, check=None):
+    """
+    Runs the tests of a plan. The network is built (if the topology changed) and the pings are run
+    with a single command to the emulation worker. The iPerf tests are scheduled by
+    scheduling.run_concurrent_iperf, so pairs that share no link are tested at the same time.
+    :param graph: the topology store
+    :param pairs: a list of (host name, host name) pairs
+    :param tests: one of the keys of TESTS
+    :param session: the EmulationSession to use, defaults to the one shared by the GUI
+    :param max_parallel: the most iPerf tests run at the same time, defaults to MINIGNC_IPERF_MAX_PARALLEL
+    :param on_line: a function called with each line Mininet logs while the tests run
+    :param check: a function that raises if the caller was stopped while it waited for the session, such as jobs.Job.check
+    :return: a dict with the 'results' of each test, the number of 'pairs', 'passed' and 'failed'
+             tests, the 'seconds' the plan took and the 'iperf' schedule (or None without iPerf tests).
+             Each result is a dict of 'test', 'first', 'second', 'ok' and 'output' (the text Mininet
+             logged, or the error if the test failed), iPerf results have the keys of
+             scheduling.run_concurrent_iperf as well.
+    """
+    if tests not in TESTS:
+        raise ValueError("Unknown tests: " + str(tests))
+    if session is None:
+        session = emulation.get_session()
+
+    start = time.perf_counter()
+    pings = []
+    if 'ping' in TESTS[tests] and pairs:
+        responses = session.run_batch(graph, [('ping', first, second) for first, second in pairs], on_line, check)
+        for (first, second), response in zip(pairs, responses):
+            pings.append({
+                'test': 'ping',
+                'first': first,
+                'second': second,
+                'ok': response['ok'],
+                'output': response['output'] if response['ok'] else response['error'],
+            })
+    iperf = None
+    if 'iperf' in TESTS[tests] and pairs:
+        iperf = scheduling.run_concurrent_iperf(graph, pairs, max_parallel, session=session, on_line=on_line,
+                                                check=check)
+    seconds = time.perf_counter() - start
+
+    results = []
+    for index in range(len(pairs)):
+        for test in TESTS[tests]:
+            results.append(pings[index] if test == 'ping' else iperf['results'][index])
+    passed = sum(1 for result in results if result['ok'])
+    if iperf is not None:
+        del iperf['results']
+    return {
+        'results': results,
+        'pairs': len(pairs),
+        'passed': passed,
+        'failed': len(results) - passed,
+        'seconds': seconds,
+        'iperf': iperf,
+    }
+
+
+def summary_line(result):
+    """
+    Returns one line describing a test result, the last line Mininet logged for it
+    :param result: a result from run_plan
+    :return: the line
+    """
+    lines = [line for line in result['output'].splitlines() if line.strip()]
+    outcome = lines[-1].strip() if lines else ""
+    return result['test'] + " " + result['first'] + " <-> " + result['second'] + ": " + outcome
+
+
+def summary(report):
+    """
+    Returns the text shown in the output panel for a plan
+    :param report: the dict returned by run_plan
+    :return: the text
+    """
+    lines = ["*** Test plan: " + str(len(report['results'])) + " tests on " + str(report['pairs']) +
+             " pairs in " + "{:.2f}".format(report['seconds']) + "s, " + str(report['failed']) + " failed"]
+    iperf = report['iperf']
+    if iperf is not None:
+        lines.append("*** Iperf: " + str(iperf['groups']) + " groups of up to " + str(iperf['max_parallel']) +
+                     " pairs took " + "{:.2f}".format(iperf['parallel_seconds']) + "s instead of an estimated " +
+                     "{:.2f}".format(iperf['estimated_sequential_seconds']) + "s one at a time (about " +
+                     "{:.2f}".format(iperf['estimated_saved_seconds']) + "s saved)")
+    lines.extend(summary_line(result) for result in report['results'])
+    return "\n".join(lines) + "\n"
@@ -1,3 +1,185 @@
+import threading
+
+import numpy as np
 from django.test import TestCase
 
-# Create your tests here.
+from . import capacity
+from . import emulation
+from . import jobs
+from . import nodes
+from . import topology
+from .views import buttons
+
+
+def make_topology(linked=True):
+    """
+    Creates a topology of two switches with two hosts each
+    :param linked: whether to add the links, or only the nodes as they are right after being added
+    :return: the Topology
+    """
+    graph = topology.Topology()
+    graph.add(nodes.Switch('s1'))
+    graph.add(nodes.Switch('s2'))
+    for number in range(1, 5):
+        graph.add(nodes.Host('h' + str(number), '10.0.0.' + str(number)))
+    if linked:
+        graph.add(nodes.Link('s1', 's2'))
+        for number in range(1, 5):
+            graph.add(nodes.Link('h' + str(number), 's' + str(1 + (number - 1) // 2)))
+    return graph
+
+
+class LinkTableTests(TestCase):
+    """
+    Tests adding, finding and removing links in the hash and incident-link lists of nodes.LinkTable
+    """
+
+    def setUp(self):
+        self.table = nodes.LinkTable()
+        for first, second in (('s1', 's2'), ('h1', 's1'), ('h2', 's1'), ('h3', 's2')):
+            self.table.add(nodes.Link(first, second))
+
+    def test_add_rejects_duplicates(self):
+        self.assertFalse(self.table.add(nodes.Link('s1', 's2')))
+        self.assertEqual(len(self.table), 4)
+
+    def test_lookup_in_either_order(self):
+        self.assertIsNotNone(self.table.get('s2', 's1'))
+        self.assertEqual(self.table.find('s1', 'h1'), self.table.find('h1', 's1'))
+        self.assertIsNone(self.table.get('h1', 'h2'))
+        self.assertIsNone(self.table.get('h1', 'unknown'))
+        self.assertIn(('h2', 's1'), self.table)
+
+    def test_remove_moves_the_last_row(self):
+        removed = self.table.remove('s2', 's1')
+        self.assertEqual((removed.first, removed.second), ('s1', 's2'))
+        self.assertEqual(len(self.table), 3)
+        self.assertIsNone(self.table.get('s1', 's2'))
+        # The last link took the removed link's row and can still be found
+        self.assertEqual(self.table.find('h3', 's2'), 0)
+        self.assertEqual(self.table.degree('s2'), 1)
+
+    def test_remove_incident(self):
+        self.assertEqual(sorted(self.table.incident_rows('s1')), [0, 1, 2])
+        self.assertEqual(self.table.remove_incident('s1'), 3)
+        self.assertEqual(self.table.degree('s1'), 0)
+        self.assertEqual([(link.first, link.second) for link in self.table], [('h3', 's2')])
+        self.assertTrue(self.table.add(nodes.Link('h1', 's1')))
+        self.assertEqual(self.table.incident_rows('s1'), [1])
+
+    def test_large_queue_sizes_are_kept_exactly(self):
+        link = self.table.get('h1', 's1')
+        link.set_queue_size(2 ** 24 + 1)
+        self.assertEqual(self.table.remove('h1', 's1').max_queue_size, str(2 ** 24 + 1))
+
+
+class TopologyTests(TestCase):
+    """
+    Tests the versions that derived values are cached on
+    """
+
+    def test_cached_values_follow_changes(self):
+        graph = make_topology()
+        version = graph.version
+        built = []
+        graph.cached('test', lambda graph: built.append(1))
+        graph.cached('test', lambda graph: built.append(1))
+        self.assertEqual(len(built), 1)
+        graph.links.get('h1', 's1').set_bandwidth(5)
+        self.assertEqual(graph.version, version)
+        graph.cached('test', lambda graph: built.append(1), params=True)
+        self.assertEqual(len(built), 2)
+        graph.remove_node('hosts', 'h4')
+        self.assertGreater(graph.version, version)
+        self.assertIsNone(graph.get_link('h4', 's2'))
+
+
+class EmulationSessionTests(TestCase):
+    """
+    Tests the emulation worker through its fake network, which needs neither Mininet nor root
+    """
+
+    def setUp(self):
+        self.session = emulation.EmulationSession('fake')
+        self.graph = make_topology()
+        self.addCleanup(self.session.close)
+
+    def test_ping_builds_the_network_once(self):
+        output = self.session.run(self.graph, 'ping', ('h1', 'h3'))
+        self.assertIn("h1->h3: 1/1", output)
+        built = self.session.built
+        self.session.run(self.graph, 'iperf', ('h1', 'h3'))
+        self.assertEqual(self.session.built, built)
+
+    def test_pingall_after_a_change_rebuilds(self):
+        self.session.run(self.graph, 'ping', ('h1', 'h2'))
+        self.graph.remove_node('hosts', 'h4')
+        output = self.session.run(self.graph, 'pingall')
+        self.assertIn("h1 -> h2 h3", output)
+        self.assertNotIn("h4", output)
+
+    def test_unknown_host(self):
+        with self.assertRaises(emulation.EmulationError):
+            self.session.run(self.graph, 'ping', ('h1', 'h9'))
+
+    def test_lines_are_streamed(self):
+        lines = []
+        self.session.run(self.graph, 'ping', ('h1', 'h2'), lines.append)
+        self.assertTrue(any("h1->h2" in line for line in lines))
+
+
+class JobQueueTests(TestCase):
+    """
+    Tests running tests as jobs on the fake emulation worker
+    """
+
+    def setUp(self):
+        self.queue = jobs.JobQueue(workers=2)
+        self.session = emulation.EmulationSession('fake')
+        self.graph = make_topology()
+        self.addCleanup(self.session.close)
+
+    def ping(self, job):
+        job.stop_session(self.session)
+        return self.session.run(self.graph, 'ping', ('h1', 'h2'), job.output.write, check=job.check)
+
+    def test_job_output_and_result(self):
+        job = self.queue.submit('ping', self.ping)
+        job.future.result(timeout=30)
+        self.assertEqual(job.status, 'done')
+        self.assertIn("h1->h2", job.result)
+        first, lines, dropped, closed = job.output.read()
+        self.assertTrue(closed)
+        self.assertTrue(any("h1->h2" in line for line in lines))
+
+    def test_cancelled_while_waiting_for_the_session(self):
+        started = threading.Event()
+        self.session.lock.acquire()
+        try:
+            job = self.queue.submit('ping', lambda job: started.set() or self.ping(job))
+            started.wait(10)
+            self.queue.cancel(job.id)
+        finally:
+            self.session.lock.release()
+        job.future.result(timeout=30)
+        self.assertEqual(job.status, 'cancelled')
+        self.assertIsNone(self.session.built)
+
+
+class UnlinkedHostsTests(TestCase):
+    """
+    Tests the figure and the bandwidths of hosts that were just added and have no links yet
+    """
+
+    def test_make_graph(self):
+        figure, layout_key = buttons.make_graph(make_topology(linked=False))
+        self.assertEqual(len(figure['data'][-1]['x']), 6)
+
+    def test_capacity(self):
+        graph = make_topology(linked=False)
+        graph.add(nodes.Link('s1', 's2'))
+        matrix = capacity.get_capacity(graph)
+        self.assertTrue((matrix.matrix()[~np.eye(4, dtype=bool)] == 0).all())
+        low, high = matrix.host_ranges()
+        self.assertTrue(np.isnan(low).all() and np.isnan(high).all())
+        self.assertEqual(capacity.get_hover_text(graph), {})
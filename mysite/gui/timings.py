@@ -0,0 +1,123 @@
+"""
+This file records how long each phase of an emulation run took, so a slow test can be traced to script
+generation, starting Python 2, building or starting the network, the test itself, or stopping and cleaning up.
+Script generation is timed here, the emulation worker sends the seconds spent in each of its phases with its
+responses, and the most recent runs are kept with the size of their topology.
+"""
+import contextlib
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+"""The phases of a run, in the order they happen. Stopping the network the worker replaces when
+rebuilding counts as stop, and there is no cleanup since the worker's network keeps running."""
+PHASES = ('generate', 'startup', 'build', 'start', 'test', 'stop')
+
+"""How many runs are kept"""
+HISTORY = 200
+
+"""The runs recorded so far, oldest first"""
+runs = deque()
+runs_lock = threading.Lock()
+
+
+class RunTimings:
+    """
+    This class holds the seconds spent in each phase of one run, along with the size of its topology
+    """
+
+    def __init__(self, kind, graph=None):
+        """
+        Creates a new RunTimings object, the run starts now
+        :param kind: what the run does, such as 'ping' or 'pingall'
+        :param graph: the topology store the run uses, for its number of nodes and links
+        """
+        self.kind = kind
+        self.time = time.time()
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.total = None
+        self.size = {}
+        if graph is not None:
+            self.size = {key: len(graph.get(key)) for key in ('hosts', 'switches', 'controllers')}
+            self.size['links'] = len(graph.links)
+
+    def add(self, phase, seconds):
+        """
+        Adds time spent in a phase, which can happen more than once in a run
+        :param phase: the name of the phase, see PHASES
+        :param seconds: how long it took
+        """
+        self.phases[phase] = self.phases.get(phase, 0.0) + max(0.0, float(seconds))
+
+    def finish(self):
+        """
+        Ends the run, counting its total time
+        """
+        self.total = time.perf_counter() - self.started
+
+    def to_dict(self):
+        """
+        Returns the run as a dict that can be sent as JSON
+        :return: the dict
+        """
+        return dict(kind=self.kind, time=self.time, total=self.total, phases=self.ordered(), **self.size)
+
+    def ordered(self):
+        """
+        Returns the phases in the order of PHASES
+        :return: a dict of phase to seconds
+        """
+        order = {phase: position for position, phase in enumerate(PHASES)}
+        return dict(sorted(self.phases.items(), key=lambda item: order.get(item[0], len(PHASES))))
+
+    def summary(self):
+        """
+        Returns the line describing the run in the output panel
+        :return: the line
+        """
+        parts = [phase + " {:.3f} s".format(seconds) for phase, seconds in self.ordered().items()]
+        if self.total is not None:
+            parts.append("total {:.3f} s".format(self.total))
+        return "*** Timings: " + ", ".join(parts) + "\n"
+
+
+@contextlib.contextmanager
+def measure(timing, phase):
+    """
+    Adds the time spent in the with block to a phase of a run
+    :param timing: the RunTimings, or None to measure nothing
+    :param phase: the name of the phase
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timing is not None:
+            timing.add(phase, time.perf_counter() - start)
+
+
+def add(timing):
+    """
+    Ends a run and keeps it, forgetting the oldest run if MINIGNC_TIMING_HISTORY are kept
+    :param timing: the RunTimings
+    """
+    if timing.total is None:
+        timing.finish()
+    size = getattr(settings, 'MINIGNC_TIMING_HISTORY', HISTORY)
+    with runs_lock:
+        runs.append(timing)
+        while len(runs) > size:
+            runs.popleft()
+
+
+def get_runs(kind=None):
+    """
+    Returns the runs kept, oldest first
+    :param kind: only return the runs of this kind, such as 'ping'
+    :return: a list of RunTimings
+    """
+    with runs_lock:
+        return [timing for timing in runs if kind is None or timing.kind == kind]
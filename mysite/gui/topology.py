@@ -0,0 +1,243 @@
+"""
+This file contains the in-memory store that holds the nodes and links of the network
+currently being built in the GUI
+"""
+from . import measurements
+from . import nodes
+
+
+class Topology:
+    """
+    This class stores the hosts, switches, controllers and links of a network.
+    Nodes are kept in dicts keyed on their name and links in a LinkTable keyed on their
+    (first, second) names, so lookups, duplicate checks and removals don't have to scan
+    a list. The LinkTable also indexes every node to the links touching it.
+
+    The object can still be used like the old graph dict (graph['hosts'], graph.get('links'),
+    graph.keys()) so the templates and the button logic can iterate over it.
+
+    The results of the ping and iPerf tests run on the network are kept in measurements,
+    a history of the most recent results of each pair of hosts.
+
+    Every change to the nodes or links increments version, so values derived from the
+    topology can be cached until it changes again (see cached). Changing a link parameter
+    doesn't increment version, so values that read a parameter (the analytic model, the
+    generated scripts, capacities and the clusters' total bandwidths) are cached with params=True.
+    """
+    KEYS = ('hosts', 'switches', 'controllers', 'links')
+    NODE_KEYS = {'host': 'hosts', 'switch': 'switches', 'controller': 'controllers'}
+
+    def __init__(self):
+        """
+        Creates a new, empty Topology object
+        :return: None
+        """
+        self.hosts = {}
+        self.switches = {}
+        self.controllers = {}
+        self.links = nodes.LinkTable()
+        self._tables = {
+            'hosts': self.hosts,
+            'switches': self.switches,
+            'controllers': self.controllers,
+            'links': self.links,
+        }
+        self.measurements = measurements.MeasurementHistory()
+        self.version = 0
+        self._derived = {}
+
+    def __getitem__(self, key):
+        """
+        Returns the objects stored under one of the graph keys
+        :param key: one of 'hosts', 'switches', 'controllers' or 'links'
+        :return: a view of the objects stored under the key
+        """
+        return self._tables[key].values()
+
+    def __contains__(self, key):
+        """
+        Returns True if key is one of the graph keys
+        :param key: the key to check
+        """
+        return key in self._tables
+
+    def __repr__(self):
+        """
+        Used to display the topology in a formatted way
+        :return: a formatted string
+        """
+        return str({key: list(self[key]) for key in self.KEYS})
+
+    def get(self, key, default=None):
+        """
+        Returns the objects stored under one of the graph keys
+        :param key: one of 'hosts', 'switches', 'controllers' or 'links'
+        :param default: the value to return if key is not a graph key
+        :return: a view of the objects stored under the key
+        """
+        if key in self._tables:
+            return self[key]
+        return default
+
+    def keys(self):
+        """
+        Returns the graph keys in the order the network has to be built in
+        :return: a tuple of the graph keys
+        """
+        return self.KEYS
+
+    def add(self, item):
+        """
+        Adds a host, switch, controller or link to the topology if it isn't already in it
+        :param item: the object to add
+        :return: True if the object was added, False if it was a duplicate
+        """
+        if isinstance(item, nodes.Link):
+            return self.add_link(item)
+        return self.add_node(item)
+
+    def add_many(self, items):
+        """
+        Adds many hosts, switches, controllers and links to the topology, skipping duplicates
+        :param items: an iterable of the objects to add
+        :return: the number of objects that were added
+        """
+        added = 0
+        for item in items:
+            if self.add(item):
+                added += 1
+        return added
+
+    def add_node(self, node):
+        """
+        Adds a host, switch or controller to the topology. Nodes are unique by name.
+        :param node: the node object to add
+        :return: True if the node was added, False if a node with the same name exists
+        """
+        table = self._tables[self.NODE_KEYS[node.get_type()]]
+        if node.name in table:
+            return False
+        table[node.name] = node
+        self.version += 1
+        return True
+
+    def add_link(self, link):
+        """
+        Adds a link to the topology and indexes it under both of its endpoints
+        :param link: the link object to add
+        :return: True if the link was added, False if it was a duplicate
+        """
+        if not self.links.add(link):
+            return False
+        self.version += 1
+        return True
+
+    def get_host(self, name):
+        """
+        Gets a host object based on its name
+        :param name: the name of the host
+        :return: the host object or None if no host has that name
+        """
+        return self.hosts.get(name)
+
+    def get_node(self, name):
+        """
+        Gets a host, switch or controller object based on its name
+        :param name: the name of the node
+        :return: the node object or None if no node has that name
+        """
+        for table in (self.hosts, self.switches, self.controllers):
+            if name in table:
+                return table[name]
+        return None
+
+    def get_link(self, first_name, second_name):
+        """
+        Gets the link between two nodes regardless of the order it was added in
+        :param first_name: the name of one endpoint
+        :param second_name: the name of the other endpoint
+        :return: the link object or None if the nodes are not linked
+        """
+        return self.links.get(first_name, second_name)
+
+    def remove_node(self, key, name):
+        """
+        Removes a host, switch or controller from the topology along with every link
+        touching it. This costs O(degree) since the links are found through the incident-link index.
+        :param key: one of 'hosts', 'switches' or 'controllers'
+        :param name: the name of the node to remove
+        :return: the removed node or None if it was not in the topology
+        """
+        node = self._tables[key].pop(name, None)
+        if node is not None:
+            self.version += 1
+            self.remove_incident_links(name)
+            if key == 'hosts':
+                self.measurements.remove_host(name)
+        return node
+
+    def remove_nodes(self, names):
+        """
+        Removes many nodes and all of their links in one call. Each name is looked up
+        in the hosts, switches and controllers, and names not in the topology are skipped.
+        :param names: an iterable of node names to remove
+        :return: a tuple of (number of nodes removed, number of links removed)
+        """
+        link_count = len(self.links)
+        node_count = 0
+        for name in names:
+            for key in ('hosts', 'switches', 'controllers'):
+                if self.remove_node(key, name) is not None:
+                    node_count += 1
+                    break
+        return node_count, link_count - len(self.links)
+
+    def remove_incident_links(self, name):
+        """
+        Removes every link touching a node using the incident-link index
+        :param name: the name of the node whose links should be removed
+        :return: the number of links removed
+        """
+        removed = self.links.remove_incident(name)
+        if removed:
+            self.version += 1
+        return removed
+
+    def remove_link(self, first_name, second_name):
+        """
+        Removes the link between two nodes regardless of the order it was added in
+        :param first_name: the name of one endpoint
+        :param second_name: the name of the other endpoint
+        :return: a copy of the removed link or None if the nodes are not linked
+        """
+        link = self.links.remove(first_name, second_name)
+        if link is not None:
+            self.version += 1
+        return link
+
+    def clear(self):
+        """
+        Removes every node and link from the topology
+        :return: None
+        """
+        for table in self._tables.values():
+            table.clear()
+        self.measurements.clear()
+        self.version += 1
+
+    def cached(self, name, build, params=False):
+        """
+        Returns a value derived from the topology, building it only once per version
+        :param name: the name the value is cached under
+        :param build: a function that takes the topology and returns the value
+        :param params: True if the value depends on the link parameters as well, so it is
+                       rebuilt when one of them changes (see LinkTable.param_version).
+                       Without it, a value that reads a parameter goes stale when a link is edited.
+        :return: the cached or newly built value
+        """
+        version = (self.version, self.links.param_version) if params else self.version
+        entry = self._derived.get(name)
+        if entry is None or entry[0] != version:
+            entry = (version, build(self))
+            self._derived[name] = entry
+        return entry[1]
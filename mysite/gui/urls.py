@@ -3,5 +3,21 @@ from . import views
 
 urlpatterns = [
     path('', views.home, name='gui-home'),
-    path('figure.html', views.graph, name='gui-graph')
+    path('figure.html', views.graph, name='gui-graph'),
+    path('figure.json', views.figure_json, name='gui-figure-json'),
+    path('viewport.json', views.viewport_json, name='gui-viewport-json'),
+    path('nearest.json', views.nearest_json, name='gui-nearest-json'),
+    path('latency.json', views.latency_json, name='gui-latency-json'),
+    path('capacity.json', views.capacity_json, name='gui-capacity-json'),
+    path('measurements.json', views.measurements_json, name='gui-measurements-json'),
+    path('timings.json', views.timings_json, name='gui-timings-json'),
+    path('pingall.html', views.ping_all_graph, name='gui-pingall'),
+    path('pingall.json', views.ping_all_json, name='gui-pingall-json'),
+    path('testplan.json', views.test_plan_json, name='gui-test-plan-json'),
+    path('jobs.json', views.jobs_json, name='gui-jobs-json'),
+    path('jobs/<str:job_id>.json', views.job_json, name='gui-job-json'),
+    path('jobs/<str:job_id>/stream', views.job_stream, name='gui-job-stream'),
+    path('jobs/<str:job_id>/cancel', views.cancel_job_json, name='gui-job-cancel'),
+    path('jobs/<str:job_id>/timeout', views.timeout_job_json, name='gui-job-timeout'),
+    path('plotly-<str:version>.min.js', views.plotly_js, name='gui-plotly-js'),
 ]
@@ -0,0 +1,145 @@
+"""
+This file keeps the laid-out positions of a network in a spatial index, so the browser can be
+sent only the nodes and edges within the part of the graph it is showing, and hover or click
+lookups can be answered with a nearest-neighbour query instead of per-node text.
+"""
+import numpy as np
+from django.conf import settings
+from scipy.spatial import cKDTree
+
+"""Viewports holding more nodes than this are drawn as clusters when the detail level is 'auto'"""
+VIEWPORT_MAX_NODES = 5000
+
+
+class SpatialIndex:
+    """
+    This class stores the nodes and edges of a laid-out graph along with a KD-tree of the node
+    positions and the bounding box of every edge.
+    """
+
+    def __init__(self, names, positions, edges, colors, clusters=None):
+        """
+        Creates a new SpatialIndex object
+        :param names: the node names, in the order of the rows of positions
+        :param positions: an n x 2 NumPy array of node positions
+        :param edges: an m x 2 NumPy array of the rows of the endpoints of every edge
+        :param colors: the color of every node
+        :param clusters: a dict of row to cluster index for the rows that are collapsed clusters
+        """
+        self.names = names
+        self.positions = positions
+        self.edges = edges
+        self.colors = np.array(colors, dtype=object)
+        self.clusters = clusters if clusters is not None else {}
+        self.tree = cKDTree(positions) if len(positions) else None
+        ends = positions[edges]
+        self.edge_min = ends.min(axis=1) if len(edges) else np.empty((0, 2))
+        self.edge_max = ends.max(axis=1) if len(edges) else np.empty((0, 2))
+
+    def __len__(self):
+        """
+        Returns the number of nodes in the index
+        """
+        return len(self.names)
+
+    def bounds(self):
+        """
+        Returns the rectangle holding every node
+        :return: a list of [x0, y0, x1, y1]
+        """
+        if self.tree is None:
+            return [-1.0, -1.0, 1.0, 1.0]
+        return self.tree.mins.tolist() + self.tree.maxes.tolist()
+
+    def query(self, x0, y0, x1, y1):
+        """
+        Finds the nodes inside a rectangle and the edges crossing it, including edges with both
+        endpoints outside of it. Edges whose bounding box overlaps the rectangle are clipped against it.
+        :param x0: the left side of the rectangle
+        :param y0: the bottom side of the rectangle
+        :param x1: the right side of the rectangle
+        :param y1: the top side of the rectangle
+        :return: a tuple of (an array of the node rows, an array of the edge rows)
+        """
+        if self.tree is None:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        # The KD-tree finds the nodes within the square around the rectangle, which are then trimmed to it.
+        # The square is made slightly larger so rounding doesn't lose nodes on the sides of the rectangle.
+        center = ((x0 + x1) / 2, (y0 + y1) / 2)
+        radius = max(x1 - x0, y1 - y0) / 2 * (1 + 1e-9) + 1e-12
+        rows = np.array(self.tree.query_ball_point(center, radius, p=np.inf, return_sorted=True), dtype=np.intp)
+        inside = self.positions[rows]
+        rows = rows[(inside[:, 0] >= x0) & (inside[:, 0] <= x1) & (inside[:, 1] >= y0) & (inside[:, 1] <= y1)]
+        edge_rows = np.flatnonzero((self.edge_max[:, 0] >= x0) & (self.edge_min[:, 0] <= x1) &
+                                   (self.edge_max[:, 1] >= y0) & (self.edge_min[:, 1] <= y1))
+        return rows, edge_rows[self.crosses(edge_rows, x0, y0, x1, y1)]
+
+    def crosses(self, edge_rows, x0, y0, x1, y1):
+        """
+        Clips edges against a rectangle with the Liang-Barsky algorithm
+        :param edge_rows: an array of the rows of the edges to clip
+        :param x0: the left side of the rectangle
+        :param y0: the bottom side of the rectangle
+        :param x1: the right side of the rectangle
+        :param y1: the top side of the rectangle
+        :return: a boolean array, True for the edges that cross the rectangle
+        """
+        start = self.positions[self.edges[edge_rows, 0]]
+        delta = self.positions[self.edges[edge_rows, 1]] - start
+        enter = np.zeros(len(edge_rows))
+        leave = np.ones(len(edge_rows))
+        crossing = np.ones(len(edge_rows), dtype=bool)
+        sides = ((-delta[:, 0], start[:, 0] - x0), (delta[:, 0], x1 - start[:, 0]),
+                 (-delta[:, 1], start[:, 1] - y0), (delta[:, 1], y1 - start[:, 1]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for direction, distance in sides:
+                # Edges parallel to a side only cross the rectangle if they are on the inside of it
+                crossing &= (direction != 0) | (distance >= 0)
+                ratio = distance / direction
+                enter = np.where(direction < 0, np.maximum(enter, ratio), enter)
+                leave = np.where(direction > 0, np.minimum(leave, ratio), leave)
+        return crossing & (enter <= leave)
+
+    def nearest(self, x, y):
+        """
+        Finds the node closest to a point
+        :param x: the x coordinate of the point
+        :param y: the y coordinate of the point
+        :return: a tuple of (the row of the node, its distance from the point), or None if the index is empty
+        """
+        if self.tree is None:
+            return None
+        distance, row = self.tree.query((x, y))
+        return int(row), float(distance)
+
+
+def choose_index(indexes, detail, rect):
+    """
+    Picks the index to answer a viewport with. At the 'auto' detail level the full graph is used
+    until the viewport holds more than MINIGNC_VIEWPORT_MAX_NODES nodes, after which the clusters are used.
+    :param indexes: a dict of 'full' and, for graphs with clusters, 'clusters' to SpatialIndex
+    :param detail: 'clusters', 'full', or None/'auto'
+    :param rect: the [x0, y0, x1, y1] viewport, or None for the whole graph
+    :return: a tuple of (the detail level used, its SpatialIndex)
+    """
+    detail = detail or 'auto'
+    if detail not in ('auto', 'clusters', 'full'):
+        raise ValueError("Unknown detail level: " + str(detail))
+    if 'clusters' not in indexes or detail == 'full':
+        return 'full', indexes['full']
+    if detail == 'clusters':
+        return 'clusters', indexes['clusters']
+
+    full = indexes['full']
+    limit = getattr(settings, 'MINIGNC_VIEWPORT_MAX_NODES', VIEWPORT_MAX_NODES)
+    if rect is None:
+        count = len(full)
+    elif full.tree is None:
+        count = 0
+    else:
+        x0, y0, x1, y1 = rect
+        center = ((x0 + x1) / 2, (y0 + y1) / 2)
+        count = full.tree.query_ball_point(center, max(x1 - x0, y1 - y0) / 2, p=np.inf, return_length=True)
+    if count > limit:
+        return 'clusters', indexes['clusters']
+    return 'full', full
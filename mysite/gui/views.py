@@ -1,8 +1,27 @@
 import importlib.util
-
-from django.shortcuts import render
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+import plotly
+import plotly.io as pio
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect, render
 from pathlib import Path
 from . import nodes
+from . import topology
+from . import loader
+from . import testplan
+from . import routing
+from . import capacity
+from . import measurements
+from . import pingall
+from . import jobs
+from . import streaming
+from . import timings
 import csv
 
 """
@@ -28,19 +47,32 @@ spec = importlib.util.spec_from_file_location("buttons", str(BASE_DIR) + "/gui/t
 buttons = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(buttons)
 
-"""This graph nodes is linked to the HTML doc for our GUI. The values are stored in this dict"""
-graph_nodes = {
-    'hosts': [],
-    'switches': [],
-    'controllers': [],
-    'links': []
-}
+"""This graph nodes is linked to the HTML doc for our GUI. The values are stored in this topology store"""
+graph_nodes = topology.Topology()
 
 """This is the extra text used to display the ping results from Mininet"""
 extra_text = {
     'ping': ""
 }
 
+"""The figures sent to the browser most recently, by ETag, kept encoded so repeat requests are not
+serialized or compressed again. Each is a dict of its 'etag', 'body' and 'gzip' body."""
+figure_cache = {}
+figure_cache_lock = threading.Lock()
+
+"""How many figures are kept in figure_cache, one for each engine, detail level and expanded clusters viewed"""
+FIGURE_CACHE_SIZE = 8
+
+"""Part of every figure ETag, so the versions counted from 0 again after a restart don't match figures sent before it"""
+FIGURE_ETAG_SEED = os.urandom(8).hex()
+
+"""The plotly.js bundle, read once and served to every figure page from the same cacheable URL"""
+plotly_js_cache = {
+    'etag': '"plotly-' + plotly.__version__ + '"',
+    'body': None,
+    'gzip': None,
+}
+
 """This is how Django connects the lists to the HTML"""
 context = {
     'graph': graph_nodes,
@@ -57,29 +89,31 @@ def home(request):
     author: 80% Modified by Noah Lowry and Miles Stanley
     return: The GUI html to display to the user
     """
+    job = None
+
     # This is the logic for when the set button is clicked
     if request.GET.get('setbtn'):
         print(graph_nodes)
-        buttons.make_file(graph_nodes, True)
+        buttons.make_file(graph_nodes)
 
     # This is the logic for when the add host button is clicked
     elif request.GET.get('add_host_btn'):
         name = request.GET.get('add_host_name')
         ip = request.GET.get('add_host_ip')
         host = nodes.Host(name, ip)
-        graph_appender(graph_nodes['hosts'], host)
+        graph_appender(graph_nodes, host)
 
     # This is the logic for when the add switch button is clicked
     elif request.GET.get('add_switch_btn'):
         name = request.GET.get('add_switch_name')
         switch = nodes.Switch(name)
-        graph_appender(graph_nodes['switches'], switch)
+        graph_appender(graph_nodes, switch)
 
     # This is the logic for when the add controller button is clicked
     elif request.GET.get('add_controller_btn'):
         name = request.GET.get('add_controller_name')
         controller = nodes.Controller(name)
-        graph_appender(graph_nodes['controllers'], controller)
+        graph_appender(graph_nodes, controller)
 
     # This is the logic for when the add link button is clicked
     elif request.GET.get('add_link_btn'):
@@ -99,15 +133,12 @@ def home(request):
         if queue_size != 'default' and queue_size.isdigit():
             link.set_queue_size(queue_size)
 
-        graph_appender(graph_nodes['links'], link)
+        graph_appender(graph_nodes, link)
 
     # This is the logic for when the graph button is clicked
+    # The figure page only holds the plot, the figure itself is fetched from figure_json
     elif request.GET.get('graphbtn'):
-        try:
-            buttons.make_graph(graph_nodes)
-            return render(request, 'gui/figure.html', context)
-        except:
-            extra_text['ping'] = "Error: Graph Generation cannot be completed. Make sure no faulty links exist within the network."
+        return graph(request)
 
     # This is the logic for when the reset button is clicked
     elif request.GET.get('resetbtn'):
@@ -117,10 +148,20 @@ def home(request):
         buttons.clear_output(extra_text)
 
     # This is the logic for when the ping button is clicked
+    # Tests are run as jobs, so the page returns right away and polls the job for its output
     elif request.GET.get('pingallbtn'):
-        buttons.make_file(graph_nodes)
-        buttons.add_ping_all()
-        buttons.run_mininet(extra_text)
+        job = submit_job('pingall', ping_all_job, description="Ping All")
+
+    # This is the logic for when the run plan button is clicked
+    elif request.GET.get('test_plan_btn'):
+        try:
+            pairs, tests, max_parallel = read_test_plan(request.GET.get('test_plan', ''),
+                                                        request.GET.get('test_plan_tests', 'ping'),
+                                                        request.GET.get('test_plan_parallel'))
+            job = submit_job('testplan', test_plan_job, pairs, tests, max_parallel,
+                             description="Test plan: " + tests + " on " + str(len(pairs)) + " pairs")
+        except ValueError as error:
+            extra_text['ping'] = "Error: " + str(error)
 
     # This is the logic for when the add_data button is clicked
     elif request.GET.get('add_databtn'):
@@ -180,62 +221,33 @@ def home(request):
     # This is the logic for when the load_data button is clicked
     elif request.GET.get('load_databtn'):
         file = request.GET.get('load_databtn')
-        path = str(Path.home()) + "/Desktop/" + file
-        full_list = []
-
-        with open(path, newline='') as csv_file:
-            csv_r = csv.DictReader(csv_file)
-
-            for row in csv_r:
-                full_list.append(row)
-                # if row['_labels'] == ":" + file.replace(".csv", ""):
-                if row['_labels'] != "":
-                    if row['type'] == 'host':
-                        graph_appender(graph_nodes['hosts'], nodes.Host(row.get('name'), row.get('ip')))
-                    elif row['type'] == 'switch':
-                        graph_appender(graph_nodes['switches'], nodes.Switch(row.get('name')))
-                    elif row['type'] == 'controller':
-                        graph_appender(graph_nodes['controllers'], nodes.Controller(row.get('name')))
-
-                if row['_start'] != "":
-                    first_index = row.get('_start')
-                    second_index = row.get('_end')
-
-                    for item in full_list:
-                        if item.get('_id') == first_index:
-                            first = item.get('name')
-                    for item in full_list:
-                        if item.get('_id') == second_index:
-                            second = item.get('name')
-                    link = nodes.Link(first, second)
-                    set_link_params(link, row)
-                    graph_appender(graph_nodes['links'], link)
+        stats = loader.load_topology(loader.csv_path(file), graph_nodes)
+        extra_text['ping'] = ("Loaded " + str(stats['rows']) + " rows from " + file + " ({:.0f} rows/sec)".format(stats['rows_per_sec']))
+        if stats['unresolved'] > 0:
+            extra_text['ping'] += "\n" + str(stats['unresolved']) + " links refer to nodes missing from the file and were skipped"
 
     #  This is the logic for when the remove_data button is clicked
     elif request.GET.get('remove_databtn'):
         file = request.GET.get('remove_databtn')
-        path = str(Path.home()) + "/Desktop/" + file
-        full_list = []
+        path = loader.csv_path(file)
+        node_names = []
+        link_pairs = []
 
         with open(path, newline='') as csv_file:
             csv_r = csv.DictReader(csv_file)
 
             for row in csv_r:
-                #removing nodes based on type                
+                #collecting nodes to remove along with their links
                 if row['_labels'] != "":
-                    if row['type'] == 'host':
-                        buttons.remove_host(row, graph_nodes)
-                    elif row['type'] == 'switch':
-                        buttons.remove_switch(row, graph_nodes)
-                    elif row['type'] == 'controller':
-                        buttons.remove_controller(row, graph_nodes)
-                #removing links specified in csv file
+                    if row['type'] in ('host', 'switch', 'controller'):
+                        node_names.append(row.get('name'))
+                #collecting links specified in csv file
                 if row['_start'] != "":
-                    first_name = row.get('_start')
-                    second_name = row.get('_end')
-                    buttons.remove_links(first_name, second_name, graph_nodes)
-            
-            print(graph_nodes)
+                    link_pairs.append((row.get('_start'), row.get('_end')))
+
+        buttons.remove_nodes(node_names, graph_nodes)
+        for first_name, second_name in link_pairs:
+            buttons.remove_links(first_name, second_name, graph_nodes)
 
     #Logic for when the iPerf button is clicked for testing bandwidth
     elif request.GET.get('iperf_btn'):
@@ -245,16 +257,7 @@ def home(request):
         host_bundle = get_hosts(host1, host2)
         if host_bundle != None: #If both hosts exist
             if (check_link_status(host1, host2)): #If the link between two hosts has no loss
-                buttons.make_file(graph_nodes)
-                buttons.add_iperf(host1, host2)
-                output = buttons.run_mininet(extra_text)
-                if "Could not connect to iperf" in output:
-                    output = "Iperf Failed"
-                    extra_text['ping'] = (output + "\nMake sure there is a path between hosts.\n" +
-                        "If Path has Packet Loss, try again until packet makes it through or remove packet loss.")
-
-                add_iperf_info(host_bundle, output)
-                
+                job = submit_job('iperf', iperf_job, host1, host2, description="Iperf " + host1 + " " + host2)
             else:
                 extra_text['ping'] = "Error: IPerf not available for links with defined loss!"
         else:
@@ -267,50 +270,289 @@ def home(request):
 
         host_bundle = get_hosts(host1, host2)
         if host_bundle != None: #If both hosts exist
-            buttons.make_file(graph_nodes)
-            buttons.add_ping(host1, host2)
-            output = "***Ping: " + buttons.run_mininet(extra_text)
-            add_ping_info(host_bundle, output)
+            job = submit_job('ping', ping_job, host1, host2, description="Ping " + host1 + " " + host2)
         else:
             extra_text['ping'] = "Error: At least one of the hosts provided does not exist!"
 
-    return render(request, 'gui/gui.html', context)
+    return render(request, 'gui/gui.html', dict(context, job=job))
+
+
+def submit_job(kind, function, *args, description=""):
+    """
+    Queues a job on the shared job queue and shows that it is queued in the output panel
+    :param kind: what the job does, such as 'ping' or 'testplan'
+    :param function: the job function, called with the Job and args
+    :param args: the rest of the arguments of the function
+    :param description: a line describing the job
+    :return: the id of the job
+    """
+    job = jobs.get_queue().submit(kind, function, *args, description=description)
+    extra_text['ping'] = "*** Job " + job.id + " queued: " + description + "\n"
+    return job.id
+
+
+def ping_job(job, host1, host2):
+    """
+    Pings between two hosts and sets their Ping logs, run as a job
+    :param job: the Job running the test
+    :param host1: the first host name
+    :param host2: the second host name
+    :return: the result of the job, a dict with the 'output' of the test and the 'timings' of its phases
+    """
+    timing = timings.RunTimings('ping', graph_nodes)
+    output = buttons.run_test(graph_nodes, 'ping', extra_text, [host1, host2], job, timing)
+    host_bundle = get_hosts(host1, host2)
+    if host_bundle != None:
+        add_ping_info(host_bundle, output)
+    return {'output': output + timing.summary(), 'timings': timing.to_dict()}
+
+
+def iperf_job(job, host1, host2):
+    """
+    Tests the bandwidth between two hosts and sets their iPerf logs, run as a job
+    :param job: the Job running the test
+    :param host1: the first host name
+    :param host2: the second host name
+    :return: the result of the job, a dict with the 'output' of the test and the 'timings' of its phases
+    """
+    timing = timings.RunTimings('iperf', graph_nodes)
+    output = text = buttons.run_test(graph_nodes, 'iperf', extra_text, [host1, host2], job, timing)
+    if "Could not connect to iperf" in output:
+        output = "Iperf Failed"
+        text = (output + "\nMake sure there is a path between hosts.\n" +
+            "If Path has Packet Loss, try again until packet makes it through or remove packet loss.\n")
+    text += timing.summary()
+    extra_text['ping'] = text
+    host_bundle = get_hosts(host1, host2)
+    if host_bundle != None:
+        add_iperf_info(host_bundle, output)
+    return {'output': text, 'timings': timing.to_dict()}
+
+
+def ping_all_job(job):
+    """
+    Pings between every pair of hosts, run as a job. The results are kept as a matrix and compared with the
+    previous run, and the output panel shows a summary instead of the text Mininet logged.
+    :param job: the Job running the test
+    :return: the result of the job, a dict with the 'output' of the test, whether it has a 'heatmap'
+             and the 'timings' of its phases
+    """
+    timing = timings.RunTimings('pingall', graph_nodes)
+    output = buttons.run_test(graph_nodes, 'pingall', extra_text, job=job, timing=timing)
+    run = pingall.parse(output)
+    if run is None:
+        return {'output': output + timing.summary(), 'heatmap': False, 'timings': timing.to_dict()}
+    previous = graph_nodes.measurements.add_run(run)
+    text = run.summary()
+    if previous is not None:
+        text += pingall.diff_summary(pingall.diff(previous, run))
+    text += timing.summary()
+    extra_text['ping'] = text
+    return {'output': text, 'heatmap': True, 'timings': timing.to_dict()}
+
+
+def test_plan_job(job, pairs, tests, max_parallel):
+    """
+    Runs a test plan, run as a job
+    :param job: the Job running the plan
+    :param pairs: the host pairs to test
+    :param tests: 'ping', 'iperf' or 'both'
+    :param max_parallel: the most iPerf tests to run at the same time, or None for the default
+    :return: the result of the job, a dict with the 'output' summary and the 'report' of the plan
+    """
+    try:
+        report = run_test_plan(pairs, tests, max_parallel, job)
+    except testplan.emulation.EmulationError as error:
+        job.check()
+        extra_text['ping'] = "Error: " + str(error)
+        raise
+    extra_text['ping'] = testplan.summary(report)
+    return {'output': extra_text['ping'], 'report': report}
+
+
+def read_test_plan(plan, tests, max_parallel):
+    """
+    Reads the parameters of a test plan, so a plan that can't run is refused before it is queued
+    :param plan: the pairs to test, see testplan.parse_pairs
+    :param tests: 'ping', 'iperf' or 'both'
+    :param max_parallel: the most iPerf tests to run at the same time as a string, or None/"" for the default
+    :return: a tuple of (the host pairs, the tests, the maximum parallelism or None)
+    """
+    if tests not in testplan.TESTS:
+        raise ValueError("Unknown tests: " + str(tests))
+    max_parallel = int(max_parallel) if max_parallel else None
+    if max_parallel is not None and max_parallel < 1:
+        raise ValueError("The maximum parallelism must be at least 1")
+    return testplan.parse_pairs(plan, graph_nodes), tests, max_parallel
+
+
+def run_test_plan(pairs, tests, max_parallel=None, job=None):
+    """
+    Runs a test plan on the network and sets the Ping and iPerf logs of the hosts that were tested
+    :param pairs: the host pairs to test, see read_test_plan
+    :param tests: 'ping', 'iperf' or 'both'
+    :param max_parallel: the most iPerf tests to run at the same time, or None for the default
+    :param job: the jobs.Job running the plan, which interrupts the worker when cancelled
+                and has the lines Mininet logs written to its output as they come
+    :return: the report of the plan, see testplan.run_plan
+    """
+    session = testplan.emulation.get_session()
+    on_line = check = None
+    if job is not None:
+        job.stop_session(session)
+        on_line = job.output.write
+        check = job.check
+    report = testplan.run_plan(graph_nodes, pairs, tests, session, max_parallel, on_line, check)
+    if job is not None:
+        job.check()
+    for result in report['results']:
+        host_bundle = get_hosts(result['first'], result['second'])
+        if host_bundle is None:
+            continue
+        if result['test'] == 'ping':
+            add_ping_info(host_bundle, result['output'])
+        else:
+            add_iperf_info(host_bundle, result['output'])
+    return report
+
+
+def test_plan_json(request):
+    """
+    Queues the test plan given by the plan parameter, with the tests given by the tests parameter
+    ('ping', 'iperf' or 'both') and at most max_parallel iPerf tests at a time. The report of
+    the plan is the result of the job, see job_json.
+    return: The queued job as JSON with status 202, or a JSON error message
+    """
+    try:
+        pairs, tests, max_parallel = read_test_plan(request.GET.get('plan', ''), request.GET.get('tests', 'ping'),
+                                                    request.GET.get('max_parallel'))
+    except ValueError as error:
+        return JsonResponse({'error': "Error: " + str(error)}, status=400)
+    job_id = submit_job('testplan', test_plan_job, pairs, tests, max_parallel,
+                        description="Test plan: " + tests + " on " + str(len(pairs)) + " pairs")
+    return JsonResponse(jobs.get_queue().get(job_id).to_dict(), status=202)
+
+
+def jobs_json(request):
+    """
+    Returns the jobs in the results store, oldest first, without their results
+    return: The jobs as JSON
+    """
+    listed = []
+    for job in jobs.get_queue().list():
+        state = job.to_dict()
+        del state['result']
+        listed.append(state)
+    return JsonResponse({'jobs': listed})
+
+
+def job_json(request, job_id):
+    """
+    Returns the status of a job, with its result once it is done
+    :param job_id: the id of the job
+    return: The job as JSON, or a JSON error message if there is no such job
+    """
+    job = jobs.get_queue().get(job_id)
+    if job is None:
+        return JsonResponse({'error': "Error: No job with id " + job_id}, status=404)
+    return JsonResponse(job.to_dict())
+
+
+def job_stream(request, job_id):
+    """
+    Streams the output of a job as server-sent events while it runs, one message per line.
+    A browser that reconnects sends the last line it read in the Last-Event-ID header (or the after
+    parameter) and gets the lines after it. The stream ends with an end event holding the status of the job.
+    :param job_id: the id of the job
+    return: The event stream, or a JSON error message if there is no such job
+    """
+    job = jobs.get_queue().get(job_id)
+    if job is None:
+        return JsonResponse({'error': "Error: No job with id " + job_id}, status=404)
+    after = request.headers.get('Last-Event-ID') or request.GET.get('after') or "0"
+    after = int(after) if after.isdigit() else 0
+    response = StreamingHttpResponse(streaming.event_stream(job.output, after, lambda: job.status),
+                                     content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stops proxies like nginx from holding back the events
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def cancel_job_json(request, job_id):
+    """
+    Cancels a job. A queued job never runs and a running one has its Mininet worker or script stopped.
+    :param job_id: the id of the job
+    return: The job as JSON, or a JSON error message if there is no such job
+    """
+    queue = jobs.get_queue()
+    if queue.get(job_id) is None:
+        return JsonResponse({'error': "Error: No job with id " + job_id}, status=404)
+    if queue.cancel(job_id):
+        extra_text['ping'] = "*** Job " + job_id + " cancelled\n"
+    return JsonResponse(queue.get(job_id).to_dict())
+
+
+def timeout_job_json(request, job_id):
+    """
+    Sets how many seconds a job may run, counted from when it started, to the seconds parameter.
+    An empty seconds parameter removes the limit.
+    :param job_id: the id of the job
+    return: The job as JSON, or a JSON error message
+    """
+    queue = jobs.get_queue()
+    if queue.get(job_id) is None:
+        return JsonResponse({'error': "Error: No job with id " + job_id}, status=404)
+    try:
+        seconds = float(request.GET['seconds']) if request.GET.get('seconds') else None
+    except ValueError:
+        return JsonResponse({'error': "Error: The timeout needs a numeric seconds parameter."}, status=400)
+    if seconds is not None and seconds <= 0:
+        return JsonResponse({'error': "Error: The timeout must be more than 0 seconds."}, status=400)
+    if not queue.set_timeout(job_id, seconds):
+        return JsonResponse({'error': "Error: The job has already finished."}, status=409)
+    return JsonResponse(queue.get(job_id).to_dict())
+
 
 def add_iperf_info(host_bundle, output):
     """
-    Sets the iPerf log for each host to the most recent iPerf output
+    Adds the bandwidths of an iPerf test to the measurement history of the pair and sets the iPerf log
+    of each host to a summary of the pair's history. Output without results is logged as it is.
     author: Noah Lowry and Miles Stanley
-    :param host1: The first host involved in the bandwidth test
-    :param host2: The second host involved in the bandwidth test
-    :param output: The output of the bandwidth test to be set within each host's link log
+    :param host_bundle: The two hosts involved in the bandwidth test
+    :param output: The output of the bandwidth test
     :return: None
     """
-    print("")
-    HOST_1_POS = 0
-    HOST_2_POS = 1
-
-    first_host = host_bundle[HOST_1_POS]
-    second_host = host_bundle[HOST_2_POS]
-    first_host.set_link_log('iperf', output)
-    second_host.set_link_log('iperf', output)
+    add_test_info('iperf', host_bundle, output)
 
 def add_ping_info(host_bundle, output):
     """
-    Sets the Ping log for each host to the most recent Ping output
+    Adds the round trip times and loss of a ping test to the measurement history of the pair and sets
+    the Ping log of each host to a summary of the pair's history. Output without results is logged as it is.
     author: Noah Lowry and Miles Stanley
-    :param host1: The first host involved in the ping test
-    :param host2: The second host involved in the ping test
-    :param output: The output of the ping test to be set within each host's link log
+    :param host_bundle: The two hosts involved in the ping test
+    :param output: The output of the ping test
     :return: None
     """
-    print("")
-    HOST_1_POS = 0
-    HOST_2_POS = 1
+    add_test_info('ping', host_bundle, output)
 
-    first_host = host_bundle[HOST_1_POS]
-    second_host = host_bundle[HOST_2_POS]
-    first_host.set_link_log('ping', output) 
-    second_host.set_link_log('ping', output)
+def add_test_info(test, host_bundle, output):
+    """
+    Records the result of a test between two hosts and sets their logs, see add_iperf_info and add_ping_info
+    :param test: 'ping' or 'iperf'
+    :param host_bundle: The two hosts involved in the test
+    :param output: The output of the test
+    :return: None
+    """
+    first_host, second_host = host_bundle
+    history = graph_nodes.measurements
+    if history.record(test, first_host.name, second_host.name, output) is None:
+        first_host.set_link_log(test, output)
+        second_host.set_link_log(test, output)
+        return
+    buffer = history.get(test, first_host.name, second_host.name)
+    first_host.set_link_log(test, measurements.summary(test, second_host.name, buffer))
+    second_host.set_link_log(test, measurements.summary(test, first_host.name, buffer))
 
 def get_hosts(host1, host2):
     """
@@ -330,20 +572,14 @@ def get_hosts(host1, host2):
 
 def check_link_status(host1, host2):
     """
-    Method used to ensure the link between two hosts does not have defined loss. Testing bandwidth with
+    Method used to ensure the links between two hosts do not have defined loss. Testing bandwidth with
     defined loss leads to error due to packet loss.
     author: Miles Stanley
     :param host1: The first host name
     :param host2: The second host name
-    :return: True if the link has no defined loss, False otherwise
+    :return: True if no link along the path between the hosts has defined loss, False otherwise
     """
-    return True #testing-------------------------------------------------------------------------------------DELETE
-
-    for link in graph_nodes['links']:
-        if link.get_first() == host1 and link.get_second() == host2:
-            if link.get_loss() == None:
-                return True
-    return False
+    return not capacity.lossy_links(graph_nodes, host1, host2)
 
 
 def get_host(host):
@@ -353,77 +589,306 @@ def get_host(host):
     :param host: the host name of the host to return
     :return: the host object with the same name as the parameter provided
     """
-    for new_host in graph_nodes['hosts']:
-        if new_host.name == host:
-            return new_host
+    return graph_nodes.get_host(host)
 
-def set_link_params(link, row):
+def graph_appender(graph, object):
     """
-    This function searches a row from a CSV file in order to apply any link parameters to a given link
-    :param link: The link object to apply any parameters to if necessary
-    :param row: The row from our CSV file to determine link parameters based on column
+    This method ensures that the object being added isn't already within the network. If it isn't, it is added to the topology
+    :param graph: the topology store to add the object to
+    :param object: the object to be added if it is unique
+    Author: Noah and Miles
+    """
+    if not graph.add(object):
+        print("ERROR: Duplicate node ignored: " + str(object))
 
-    author: Noah Lowry
+def graph(request):
     """
-    # Following Logic Adds the Network Parameters to each link
-    # KeyErrors are ignored, if a column header does not exist, then the parameter is not added
-    try:
-        if row['_bw'] != "":
-            bw_value = row.get('_bw')
-            if bw_value.isdigit():
-                # print("Added new bandwidth " + bw_value)
-                link.set_bandwidth(bw_value)
-    
-    except KeyError:
-        pass
+    This method displays the page the graph is drawn on. The page loads plotly.js from plotly_js
+    and the figure from figure_json, so nothing is generated here.
+    return: The rendered HTML of the graph page
+    """
+    figure_context = {
+        'plotly_version': plotly.__version__,
+        'layout_engine': request.GET.get('layout_engine') or '',
+        'detail': request.GET.get('detail') or '',
+    }
+    return render(request, 'gui/figure.html', figure_context)
 
+
+def figure_etag(engine, detail=None, expanded=()):
+    """
+    Returns the ETag of the figure, built from everything the figure depends on: the topology and link
+    parameter versions, the host logs shown in the hover text, and the engine, detail level and expanded
+    clusters it is drawn with. It is known before the figure is built, so an unchanged figure isn't built at all.
+    :param engine: the name of the layout engine to use, or None/'auto' to pick one by graph size
+    :param detail: the detail level to draw the graph at, see clustering.DETAIL_LEVELS
+    :param expanded: the names of the clusters to draw in full
+    :return: the ETag
+    """
+    key = repr((FIGURE_ETAG_SEED, id(graph_nodes), graph_nodes.version, graph_nodes.links.param_version,
+                nodes.Host.log_version, engine or '', detail or '', sorted(set(expanded))))
+    return '"figure-' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+
+
+def build_figure(engine, detail=None, expanded=()):
+    """
+    Returns the figure of the current network, from figure_cache if it has already been built
+    :param engine: the name of the layout engine to use, or None/'auto' to pick one by graph size
+    :param detail: the detail level to draw the graph at, see clustering.DETAIL_LEVELS
+    :param expanded: the names of the clusters to draw in full
+    :return: a dict of the 'etag', JSON 'body' and 'gzip' body of the figure
+    """
+    etag = figure_etag(engine, detail, expanded)
+    with figure_cache_lock:
+        cache = figure_cache.get(etag)
+    if cache is not None:
+        return cache
+    fig, layout_key = buttons.make_graph(graph_nodes, engine, detail, expanded)
+    cache = {'etag': etag, 'body': pio.to_json(fig, validate=False).encode(), 'gzip': None}
+    with figure_cache_lock:
+        figure_cache[etag] = cache
+        while len(figure_cache) > FIGURE_CACHE_SIZE:
+            del figure_cache[next(iter(figure_cache))]
+    return cache
+
+
+def etag_matches(request, etag):
+    """
+    Returns True if the browser already has the version of a response named by an ETag
+    :param request: the request being answered
+    :param etag: the ETag, with its quotes
+    :return: True if the If-None-Match header lists the ETag or is *
+    """
+    listed = [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]
+    # Weak ETags match as well, since If-None-Match compares them weakly
+    listed = [tag[2:] if tag.startswith('W/') else tag for tag in listed]
+    return '*' in listed or etag in listed
+
+
+def cached_response(request, cache, content_type, cache_control):
+    """
+    Sends a cached body, answering with 304 Not Modified when the browser already has it and
+    gzip-compressing it when the browser accepts that and MINIGNC_FIGURE_GZIP is set.
+    The compressed body is kept in the cache so it is only compressed once.
+    :param request: the request being answered
+    :param cache: a dict with the 'etag', 'body' and 'gzip' of what is being sent
+    :param content_type: the content type of the body
+    :param cache_control: the Cache-Control header to send
+    :return: the response
+    """
+    if etag_matches(request, cache['etag']):
+        response = HttpResponseNotModified()
+    else:
+        body = cache['body']
+        use_gzip = (getattr(settings, 'MINIGNC_FIGURE_GZIP', True) and
+                    'gzip' in request.headers.get('Accept-Encoding', ''))
+        if use_gzip:
+            if cache['gzip'] is None:
+                cache['gzip'] = gzip.compress(body, 6)
+            body = cache['gzip']
+        response = HttpResponse(body, content_type=content_type)
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+    response['ETag'] = cache['etag']
+    response['Cache-Control'] = cache_control
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def figure_json(request):
+    """
+    Returns the figure of the current network as JSON. Browsers revalidate it on every view,
+    so a network that hasn't changed since the last view is answered with 304 Not Modified.
+    The clusters to draw in full are given as a comma separated list in the expand parameter.
+    return: The figure JSON, or a JSON error message if the graph could not be generated
+    """
+    expanded = [name for name in request.GET.get('expand', '').split(',') if name]
+    engine = request.GET.get('layout_engine')
+    detail = request.GET.get('detail')
+    etag = figure_etag(engine, detail, expanded)
+    if etag_matches(request, etag):
+        return cached_response(request, {'etag': etag}, 'application/json', 'no-cache')
     try:
-        if row['_delay'] != "":
-            delay_value = row.get('_delay')
-            if (delay_value.isdigit()):
-                # print("Added new delay " + delay_value)
-                link.set_delay(delay_value)
-    
-    except KeyError:
-        pass
+        cache = build_figure(engine, detail, expanded)
+    except Exception:
+        extra_text['ping'] = "Error: Graph Generation cannot be completed. Make sure no faulty links exist within the network."
+        return JsonResponse({'error': extra_text['ping']}, status=500)
+    return cached_response(request, cache, 'application/json', 'no-cache')
 
+
+def get_viewport_rect(request):
+    """
+    Reads the viewport rectangle from the x0, y0, x1 and y1 parameters of a request
+    :param request: the request holding the parameters
+    :return: the [x0, y0, x1, y1] viewport, or None if no rectangle was given
+    """
+    if 'x0' not in request.GET:
+        return None
+    x0, y0, x1, y1 = (float(request.GET[side]) for side in ('x0', 'y0', 'x1', 'y1'))
+    return [min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)]
+
+
+def viewport_json(request):
+    """
+    Returns the nodes and edges of the current network within a viewport, given by the x0, y0, x1 and y1
+    parameters, at the level of detail given by the detail parameter. Without a viewport the whole graph is returned.
+    return: The viewport as figure JSON, or a JSON error message
+    """
     try:
-        if row['_loss'] != "":
-            loss_value = row.get('_loss')
-            if loss_value.isdigit():
-                # print("Added new loss " + loss_value)
-                link.set_loss(loss_value)
-    
-    except KeyError:
-        pass
+        rect = get_viewport_rect(request)
+    except (KeyError, ValueError):
+        return JsonResponse({'error': "Error: The viewport needs numeric x0, y0, x1 and y1 parameters."}, status=400)
+    try:
+        view = buttons.make_viewport(graph_nodes, request.GET.get('layout_engine'), request.GET.get('detail'), rect)
+    except Exception:
+        extra_text['ping'] = "Error: Graph Generation cannot be completed. Make sure no faulty links exist within the network."
+        return JsonResponse({'error': extra_text['ping']}, status=500)
+    return HttpResponse(pio.to_json(view, validate=False), content_type='application/json')
+
 
+def nearest_json(request):
+    """
+    Returns the node closest to the x and y parameters within the viewport given by x0, y0, x1 and y1,
+    along with its hover text
+    return: The node as JSON, or a JSON error message
+    """
     try:
-        if row['_queue'] != "":
-            queue_value = row.get('_queue')
-            if queue_value.isdigit():
-                # print("Added new queue value " + queue_value)
-                link.set_queue_size(queue_value)
-    
-    except KeyError:
-        pass
+        x = float(request.GET['x'])
+        y = float(request.GET['y'])
+        rect = get_viewport_rect(request)
+    except (KeyError, ValueError):
+        return JsonResponse({'error': "Error: A lookup needs numeric x and y parameters."}, status=400)
+    try:
+        node = buttons.get_nearest_node(graph_nodes, x, y, request.GET.get('layout_engine'), request.GET.get('detail'), rect)
+    except Exception:
+        extra_text['ping'] = "Error: Graph Generation cannot be completed. Make sure no faulty links exist within the network."
+        return JsonResponse({'error': extra_text['ping']}, status=500)
+    if node is None:
+        return JsonResponse({'error': "Error: The network has no nodes."}, status=404)
+    return JsonResponse(node)
 
-def graph_appender(list, object):
+
+def latency_json(request):
     """
-    This method ensures that the object being added isn't already within the network. If it isn't, it is added to it's respective lsit
-    :param list: the list to check for duplicates
-    :param object: the object to be added if it is unique
-    Author: Noah and Miles
+    Returns the expected round trip time between every pair of hosts, along the paths with the least
+    link delay. Hosts that can't reach each other get null. With first and second parameters, only
+    the path between those two hosts is returned.
+    return: The hosts and their RTT matrix in ms as JSON, or the path and its RTT
+    """
+    latency = routing.get_latency(graph_nodes)
+    first = request.GET.get('first')
+    second = request.GET.get('second')
+    if first or second:
+        if get_hosts(first, second) is None:
+            return JsonResponse({'error': "Error: At least one of the hosts provided does not exist!"}, status=404)
+        path, one_way = latency.path(first, second)
+        return HttpResponse(json.dumps({'first': first, 'second': second, 'path': path, 'rtt': 2 * one_way},
+                                       cls=plotly.utils.PlotlyJSONEncoder), content_type='application/json')
+    body = json.dumps({'hosts': latency.names, 'rtt': 2 * latency.matrix()}, cls=plotly.utils.PlotlyJSONEncoder)
+    return HttpResponse(body, content_type='application/json')
+
+
+def capacity_json(request):
     """
-    for item in list:
-        # print(str(item) + " compared to " + str(object))
-        if item.equals(object):
-            print("ERROR: Duplicate node ignored: " + str(object))
-            return
-    list.append(object)
+    Returns the bandwidth of the widest path between every pair of hosts, the most an iPerf test between
+    them could reach along a single path. Hosts that can't reach each other get 0. With first and second
+    parameters, only that pair is returned along with its maximum flow over every path.
+    return: The hosts and their bandwidth matrix in Mbits/sec as JSON, or the bandwidth and maximum flow of the pair
+    """
+    matrix = capacity.get_capacity(graph_nodes)
+    first = request.GET.get('first')
+    second = request.GET.get('second')
+    if first or second:
+        if get_hosts(first, second) is None:
+            return JsonResponse({'error': "Error: At least one of the hosts provided does not exist!"}, status=404)
+        body = {'first': first, 'second': second, 'bandwidth': matrix.bottleneck(first, second),
+                'max_flow': matrix.max_flow(first, second)}
+        return HttpResponse(json.dumps(body, cls=plotly.utils.PlotlyJSONEncoder), content_type='application/json')
+    body = json.dumps({'hosts': matrix.names, 'bandwidth': matrix.matrix()}, cls=plotly.utils.PlotlyJSONEncoder)
+    return HttpResponse(body, content_type='application/json')
+
+
+def measurements_json(request):
+    """
+    Returns the most recent results of the test given by the test parameter ('ping' or 'iperf') between the
+    hosts given by the first and second parameters, oldest first, with the 50th, 90th and 99th percentile
+    of each value. Round trip times are in ms, loss in percent and bandwidths in Mbits/sec.
+    return: The records and percentiles as JSON, or a JSON error message
+    """
+    test = request.GET.get('test', 'ping')
+    first = request.GET.get('first')
+    second = request.GET.get('second')
+    if test not in measurements.FIELDS:
+        return JsonResponse({'error': "Error: Unknown test " + str(test) + "."}, status=400)
+    if get_hosts(first, second) is None:
+        return JsonResponse({'error': "Error: At least one of the hosts provided does not exist!"}, status=404)
+    body = {'test': test, 'first': first, 'second': second, 'count': 0, 'records': [], 'percentiles': {}}
+    history = graph_nodes.measurements.get(test, first, second)
+    if history is not None:
+        body['count'] = history.count
+        body['records'] = history.records()
+        body['percentiles'] = {field: {'p' + str(percent): value for percent, value in history.percentiles(field).items()}
+                               for field in measurements.FIELDS[test][1:]}
+    return HttpResponse(json.dumps(body, cls=plotly.utils.PlotlyJSONEncoder), content_type='application/json')
+
+
+def timings_json(request):
+    """
+    Returns how long each phase of the most recent ping, iPerf and Ping All runs took, oldest first, with the
+    number of nodes and links of the topology they ran on. The kind parameter only returns runs of that kind.
+    return: The runs as JSON
+    """
+    kind = request.GET.get('kind') or None
+    return JsonResponse({'phases': list(timings.PHASES),
+                         'runs': [timing.to_dict() for timing in timings.get_runs(kind)]})
 
-def graph(request):
+
+def ping_all_graph(request):
+    """
+    This method displays the page the heatmap of a Ping All run is drawn on, see ping_all_json
+    return: The rendered HTML of the heatmap page
+    """
+    context = {
+        'plotly_version': plotly.__version__,
+        'run': request.GET.get('run') or '-1',
+        'diff': request.GET.get('diff') or '',
+    }
+    return render(request, 'gui/pingall.html', context)
+
+
+def ping_all_json(request):
+    """
+    Returns the heatmap of the round trip times of a kept Ping All run, given by the run parameter
+    (-1 for the latest), or with diff=1, of the changes from the run before it
+    return: The figure as JSON, or a JSON error message
+    """
+    try:
+        index = int(request.GET.get('run', -1))
+    except ValueError:
+        return JsonResponse({'error': "Error: The run must be a whole number."}, status=400)
+    run, previous = graph_nodes.measurements.get_run(index)
+    if run is None:
+        return JsonResponse({'error': "Error: No Ping All run has been kept yet."}, status=404)
+    if request.GET.get('diff'):
+        if previous is None:
+            return JsonResponse({'error': "Error: There is no earlier run to compare with."}, status=404)
+        figure = pingall.diff_heatmap(pingall.diff(previous, run))
+    else:
+        figure = pingall.heatmap(run)
+    return HttpResponse(pio.to_json(figure, validate=False), content_type='application/json')
+
+
+def plotly_js(request, version):
     """
-    This method creates the graph HTML and displays to the user
-    return: The rendered HTML of the graph
+    Returns the plotly.js bundle. The URL names the plotly version, so the browser can keep the
+    bundle for good and only downloads it again after plotly is upgraded.
+    :param version: the plotly version in the URL
+    return: The plotly.js bundle, or a redirect to the URL of the installed version
     """
-    return render(request, 'gui/figure.html')
+    # The bundle is sent as immutable, so it is only sent under the URL of the version it is
+    if version != plotly.__version__:
+        return redirect('gui-plotly-js', plotly.__version__)
+    if plotly_js_cache['body'] is None:
+        plotly_js_cache['body'] = plotly.offline.get_plotlyjs().encode()
+    return cached_response(request, plotly_js_cache, 'application/javascript',
+                           'public, max-age=31536000, immutable')
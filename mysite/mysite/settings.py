@@ -121,3 +121,76 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, "static")
+
+# Directory that exported network CSV files are loaded from and removed with.
+# Leave as None to use the Desktop of the user running the server.
+MINIGNC_CSV_DIR = None
+
+# Number of graph layouts kept in memory, and an optional directory that keeps
+# them on disk as well so previously seen networks are found after a restart.
+MINIGNC_LAYOUT_CACHE_SIZE = 32
+MINIGNC_LAYOUT_CACHE_DIR = None
+
+# Warm-start the graph layout from the previous render when only a few nodes or links changed
+MINIGNC_INCREMENTAL_LAYOUT = True
+
+# Layout engine used to graph the network: 'auto' picks one by graph size,
+# or force one of 'kamada_kawai', 'force_directed', 'multilevel' or 'layered'.
+MINIGNC_LAYOUT_ENGINE = 'auto'
+
+# Processes used to lay out the connected components of a network in parallel, None for one per core
+MINIGNC_LAYOUT_WORKERS = None
+
+# Graphs with more nodes and links than this are drawn with WebGL instead of SVG
+MINIGNC_WEBGL_THRESHOLD = 5000
+
+# Gzip-compress the figure JSON and plotly.js for browsers that accept it
+MINIGNC_FIGURE_GZIP = True
+
+# Networks with more nodes than this are graphed with each edge switch and its hosts
+# collapsed into one cluster node, which can be expanded by clicking it
+MINIGNC_CLUSTER_MIN_NODES = 20000
+
+# In the viewport view, viewports holding more nodes than this are drawn as clusters
+MINIGNC_VIEWPORT_MAX_NODES = 5000
+
+# Where Ping, iPerf and Ping All run: 'mininet' keeps one network running in Mininet
+# (under sudo and python2) and rebuilds it only when the topology changes, 'fake'
+# answers every test without Mininet or root, for testing the GUI, and 'analytic' predicts the
+# results from the link delays, bandwidths, losses and queue sizes without Mininet or root.
+MINIGNC_EMULATION_BACKEND = 'mininet'
+
+# The sudo password used to run Mininet
+MINIGNC_SUDO_PASSWORD = "Mininet"
+
+# Test plans with more host pairs than this are refused
+MINIGNC_TEST_PLAN_MAX_PAIRS = 10000
+
+# Test plans run iPerf on pairs whose paths share no link at the same time, at most this many at once,
+# and each iPerf test sends traffic for this many seconds
+MINIGNC_IPERF_MAX_PARALLEL = 4
+MINIGNC_IPERF_SECONDS = 5
+
+# Ping, iPerf, Ping All and test plans run as background jobs: at most this many at once
+# (jobs on the emulation backend still share its one network, so they run one after the other),
+# each stopped after this many seconds (None for no limit), keeping the results of this many finished jobs
+MINIGNC_JOB_WORKERS = 2
+MINIGNC_JOB_TIMEOUT = 600
+MINIGNC_JOB_HISTORY = 100
+
+# How many of the most recent output lines each job keeps for streaming to the browser
+MINIGNC_STREAM_BUFFER_LINES = 1000
+
+# Host hover text shows the range of widest path bandwidths to the other hosts, for networks with at most this many hosts
+MINIGNC_CAPACITY_HOVER_MAX_HOSTS = 5000
+
+# How many of the most recent ping and iPerf results are kept for each pair of hosts
+MINIGNC_MEASUREMENT_HISTORY = 32
+
+# How many Ping All matrices are kept, and how many times longer a round trip has to take than in the
+# previous run to be listed as slower
+MINIGNC_PINGALL_RUNS = 5
+MINIGNC_PINGALL_REGRESSION_RATIO = 1.5
+
+# How many emulation runs are kept with the time each of their phases took
+MINIGNC_TIMING_HISTORY = 200